@@ -1,15 +1,44 @@
-import pandas as pd
+import os
+import uuid
+
 import streamlit as st
-from bson import ObjectId
 
+from src.config import COST_GATE_ENABLED, EXPORT_TIMEOUT, RESULT_PAGE_SIZE
 from src.db import (  # execute_postgres,; connect_to_postgres,
-    clean_mongodb_data, execute_nosql, execute_sql, validate_sql)
+    cancel_query, check_query_cost, execute_query, export_formats,
+    export_result, get_pool_stats, get_query_result, get_result_cache,
+    result_to_dataframe, start_query, validate_sql)
+from src.jobs import JobQueueFull, get_job_queue
 from src.llm import get_nosql_schema  # get_postgres_schema,
-from src.llm import extract_sql_from_response, generate_query, get_sql_schema
+from src.llm import (check_generated_query, extract_sql_from_response,
+                     generate_query, get_sql_schema, llm_cache_stats,
+                     regenerate_cheaper_query)
+from src.telemetry import span, stage_summary, start_metrics_server
+
+
+def session_user() -> str:
+    """Identifies this browser session to the job queue, which shares workers fairly between sessions."""
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = uuid.uuid4().hex
+    return st.session_state.user_id
 
 
 def main():
     st.title("Natural Language to SQL/NoSQL Query")
+    start_metrics_server()  # /metrics and /spans, when TELEMETRY_METRICS_PORT is set
+
+    # Connection pool metrics
+    with st.sidebar.expander("Connection pools"):
+        st.json(get_pool_stats())
+    with st.sidebar.expander("LLM response cache"):
+        # Only caches a query has already opened
+        st.json(llm_cache_stats())
+    with st.sidebar.expander("Query result cache"):
+        st.json(get_result_cache().stats())
+    with st.sidebar.expander("Job queue"):
+        st.json(get_job_queue().stats())
+    with st.sidebar.expander("Stage timings"):
+        st.json(stage_summary())
 
     # Select the type of database
     db_choice = st.radio("Select Database Type", ("MySQL", "MongoDB"))
@@ -43,87 +72,264 @@ def main():
                 "MongoDB": "mongodb"
             }
             db_type = db_type_map[db_choice]
-            
-            # Generate and store query
-            query_type, generated_query = generate_query(user_query, db_type)
-            st.session_state.generated_query = generated_query
+
+            # Generate in the background; the completion is shown as it streams in
+            def generate(job):
+                return generate_query(user_query, db_type, on_token=job.set_progress)
+
+            try:
+                st.session_state.generation_job = get_job_queue().submit(session_user(), generate, kind="generate")
+            except JobQueueFull as e:
+                st.error(str(e))
+
+    if st.session_state.get("generation_job"):
+        wait_for_generation(st.session_state.generation_job)
 
     # Display the generated query **only if it exists**
     if st.session_state.generated_query:
         st.write("### Generated Query:")
         st.code(st.session_state.generated_query, language="sql" if db_choice in ["MySQL", "PostgreSQL"] else "json")
+        problems = schema_problems(st.session_state.generated_query, "mysql" if db_choice == "MySQL" else "mongodb")
+        if problems:
+            st.warning("This query does not match the schema and will probably fail:\n"
+                       + "\n".join(f"- {problem}" for problem in problems))
 
         # Execute Query Button
         if st.button("Execute Query"):
-            try:
-                if db_choice == "MySQL":
-                    if validate_sql(st.session_state.generated_query):
-                        result = execute_sql(st.session_state.generated_query)
-                    else:
-                        st.error("Invalid MySQL query. Please try again.")
-                        return
-                # elif db_choice == "PostgreSQL":
-                #     result = execute_postgres(st.session_state.generated_query)
-                else:  # MongoDB
-                    result = execute_nosql(st.session_state.generated_query)
-                    # Clean MongoDB result
-                    if isinstance(result, list):
-                        result = [clean_mongodb_data(item) for item in result]
-                    else:
-                        result = clean_mongodb_data(result)
-                
-                # Convert result to DataFrame and handle data types
-                if isinstance(result, list):
-                    if result and isinstance(result[0], dict):
-                        # If result is already a list of dictionaries, convert directly
-                        result_df = pd.DataFrame(result)
-                    else:
-                        # Clean up the result format
-                        cleaned_result = []
-                        for item in result:
-                            # Handle RealDictRow objects
-                            if hasattr(item, 'items'):
-                                cleaned_item = dict(item)
-                            else:
-                                # Flatten nested tuples completely
-                                while isinstance(item, tuple):
-                                    if len(item) == 1:
-                                        item = item[0]
-                                    else:
-                                        break
-                                
-                                if isinstance(item, tuple):
-                                    cleaned_item = list(item)
-                                else:
-                                    cleaned_item = [item]
-                            cleaned_result.append(cleaned_item)
-                        
-                        # Create DataFrame with proper column names
-                        if cleaned_result:
-                            result_df = pd.DataFrame(cleaned_result)
-                            # Use original column names if available
-                            if isinstance(cleaned_result[0], dict):
-                                result_df.columns = list(cleaned_result[0].keys())
-                            else:
-                                # Rename columns if they are numeric
-                                result_df.columns = [f'Column_{i+1}' for i in range(len(result_df.columns))]
-                        else:
-                            result_df = pd.DataFrame()
-                else:
-                    result_df = pd.DataFrame([str(result)])
-                
-                # Display results
-                if not result_df.empty:
-                    st.dataframe(result_df)
-                else:
-                    st.write("No results found.")
-                
-                # Download button for CSV
-                if not result_df.empty:
-                    csv = result_df.to_csv(index=False).encode('utf-8')
-                    st.download_button("Download Results", csv, "results.csv", "text/csv")
-            except Exception as e:
-                st.error(f"Error executing {db_choice} query: {str(e)}")
+            query = st.session_state.generated_query
+            with span("validate", db_type=db_choice.lower()) as stage:
+                valid = db_choice != "MySQL" or validate_sql(query)
+                stage.set_attribute("valid", bool(valid))
+            if not valid:
+                st.error("Invalid MySQL query. Please try again.")
+                return
+            # elif db_choice == "PostgreSQL":
+            #     result = execute_postgres(st.session_state.generated_query)
+            db_type = "mysql" if db_choice == "MySQL" else "mongodb"
+            assessment = None
+            if db_type == "mysql" and COST_GATE_ENABLED:
+                # Estimate the cost with EXPLAIN before running anything expensive
+                assessment = check_query_cost(query)
+                st.session_state.cost_check = (query, assessment)
+            if assessment is None or assessment.verdict != "reject":
+                # Runs on the job queue with a time budget, so it can be cancelled and
+                # survives reruns of this script
+                if st.session_state.get("running_query"):
+                    cancel_query(st.session_state.running_query)  # superseded
+                try:
+                    st.session_state.running_query = start_query(
+                        lambda: execute_query(db_type, query), user_id=session_user()
+                    )
+                except JobQueueFull as e:
+                    st.error(str(e))
+
+        cost_check = st.session_state.get("cost_check")
+        if cost_check and cost_check[0] == st.session_state.generated_query and cost_check[1].verdict != "ok":
+            show_cost_check(cost_check[1], user_query)
+
+        if st.session_state.get("running_query"):
+            wait_for_query(st.session_state.running_query, db_choice)
+
+
+def schema_problems(query: str, db_type: str) -> list:
+    """Problems of the generated query found by the local schema check, computed once per query."""
+    cached = st.session_state.get("schema_problems")
+    if cached is None or cached[0] != (db_type, query):
+        try:
+            problems = check_generated_query(db_type, query)
+        except Exception:
+            problems = []  # no schema to check against; the database will tell
+        cached = st.session_state.schema_problems = ((db_type, query), problems)
+    return cached[1]
+
+
+def show_cost_check(assessment, user_query: str):
+    """Shows a warning or rejection from the cost check, with the option to ask for a cheaper query."""
+    if assessment.verdict == "reject":
+        st.error(f"Query not executed, it looks too expensive: {assessment.summary()}")
+    else:
+        st.warning(f"This query may be expensive: {assessment.summary()}")
+    if assessment.cost is not None and st.button("Regenerate a cheaper query"):
+        previous_query, summary = st.session_state.generated_query, assessment.summary()
+
+        def regenerate(job):
+            return regenerate_cheaper_query(user_query, "mysql", previous_query, summary, on_token=job.set_progress)
+
+        try:
+            st.session_state.generation_job = get_job_queue().submit(session_user(), regenerate, kind="generate")
+        except JobQueueFull as e:
+            st.error(str(e))
+            return
+        st.session_state.cost_check = None
+        st.rerun()
+
+
+def wait_for_generation(job_id: str):
+    """Polls a generation job, showing the streamed completion, and stores the generated query."""
+    queue = get_job_queue()
+    if st.button("Cancel generation"):
+        queue.cancel(job_id)
+    placeholder = st.empty()
+    try:
+        job = queue.get(job_id)
+        while not job.finished:
+            if job.progress:
+                placeholder.code(job.progress)
+            else:
+                placeholder.caption("Queued..." if job.status == "queued" else "Generating query...")
+            job = queue.wait(job_id, timeout=0.25)
+    except KeyError:
+        job = None  # expired
+    finally:
+        placeholder.empty()
+    st.session_state.generation_job = None
+    if job is None or job.status == "cancelled":
+        return
+    if job.status == "failed":
+        st.error(f"Query generation failed: {job.error}")
+        return
+    _, st.session_state.generated_query = job.result
+    st.session_state.running_query = None
+
+
+def wait_for_query(query_id: str, db_choice: str):
+    """
+    Polls a queued or running query and shows its result. A rerun (e.g. clicking Cancel)
+    only stops the polling; the query keeps running on the job queue and its result is
+    shown again on later runs until the next query.
+    """
+    if job_status(query_id) in ("queued", "running") and st.button("Cancel query"):
+        cancel_query(query_id)
+    status = st.empty()
+    try:
+        result = None
+        while result is None:
+            status.caption("Waiting for a worker..." if job_status(query_id) == "queued"
+                           else "Running query...")
+            result = get_query_result(query_id, wait=0.25)
+    except KeyError:
+        # The stored result expired
+        st.session_state.running_query = None
+        result = None
+    finally:
+        status.empty()
+    if result is not None:
+        with span("render", status=result.status):
+            show_query_result(result, db_choice, query_id)
+
+
+def job_status(job_id: str):
+    """Status of a job on the queue, or None once its result has expired."""
+    try:
+        return get_job_queue().get(job_id).status
+    except KeyError:
+        return None
+
+
+def show_query_result(result, db_choice: str, query_id: str):
+    if result.status == "error":
+        st.error(f"Error executing {db_choice} query: {result.message}")
+        return
+    if result.status in ("timeout", "cancelled"):
+        st.warning(f"{result.message} after {result.elapsed:.1f}s.")
+        if result.data is None:
+            return
+        st.info("Showing the rows fetched before the query was stopped.")
+    elif result.truncated:
+        unit = "rows" if db_choice == "MySQL" else "documents"
+        st.warning(f"Result truncated to the first {len(result.data)} {unit}.")
+
+    result_df = result_frame(query_id, result)
+    if result_df.empty:
+        st.write("No results found.")
+        return
+    show_page(result_df, query_id)
+    show_export(result, db_choice, query_id)
+
+
+def result_frame(query_id: str, result):
+    """The result as a DataFrame, converted once per query instead of on every rerun."""
+    cached = st.session_state.get("result_frame")
+    if cached is None or cached[0] != query_id:
+        # Column-wise; ObjectIds become strings, arrays stay lists
+        cached = st.session_state.result_frame = (query_id, result_to_dataframe(result.data))
+    return cached[1]
+
+
+def show_page(result_df, query_id: str):
+    """Shows one page of the result, so only that page is serialised and sent to the browser."""
+    page_count = -(-len(result_df) // RESULT_PAGE_SIZE)
+    page = 1
+    if page_count > 1:
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1,
+                               step=1, key=f"result_page_{query_id}")
+    start = (page - 1) * RESULT_PAGE_SIZE
+    st.dataframe(result_df.iloc[start:start + RESULT_PAGE_SIZE])
+    st.caption(f"Rows {start + 1}-{min(start + RESULT_PAGE_SIZE, len(result_df))} of {len(result_df)}")
+
+
+def show_export(result, db_choice: str, query_id: str):
+    """
+    Offers the result as a download. The file is only written when asked for, in chunks
+    to a temp file, on the job queue with its own time budget (EXPORT_TIMEOUT); a MySQL
+    result truncated for display is streamed again in full.
+    """
+    formats = export_formats()
+    fmt = st.selectbox("Download format", formats, key="export_format") if len(formats) > 1 else formats[0]
+    export = st.session_state.get("export")
+    if export is not None and export[0] == (query_id, fmt) and os.path.exists(export[1].path):
+        export = export[1]
+        if export.truncated:
+            st.warning(f"The download holds the first {export.rows} rows.")
+        with open(export.path, "rb") as file:
+            st.download_button(f"Download {fmt.upper()} ({export.rows} rows)", file, export.file_name, export.mime)
+        return
+    export_job = st.session_state.get("export_job")
+    if export_job is not None and export_job[0] == (query_id, fmt):
+        wait_for_export(export_job[1], (query_id, fmt))
+        return
+    if st.button(f"Prepare {fmt.upper()} download"):
+        db_type = "mysql" if db_choice == "MySQL" else "mongodb"
+        query = st.session_state.generated_query
+        if export_job is not None:
+            cancel_query(export_job[1])  # superseded
+        try:
+            job_id = start_query(lambda: export_result(db_type, query, result.data, result.truncated, fmt),
+                                 timeout=EXPORT_TIMEOUT, user_id=session_user(), kind="export")
+        except JobQueueFull as e:
+            st.error(str(e))
+            return
+        st.session_state.export_job = ((query_id, fmt), job_id)
+        st.rerun()
+
+
+def wait_for_export(job_id: str, export_key: tuple):
+    """Polls an export job and keeps the finished file for the download button."""
+    if job_status(job_id) in ("queued", "running") and st.button("Cancel download"):
+        cancel_query(job_id)
+    status = st.empty()
+    try:
+        outcome = None
+        while outcome is None:
+            status.caption("Waiting for a worker..." if job_status(job_id) == "queued"
+                           else "Writing the download file...")
+            outcome = get_query_result(job_id, wait=0.25)
+    except KeyError:
+        outcome = None  # expired
+    finally:
+        status.empty()
+    st.session_state.export_job = None
+    if outcome is None or outcome.status == "cancelled":
+        return
+    if not outcome.ok:
+        st.error(f"Export failed: {outcome.message}")
+        return
+    export = st.session_state.get("export")
+    if export is not None and os.path.exists(export[1].path):
+        os.remove(export[1].path)  # superseded
+    st.session_state.export = (export_key, outcome.data)
+    st.rerun()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,85 @@
+"""
+Import-time benchmark and regression guard.
+
+Runs `python -X importtime` in fresh interpreters for the package entry points, reports the
+median cumulative import time of each, and checks that heavy optional dependencies (OpenAI
+SDK, database drivers, pandas, NumPy) are not imported before they are used. Exits with a
+non-zero status if a budget is exceeded or a heavy module is imported eagerly, so it can run
+as a CI step.
+
+Usage:
+    python benchmarks/bench_import_time.py --runs 5 --budget-ms 250
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Statement -> modules that must not be imported by it
+ENTRY_POINTS = {
+    "import src.llm": ["openai", "pymysql", "pymongo", "pandas", "numpy", "psycopg2"],
+    "import src.db": ["pymysql", "pymongo", "pandas", "bson", "psycopg2"],
+    "from src.llm import generate_query, get_sql_schema": ["openai", "pymysql", "pymongo", "pandas", "numpy", "psycopg2"],
+    "from src.db import execute_sql, validate_sql": ["pymysql", "pymongo", "pandas", "psycopg2"],
+}
+
+
+def import_profile(statement: str) -> tuple:
+    """
+    Runs `statement` in a fresh interpreter. Returns (total_us, modules) where total_us sums
+    the top-level imports triggered by the statement and modules is {module: cumulative_us}.
+    """
+    env = dict(os.environ, AZURE_OPENAI_API_KEY="benchmark", ENDPOINT_URL="http://localhost")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    total = 0
+    started = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Top-level entries (one space after the separator) are not nested in another import.
+        # Interpreter startup (encodings, site, ...) is logged before the first `src` import.
+        top_level = not name.startswith("  ")
+        started |= top_level and name.strip().startswith("src")
+        if started:
+            modules[name.strip()] = int(cumulative)
+            if top_level:
+                total += int(cumulative)
+    return total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="maximum median import time per entry point")
+    args = parser.parse_args()
+
+    report = {}
+    failed = False
+    for statement, forbidden in ENTRY_POINTS.items():
+        totals = []
+        eager = set()
+        for _ in range(args.runs):
+            total_us, modules = import_profile(statement)
+            totals.append(total_us / 1000)
+            eager |= {name for name in modules if name.split(".")[0] in forbidden}
+        median_ms = statistics.median(totals)
+        eager_roots = sorted({name.split(".")[0] for name in eager})
+        ok = median_ms <= args.budget_ms and not eager_roots
+        failed |= not ok
+        report[statement] = {"median_ms": round(median_ms, 1), "eager_heavy_imports": eager_roots, "ok": ok}
+
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+movie_actors benchmark: JSON_TABLE expansion vs the normalized side table, on live MySQL.
+
+Fills a scratch database with --movies synthetic movies (actors_json arrays of 3-12 names
+drawn with a skewed popularity from --actors names), builds the movie_actors side table
+with its triggers, then runs typical generated queries over actors_json as written (JSON_TABLE)
+and as rewritten by rewrite_json_tables(). Reports the build time, p50 latency, EXPLAIN
+rows examined and whether both forms return the same rows per query, and the cost of the
+sync triggers on inserts and updates of movies, as JSON.
+
+Needs a MySQL 8 server (the connection settings of the app, with the database replaced by
+--database, which is created and overwritten). Data generation is skipped when the scratch
+database already holds --movies movies.
+
+Usage:
+    python benchmarks/bench_movie_actors.py --movies 1000000 --runs 5
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("ENDPOINT_URL", "http://localhost")
+
+from src.databases.json_stream import batched  # noqa: E402
+from src.databases.mysql.bulk_import import BatchWriter  # noqa: E402
+from src.db.movie_actors import (SIDE_TABLE, TRIGGERS,  # noqa: E402
+                                 build_side_table, create_side_table,
+                                 drop_side_table, rewrite_json_tables)
+from src.db.query_cost import parse_explain  # noqa: E402
+from src.db.rdbms_connector import RDBMS_SETTINGS  # noqa: E402
+
+MOVIE_COLUMNS = ["name", "year", "runtime", "director_id", "actors_json"]
+TABLES = [
+    "DROP TABLE IF EXISTS movies",
+    "DROP TABLE IF EXISTS actors",
+    """CREATE TABLE movies (
+        movie_id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255), year INT, runtime INT, director_id INT, actors_json JSON
+    )""",
+    """CREATE TABLE actors (
+        actor_id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255), UNIQUE KEY (name)
+    )""",
+]
+
+# (label, query as the LLM writes it); {actor} is a popular actor name
+QUERIES = [
+    ("movies_of_actor",
+     "SELECT m.name, m.year FROM movies m JOIN JSON_TABLE(m.actors_json, '$[*]' "
+     "COLUMNS(actor_name VARCHAR(255) PATH '$')) AS jt WHERE JSON_VALID(m.actors_json) "
+     "AND jt.actor_name = '{actor}' ORDER BY m.year, m.name"),
+    ("movie_count_of_actor",
+     "SELECT COUNT(*) AS movie_count FROM movies m, JSON_TABLE(m.actors_json, '$[*]' "
+     "COLUMNS(actor VARCHAR(255) PATH '$')) jt WHERE jt.actor = '{actor}'"),
+    ("co_stars",
+     "SELECT b.actor_name, COUNT(*) AS movies_together FROM movies m "
+     "JOIN JSON_TABLE(m.actors_json, '$[*]' COLUMNS(actor_name VARCHAR(255) PATH '$')) AS a "
+     "JOIN JSON_TABLE(m.actors_json, '$[*]' COLUMNS(actor_name VARCHAR(255) PATH '$')) AS b "
+     "WHERE a.actor_name = '{actor}' AND b.actor_name <> a.actor_name "
+     "GROUP BY b.actor_name ORDER BY movies_together DESC, b.actor_name LIMIT 10"),
+    ("actors_in_year",
+     "SELECT COUNT(DISTINCT jt.actor_id) AS unique_actors FROM movies m "
+     "JOIN JSON_TABLE(m.actors_json, '$[*]' COLUMNS(actor_id VARCHAR(255) PATH '$')) AS jt "
+     "WHERE JSON_VALID(m.actors_json) AND m.year = 1999"),
+    ("top_actors",
+     "SELECT jt.actor_name, COUNT(*) AS movie_count FROM movies m "
+     "JOIN JSON_TABLE(m.actors_json, '$[*]' COLUMNS(actor_name VARCHAR(255) PATH '$')) AS jt "
+     "GROUP BY jt.actor_name ORDER BY movie_count DESC, jt.actor_name LIMIT 10"),
+]
+
+
+def connect(args):
+    import pymysql
+
+    settings = {**RDBMS_SETTINGS, "host": args.host, "user": args.user}
+    if args.password is not None:
+        settings["password"] = args.password
+    settings.pop("database")
+    connection = pymysql.connect(**settings, charset="utf8mb4")
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{args.database}`")
+        cursor.execute(f"USE `{args.database}`")
+    return connection
+
+
+def actor_names(count: int) -> list:
+    return [f"Actor {i:07d}" for i in range(count)]
+
+
+def pick_actors(rng: random.Random, names: list) -> list:
+    # Pareto-distributed indexes: a few actors appear in many movies, most in a handful
+    picked = {min(int(rng.paretovariate(1.2)) - 1, len(names) - 1) if rng.random() < 0.3
+              else rng.randrange(len(names)) for _ in range(rng.randint(3, 12))}
+    return [names[i] for i in sorted(picked)]
+
+
+def movie_rows(rng: random.Random, names: list, count: int, start: int = 0):
+    for i in range(start, start + count):
+        yield (f"Movie {i}", rng.randint(1950, 2024), rng.randint(70, 200), rng.randint(1, 5000),
+               json.dumps(pick_actors(rng, names)))
+
+
+def generate(connection, args) -> float:
+    rng = random.Random(args.seed)
+    names = actor_names(args.actors)
+    start = time.perf_counter()
+    drop_side_table(connection)
+    with connection.cursor() as cursor:
+        for statement in TABLES:
+            cursor.execute(statement)
+    connection.commit()
+    writer = BatchWriter(connection, "actors", ["name"], "executemany")
+    for batch in batched(((name,) for name in names), args.batch_size):
+        writer.write(batch)
+    writer = BatchWriter(connection, "movies", MOVIE_COLUMNS, "executemany")
+    for batch in batched(movie_rows(rng, names, args.movies), args.batch_size):
+        writer.write(batch)
+    return time.perf_counter() - start
+
+
+def movie_count(connection) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() "
+                       "AND TABLE_NAME = 'movies'")
+        if not cursor.fetchone()[0]:
+            return 0
+        cursor.execute("SELECT COUNT(*) FROM movies")
+        return cursor.fetchone()[0]
+
+
+def run_query(connection, sql: str, runs: int) -> tuple:
+    timings, rows = [], None
+    with connection.cursor() as cursor:
+        for _ in range(runs):
+            start = time.perf_counter()
+            cursor.execute(sql)
+            rows = cursor.fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        cursor.execute("EXPLAIN FORMAT=JSON " + sql)
+        cost = parse_explain(json.loads(cursor.fetchone()[0]))
+    return statistics.median(timings), cost.rows_examined, sorted(rows)
+
+
+def compare_queries(connection, actor: str, runs: int) -> list:
+    results = []
+    for label, template in QUERIES:
+        original = template.format(actor=actor)
+        rewritten = rewrite_json_tables(original)
+        json_ms, json_rows, json_result = run_query(connection, original, runs)
+        side_ms, side_rows, side_result = run_query(connection, rewritten, runs)
+        results.append({
+            "query": label,
+            "rewritten": rewritten != original,
+            "json_table_ms_p50": round(json_ms, 1),
+            "side_table_ms_p50": round(side_ms, 1),
+            "speedup": round(json_ms / side_ms, 1) if side_ms else None,
+            "json_table_rows_examined": json_rows,
+            "side_table_rows_examined": side_rows,
+            "same_result": json_result == side_result,
+        })
+    return results
+
+
+def timed_writes(connection, args, names: list, check: bool) -> dict:
+    """
+    Inserts, updates and deletes --write-rows movies. With `check`, also compares the side
+    table with the JSON arrays after the update and looks for rows left after the delete.
+    """
+    rng = random.Random(args.seed + 1)
+    rows = list(movie_rows(rng, names, args.write_rows, start=args.movies))
+    report = {}
+    with connection.cursor() as cursor:
+        start = time.perf_counter()
+        cursor.executemany(f"INSERT INTO movies ({', '.join(MOVIE_COLUMNS)}) VALUES (%s, %s, %s, %s, %s)", rows)
+        connection.commit()
+        report["insert_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        cursor.execute("SELECT movie_id FROM movies ORDER BY movie_id DESC LIMIT %s", (args.write_rows,))
+        ids = [row[0] for row in cursor.fetchall()]
+        in_ids = f"movie_id IN ({', '.join(['%s'] * len(ids))})"
+
+        start = time.perf_counter()
+        cursor.executemany("UPDATE movies SET actors_json = %s WHERE movie_id = %s",
+                           [(json.dumps(pick_actors(rng, names)), movie_id) for movie_id in ids])
+        connection.commit()
+        report["update_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        if check:
+            cursor.execute(f"SELECT (SELECT SUM(JSON_LENGTH(actors_json)) FROM movies WHERE {in_ids}), "
+                           f"(SELECT COUNT(*) FROM {SIDE_TABLE} WHERE {in_ids})", ids + ids)
+            expected, actual = cursor.fetchone()
+            report["side_table_in_sync"] = int(expected) == actual
+
+        start = time.perf_counter()
+        cursor.execute(f"DELETE FROM movies WHERE {in_ids}", ids)
+        connection.commit()
+        report["delete_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        if check:
+            cursor.execute(f"SELECT COUNT(*) FROM {SIDE_TABLE} WHERE {in_ids}", ids)
+            report["side_rows_left_after_delete"] = cursor.fetchone()[0]
+    return report
+
+
+def trigger_overhead(connection, args) -> dict:
+    names = actor_names(args.actors)
+    with_triggers = timed_writes(connection, args, names, check=True)
+    with connection.cursor() as cursor:
+        for trigger in TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    connection.commit()
+    try:
+        without_triggers = timed_writes(connection, args, names, check=False)
+    finally:
+        # The movies written without triggers are gone again, so the side table is still in sync
+        create_side_table(connection)
+    return {"rows": args.write_rows, "with_triggers": with_triggers, "without_triggers": without_triggers}
+
+
+def popular_actor(connection) -> str:
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT actor_name FROM {SIDE_TABLE} GROUP BY actor_name ORDER BY COUNT(*) DESC LIMIT 1 "
+                       "OFFSET 5")
+        return cursor.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--movies", type=int, default=1000000)
+    parser.add_argument("--actors", type=int, default=200000, help="distinct actor names")
+    parser.add_argument("--runs", type=int, default=5, help="timed executions per query")
+    parser.add_argument("--write-rows", type=int, default=2000, help="movies inserted/updated for the trigger cost")
+    parser.add_argument("--batch-size", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--host", default=RDBMS_SETTINGS["host"])
+    parser.add_argument("--user", default=RDBMS_SETTINGS["user"])
+    parser.add_argument("--password", default=None, help="defaults to the password in rdbms_connector")
+    parser.add_argument("--database", default="chatdb_bench_movie_actors", help="scratch database (overwritten)")
+    args = parser.parse_args()
+
+    connection = connect(args)
+    try:
+        report = {"movies": args.movies, "actors": args.actors}
+        if movie_count(connection) != args.movies:
+            report["generate_s"] = round(generate(connection, args), 1)
+        start = time.perf_counter()
+        report["side_table_rows"] = build_side_table(connection, args.batch_size)
+        report["side_table_build_s"] = round(time.perf_counter() - start, 1)
+        actor = popular_actor(connection)
+        report["actor"] = actor
+        report["queries"] = compare_queries(connection, actor, args.runs)
+        report["triggers"] = trigger_overhead(connection, args)
+    finally:
+        connection.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
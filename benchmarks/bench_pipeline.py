@@ -0,0 +1,408 @@
+"""
+End-to-end pipeline benchmark: natural language question to DataFrame.
+
+Replays a corpus of questions through generate_query() with a deterministic fake
+call_llm_api (fixed completions, simulated latency), then extract_sql_from_response(),
+rewrite_field_for_json(), validate_sql() (parse_mongo_query() for MongoDB), execute_sql()
+(fetch_nosql()) and result_to_dataframe(). Reports p50/p95/p99 per stage, throughput for
+each number of concurrent clients, and memory, as JSON.
+
+By default the databases are local stand-ins: a SQLite file with synthetic movie data
+behind the MySQL connection pool and mongomock loaded with the sales sample data. Use
+--backend live to run against the MySQL and MongoDB configured for the app.
+
+The "generate" stage contains the LLM call, extraction and rewriting; "llm", "extract"
+and "rewrite" are also reported on their own. With --compare, p95 latencies are checked
+against an earlier --output file and the script exits 1 on a regression.
+
+Usage:
+    python benchmarks/bench_pipeline.py --clients 1,4,16 --requests 50 --output pipeline.json
+    python benchmarks/bench_pipeline.py --compare pipeline.json --tolerance 0.2
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("ENDPOINT_URL", "http://localhost")
+
+import numpy as np  # noqa: E402
+
+from src.db import query_execution, rdbms_connector  # noqa: E402
+from src.db.mongo_query import parse_mongo_query  # noqa: E402
+from src.db.result_conversion import result_to_dataframe  # noqa: E402
+from src.llm import query_processing  # noqa: E402
+
+MONGO_DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "src", "databases", "mongodb")
+STAGES = ["generate", "llm", "extract", "rewrite", "validate", "execute", "dataframe", "total"]
+
+# (db type, question, query the fake LLM answers with); portable between MySQL and SQLite
+CORPUS = [
+    ("mysql", "How many movies were released after 2000?",
+     "SELECT COUNT(*) AS movie_count FROM movies WHERE year > 2000"),
+    ("mysql", "What are the 10 longest movies?",
+     "SELECT name, runtime FROM movies ORDER BY runtime DESC LIMIT 10"),
+    ("mysql", "Which 5 directors made the most movies?",
+     "SELECT d.name, COUNT(*) AS movie_count FROM directors d JOIN movies m ON m.director_id = d.director_id "
+     "GROUP BY d.name ORDER BY movie_count DESC LIMIT 5"),
+    ("mysql", "What is the average runtime per year?",
+     "SELECT year, AVG(runtime) AS avg_runtime FROM movies GROUP BY year ORDER BY year"),
+    ("mysql", "List all movies from the 1990s",
+     "SELECT name, year, release_date FROM movies WHERE year BETWEEN 1990 AND 1999"),
+    ("mysql", "Which directors were born in the USA?",
+     "SELECT name, birthplace FROM directors WHERE birthplace LIKE '%USA%'"),
+    ("mysql", "Show the first 100 actors alphabetically",
+     "SELECT name FROM actors ORDER BY name LIMIT 100"),
+    ("mongodb", "Which orders have a quantity of at least 3?",
+     'db["orders"].find({"quantity": {"$gte": 3}})'),
+    ("mongodb", "List the names and emails of 50 customers",
+     'db["customers"].find({}, {"name": 1, "email": 1}).limit(50)'),
+    ("mongodb", "What are the 10 best selling products?",
+     'db["orders"].aggregate([{"$group": {"_id": "$product_id", "total": {"$sum": "$quantity"}}}, '
+     '{"$sort": {"total": -1}}, {"$limit": 10}])'),
+    ("mongodb", "Show electronics products from most to least expensive",
+     'db["products"].find({"category": "Electronics"}).sort("price", -1)'),
+    ("mongodb", "How many orders were placed in 2024?",
+     'db["orders"].count_documents({"order_date": {"$gte": "2024-01-01"}})'),
+]
+
+
+class FakeLLM:
+    """Answers each corpus question with its fixed query after a deterministic delay."""
+
+    def __init__(self, latency_ms: float, jitter_ms: float):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.answers = {question: (db_type, query) for db_type, question, query in CORPUS}
+        self.local = threading.local()
+
+    def __call__(self, messages: list) -> str:
+        start = time.perf_counter()
+        question = next(message["content"] for message in messages if message["role"] == "user")
+        db_type, query = self.answers[question]
+        # Same delay for the same question on every run
+        jitter = int(hashlib.sha256(question.encode()).hexdigest(), 16) % 1000 / 1000 * self.jitter_ms
+        time.sleep((self.latency_ms + jitter) / 1000)
+        language = "sql" if db_type == "mysql" else "python"
+        self.local.completion = f"```{language}\n{query}\n```"
+        self.local.elapsed_ms = (time.perf_counter() - start) * 1000
+        return self.local.completion
+
+
+class SQLiteConnection:
+    """Enough of a PyMySQL connection on top of sqlite3 for the pool and execute_sql."""
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+
+    def cursor(self):
+        return SQLiteCursor(self.connection.cursor())
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
+
+    def ping(self, reconnect=False):
+        self.connection.execute("SELECT 1")
+
+    def thread_id(self):
+        return threading.get_ident()
+
+
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cursor.close()
+
+    def execute(self, query, args=None):
+        self.cursor.execute(query.replace("%s", "?"), args or ())
+        return self.cursor.rowcount
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def fetchmany(self, size):
+        return self.cursor.fetchmany(size)
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+
+def build_sqlite(path: str, movies: int, seed: int) -> dict:
+    """Creates the movie tables with synthetic rows and returns the schema the LLM prompt sees."""
+    rng = random.Random(seed)
+    places = ["New York, USA", "London, UK", "Paris, France", "Los Angeles, USA", "Tokyo, Japan"]
+    directors, actors = max(movies // 20, 1), max(movies // 5, 1)
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE directors (director_id INTEGER PRIMARY KEY, name TEXT, birthname TEXT, birthdate TEXT,
+                                birthplace TEXT);
+        CREATE TABLE actors (actor_id INTEGER PRIMARY KEY, name TEXT, birthname TEXT, birthdate TEXT,
+                             birthplace TEXT);
+        CREATE TABLE movies (movie_id INTEGER PRIMARY KEY, name TEXT, year INTEGER, runtime INTEGER,
+                             release_date TEXT, director_id INTEGER, actors_json TEXT, storyline TEXT);
+    """)
+    connection.executemany("INSERT INTO directors VALUES (?, ?, ?, ?, ?)", [
+        (i, f"Director {i}", f"Birthname {i}", f"19{rng.randint(20, 89)}-01-01", rng.choice(places))
+        for i in range(1, directors + 1)
+    ])
+    connection.executemany("INSERT INTO actors VALUES (?, ?, ?, ?, ?)", [
+        (i, f"Actor {i}", f"Birthname {i}", f"19{rng.randint(30, 99)}-01-01", rng.choice(places))
+        for i in range(1, actors + 1)
+    ])
+    rows = []
+    for i in range(1, movies + 1):
+        year = rng.randint(1950, 2024)
+        cast = [f"Actor {rng.randint(1, actors)}" for _ in range(5)]
+        rows.append((i, f"Movie {i}", year, rng.randint(70, 200), f"{year}-06-01", rng.randint(1, directors),
+                     json.dumps(cast), "A storyline " * 10))
+    connection.executemany("INSERT INTO movies VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    connection.commit()
+
+    schema = {}
+    for (table,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+        schema[table] = {name: (column_type.lower() or "text")
+                         for _, name, column_type, *_ in connection.execute(f"PRAGMA table_info({table})")}
+    schema["movies"]["actors_json"] = "array<string>"
+    connection.close()
+    return schema
+
+
+def build_mongomock(scale: int):
+    import mongomock
+
+    from src.databases.json_stream import iter_json_records
+
+    db = mongomock.MongoClient()["sales"]
+    for name in ("customers", "orders", "products"):
+        documents = list(iter_json_records(os.path.join(MONGO_DATA_DIR, name + ".json")))
+        copies = scale if name == "orders" else 1
+        db[name].insert_many([dict(document) for _ in range(copies) for document in documents])
+    return db
+
+
+@contextlib.contextmanager
+def stand_ins(args):
+    """Points the app at SQLite/mongomock and the fake LLM for the duration of the benchmark."""
+    from unittest import mock
+
+    fake = FakeLLM(args.llm_latency_ms, args.llm_jitter_ms)
+    patches = [mock.patch.object(query_processing, "call_llm_api", fake)]
+    with tempfile.TemporaryDirectory() as directory:
+        if args.backend == "standin":
+            path = os.path.join(directory, "movies.sqlite3")
+            sql_schema = build_sqlite(path, args.movies, args.seed)
+            db = build_mongomock(args.mongo_scale)
+            nosql_schema = query_processing._build_nosql_schema(db)
+            patches += [
+                mock.patch.object(rdbms_connector, "open_rdbms_connection", lambda: SQLiteConnection(path)),
+                mock.patch.object(query_execution, "connect_to_nosql", lambda: db),
+                mock.patch.object(query_processing, "get_sql_schema", lambda use_cache=True: sql_schema),
+                mock.patch.object(query_processing, "get_nosql_schema", lambda use_cache=True: nosql_schema),
+            ]
+        with contextlib.ExitStack() as stack:
+            for patch in patches:
+                stack.enter_context(patch)
+            yield fake
+
+
+def run_request(fake: FakeLLM, db_type: str, question: str, use_cache: bool) -> dict:
+    """Runs one question through every stage and returns {stage: milliseconds}."""
+    timings = {}
+    fake.local.elapsed_ms = 0.0
+    start = time.perf_counter()
+
+    t0 = time.perf_counter()
+    _, query = query_processing.generate_query(question, db_type, use_cache=use_cache)
+    timings["generate"] = (time.perf_counter() - t0) * 1000
+    timings["llm"] = fake.local.elapsed_ms
+    completion = getattr(fake.local, "completion", "")
+
+    t0 = time.perf_counter()
+    extracted = query_processing.extract_sql_from_response(completion)
+    timings["extract"] = (time.perf_counter() - t0) * 1000
+
+    if db_type == "mysql":
+        schema = query_processing.get_sql_schema()
+        t0 = time.perf_counter()
+        query_processing.rewrite_field_for_json(schema, extracted)
+        timings["rewrite"] = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        if not query_execution.validate_sql(query):
+            raise ValueError(f"Invalid SQL: {query}")
+        timings["validate"] = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        result = query_execution.execute_sql(query, use_cache=use_cache)
+        timings["execute"] = (time.perf_counter() - t0) * 1000
+        if isinstance(result, str):
+            raise ValueError(result)
+    else:
+        t0 = time.perf_counter()
+        parse_mongo_query.__wrapped__(query)  # uncached, as for a new query
+        timings["validate"] = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        result, _ = query_execution.fetch_nosql(query)
+        timings["execute"] = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    result_to_dataframe(result)
+    timings["dataframe"] = (time.perf_counter() - t0) * 1000
+    timings["total"] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def run_level(fake: FakeLLM, corpus: list, clients: int, requests: int, use_cache: bool, trace_memory: bool) -> dict:
+    """Runs `requests` questions on each of `clients` concurrent threads."""
+    samples, errors = [], []
+    lock = threading.Lock()
+
+    def client(index: int):
+        for i in range(requests):
+            db_type, question, _ = corpus[(index + i) % len(corpus)]
+            try:
+                timings = run_request(fake, db_type, question, use_cache)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{question}: {e}")
+                continue
+            with lock:
+                samples.append(timings)
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(client, range(clients)))
+    wall = time.perf_counter() - start
+    traced_peak = None
+    if trace_memory:
+        traced_peak = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        tracemalloc.stop()
+
+    stages = {}
+    for stage in STAGES:
+        values = [timings[stage] for timings in samples if stage in timings]
+        if values:
+            stages[stage] = {
+                "p50": round(float(np.percentile(values, 50)), 3),
+                "p95": round(float(np.percentile(values, 95)), 3),
+                "p99": round(float(np.percentile(values, 99)), 3),
+                "mean": round(float(np.mean(values)), 3),
+            }
+    return {
+        "clients": clients,
+        "requests": len(samples),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(samples) / wall, 2) if wall else 0.0,
+        "stages": stages,
+        "peak_rss_mb": peak_rss_mb(),
+        "traced_peak_mb": traced_peak,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """p95 regressions beyond `tolerance` (0.2 = 20% slower) per client count and stage."""
+    regressions = []
+    previous = {level["clients"]: level for level in baseline.get("levels", [])}
+    for level in report["levels"]:
+        old = previous.get(level["clients"])
+        if old is None:
+            continue
+        for stage, values in level["stages"].items():
+            before = old["stages"].get(stage, {}).get("p95")
+            if before and values["p95"] > before * (1 + tolerance):
+                regressions.append(f"{level['clients']} clients, {stage}: p95 {before} -> {values['p95']} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["standin", "live"], default="standin")
+    parser.add_argument("--db", choices=["mysql", "mongodb", "both"], default="both")
+    parser.add_argument("--clients", default="1,4,16", help="comma-separated numbers of concurrent clients")
+    parser.add_argument("--requests", type=int, default=50, help="questions per client")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--movies", type=int, default=20000, help="synthetic movies in the SQLite stand-in")
+    parser.add_argument("--mongo-scale", type=int, default=10, help="copies of the sample orders in mongomock")
+    parser.add_argument("--use-cache", action="store_true", help="allow the LLM and result caches")
+    parser.add_argument("--trace-memory", action="store_true", help="also report the tracemalloc peak (slower)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="earlier JSON report to check p95 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    corpus = [entry for entry in CORPUS if args.db in ("both", entry[0])]
+    levels = []
+    with stand_ins(args) as fake:
+        # generate_query and the connectors print progress; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            for clients in [int(value) for value in args.clients.split(",") if value.strip()]:
+                levels.append(run_level(fake, corpus, clients, args.requests, args.use_cache, args.trace_memory))
+
+    report = {
+        "backend": args.backend,
+        "db": args.db,
+        "corpus": len(corpus),
+        "llm_latency_ms": args.llm_latency_ms,
+        "llm_jitter_ms": args.llm_jitter_ms,
+        "use_cache": args.use_cache,
+        "levels": levels,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
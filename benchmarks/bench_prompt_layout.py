@@ -0,0 +1,179 @@
+"""
+Prompt layout benchmark: prompt tokens and LLM latency with provider-side prefix caching.
+
+Builds the generation prompt for a fixed set of questions in two layouts and sends it to a
+local fake LLM that models prompt caching the way hosted providers do: the longest prefix
+shared with an earlier prompt is served from cache once it reaches --min-cached-tokens,
+in --cache-block-tokens increments, and cached tokens cost a fraction (--cached-cost) of
+the prefill time of uncached ones.
+
+  before  one system message rebuilt with an f-string on every call, holding the MySQL
+          and MongoDB rules followed by the schema (the layout before src/llm/prompts.py)
+  after   prompts.build_messages(): the static rules of the target database, the schema
+          block memoized per schema fingerprint, then the question
+
+Both layouts prune the schema the same way. Reports prompt and cached tokens, prompt
+build time and the simulated LLM latency per layout, as JSON. The "after" rules block is
+below the default --min-cached-tokens, so its cached fraction stays at 0 unless the pruned
+schema blocks are large (see the src/llm/prompts.py docstring).
+
+Usage:
+    python benchmarks/bench_prompt_layout.py --rounds 3 --tables 40
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("ENDPOINT_URL", "http://localhost")
+
+from src.llm import prompts  # noqa: E402
+from src.llm.schema_pruning import (estimate_tokens, prune_schema,  # noqa: E402
+                                    serialize_schema)
+
+QUESTIONS = [
+    ("mysql", "How many movies were released after 2000?"),
+    ("mysql", "What are the 10 longest movies?"),
+    ("mysql", "Which 5 directors made the most movies?"),
+    ("mysql", "What is the average movie runtime per year?"),
+    ("mysql", "Which actors appear in the most movies?"),
+    ("mysql", "Which directors were born in the USA?"),
+    ("mongodb", "Which orders have a quantity of at least 3?"),
+    ("mongodb", "List the names and emails of 50 customers"),
+    ("mongodb", "What are the 10 best selling products?"),
+    ("mongodb", "How many orders were placed in 2024?"),
+]
+
+MONGO_SCHEMA = {
+    "customers": {"customer_id": "string", "name": "string", "email": "string", "city": "string",
+                  "signup_date": "string"},
+    "orders": {"order_id": "string", "customer_id": "string", "product_id": "string", "quantity": "int",
+               "order_date": "string", "status": "string"},
+    "products": {"product_id": "string", "name": "string", "category": "string", "price": "float",
+                 "tags": "array<string>"},
+}
+
+
+def movie_schema(tables: int) -> dict:
+    """The movie tables plus `tables` synthetic ones, so pruning has something to drop."""
+    schema = {
+        "movies": {"movie_id": "int", "name": "varchar(255)", "year": "int", "runtime": "int",
+                   "release_date": "date", "director_id": "int", "actors_json": "array<string>"},
+        "directors": {"director_id": "int", "name": "varchar(255)", "birthplace": "varchar(255)",
+                      "birth_date": "date"},
+        "actors": {"actor_id": "int", "name": "varchar(255)", "birth_date": "date"},
+    }
+    for i in range(tables):
+        schema[f"archive_{i}"] = {f"archive_{i}_id": "int", "label": "varchar(64)", "payload": "text",
+                                  "created_at": "datetime", "movie_id": "int"}
+    return schema
+
+
+def legacy_messages(db_type: str, schema: dict, question: str) -> list:
+    # Rebuilt on every call, both dialects included, schema inside the same message
+    desc = prompts.DB_TYPE_NAMES[db_type]
+    schema_str = serialize_schema(schema)
+    system_prompt = f"""
+{prompts.INTRO.format(db_type_desc=desc)}{prompts.GENERAL_RULES}{prompts.MYSQL_RULES}{prompts.MONGODB_RULES}
+Schema:
+{schema_str}
+"""
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": question}]
+
+
+class PrefixCachingLLM:
+    """Simulates prefill latency with a provider-style prompt prefix cache."""
+
+    def __init__(self, base_ms: float, prefill_ms_per_1k: float, cached_cost: float,
+                 min_cached_tokens: int, block_tokens: int):
+        self.base_ms = base_ms
+        self.prefill_ms_per_1k = prefill_ms_per_1k
+        self.cached_cost = cached_cost
+        self.min_cached_tokens = min_cached_tokens
+        self.block_tokens = block_tokens
+        self.seen = []
+
+    def cached_tokens(self, prompt: str) -> int:
+        shared = max((len(os.path.commonprefix([prompt, earlier])) for earlier in self.seen), default=0)
+        tokens = estimate_tokens(prompt[:shared]) if shared else 0
+        if tokens < self.min_cached_tokens:
+            return 0
+        return tokens - tokens % self.block_tokens
+
+    def __call__(self, messages: list) -> dict:
+        prompt = "".join(f"<|{message['role']}|>{message['content']}" for message in messages)
+        prompt_tokens = estimate_tokens(prompt)
+        cached = min(self.cached_tokens(prompt), prompt_tokens)
+        self.seen.append(prompt)
+        effective = (prompt_tokens - cached) + cached * self.cached_cost
+        start = time.perf_counter()
+        time.sleep((self.base_ms + effective / 1000 * self.prefill_ms_per_1k) / 1000)
+        return {"prompt_tokens": prompt_tokens, "cached_tokens": cached,
+                "latency_ms": (time.perf_counter() - start) * 1000}
+
+
+def build(layout: str, db_type: str, pruned: dict, question: str) -> list:
+    if layout == "before":
+        return legacy_messages(db_type, pruned, question)
+    return prompts.build_messages(db_type, pruned, question, fingerprint=("benchmark", db_type))[0]
+
+
+def run_layout(layout: str, schemas: dict, rounds: int, build_repeats: int, llm: PrefixCachingLLM) -> dict:
+    build_us, latency_ms, prompt_tokens, cached_tokens = [], [], 0, 0
+    for _ in range(rounds):
+        for db_type, question in QUESTIONS:
+            pruned, _ = prune_schema(question, schemas[db_type])
+            # Microseconds per build are too short to time one at a time
+            start = time.perf_counter()
+            for _ in range(build_repeats):
+                messages = build(layout, db_type, pruned, question)
+            build_us.append((time.perf_counter() - start) / build_repeats * 1e6)
+            usage = llm(messages)
+            prompt_tokens += usage["prompt_tokens"]
+            cached_tokens += usage["cached_tokens"]
+            latency_ms.append(usage["latency_ms"])
+    requests = len(latency_ms)
+    return {
+        "layout": layout,
+        "requests": requests,
+        "prompt_tokens_per_request": round(prompt_tokens / requests, 1),
+        "cached_tokens_per_request": round(cached_tokens / requests, 1),
+        "cached_fraction": round(cached_tokens / prompt_tokens, 3),
+        "prompt_build_us_p50": round(statistics.median(build_us), 1),
+        "llm_latency_ms_mean": round(statistics.fmean(latency_ms), 2),
+        "llm_latency_ms_p50": round(statistics.median(latency_ms), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the question set")
+    parser.add_argument("--tables", type=int, default=40, help="synthetic tables added to the movie schema")
+    parser.add_argument("--build-repeats", type=int, default=200, help="prompt builds timed per request")
+    parser.add_argument("--base-ms", type=float, default=20.0, help="fixed latency per request")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=40.0, help="latency per 1000 uncached tokens")
+    parser.add_argument("--cached-cost", type=float, default=0.1, help="cost of a cached token relative to an uncached one")
+    parser.add_argument("--min-cached-tokens", type=int, default=1024)
+    parser.add_argument("--cache-block-tokens", type=int, default=128)
+    args = parser.parse_args()
+
+    schemas = {"mysql": movie_schema(args.tables), "mongodb": MONGO_SCHEMA}
+    results = []
+    for layout in ("before", "after"):
+        llm = PrefixCachingLLM(args.base_ms, args.prefill_ms_per_1k, args.cached_cost,
+                               args.min_cached_tokens, args.cache_block_tokens)
+        results.append(run_layout(layout, schemas, args.rounds, args.build_repeats, llm))
+    before, after = results
+    print(json.dumps({
+        "results": results,
+        "prompt_tokens_saved": round(1 - after["prompt_tokens_per_request"] / before["prompt_tokens_per_request"], 3),
+        "llm_latency_saved": round(1 - after["llm_latency_ms_mean"] / before["llm_latency_ms_mean"], 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
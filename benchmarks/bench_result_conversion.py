@@ -0,0 +1,116 @@
+"""
+Result-to-DataFrame conversion benchmark.
+
+Compares the per-row cleanup loop the app used to run (clean_mongodb_data on every document,
+tuple unwrapping per row) with the column-wise conversion in src.db.result_conversion, for
+synthetic MongoDB documents and SQL rows.
+
+Usage:
+    python benchmarks/bench_result_conversion.py --sizes 10000,100000,1000000
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pandas as pd  # noqa: E402
+from bson import ObjectId  # noqa: E402
+
+from src.db.query_execution import clean_mongodb_data  # noqa: E402
+from src.db.result_conversion import result_to_dataframe  # noqa: E402
+
+GENRES = ["Drama", "Comedy", "Action", "Thriller", "Horror", "Romance", "Documentary"]
+
+
+def synthetic_documents(count: int, rng: random.Random) -> list:
+    base = datetime.datetime(1970, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Movie {i}",
+            "year": rng.randint(1950, 2024),
+            "rating": round(rng.uniform(1, 10), 1),
+            "released": base + datetime.timedelta(days=rng.randint(0, 20000)),
+            "genres": rng.sample(GENRES, 2),
+        }
+        for i in range(count)
+    ]
+
+
+def synthetic_rows(count: int, rng: random.Random) -> list:
+    return [(i, f"Movie {i}", rng.randint(1950, 2024), round(rng.uniform(1, 10), 1)) for i in range(count)]
+
+
+def legacy_documents(result: list) -> pd.DataFrame:
+    # The app's previous MongoDB path
+    result = [clean_mongodb_data(item) for item in result]
+    return pd.DataFrame(result)
+
+
+def legacy_rows(result: list) -> pd.DataFrame:
+    # The app's previous path for results that are not lists of dicts
+    cleaned_result = []
+    for item in result:
+        if hasattr(item, 'items'):
+            cleaned_item = dict(item)
+        else:
+            while isinstance(item, tuple):
+                if len(item) == 1:
+                    item = item[0]
+                else:
+                    break
+            if isinstance(item, tuple):
+                cleaned_item = list(item)
+            else:
+                cleaned_item = [item]
+        cleaned_result.append(cleaned_item)
+    result_df = pd.DataFrame(cleaned_result)
+    result_df.columns = [f'Column_{i+1}' for i in range(len(result_df.columns))]
+    return result_df
+
+
+def timed(fn, data) -> float:
+    gc.collect()
+    start = time.perf_counter()
+    fn(data)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {}
+    for size in (int(value) for value in args.sizes.split(",")):
+        documents = synthetic_documents(size, rng)
+        legacy = timed(legacy_documents, documents)
+        vectorized = timed(result_to_dataframe, documents)
+        del documents
+        rows = synthetic_rows(size, rng)
+        legacy_sql = timed(legacy_rows, rows)
+        vectorized_sql = timed(result_to_dataframe, rows)
+        del rows
+        report[size] = {
+            "mongodb_legacy_s": round(legacy, 3),
+            "mongodb_columnwise_s": round(vectorized, 3),
+            "mongodb_speedup": round(legacy / vectorized, 1),
+            "sql_rows_legacy_s": round(legacy_sql, 3),
+            "sql_rows_columnwise_s": round(vectorized_sql, 3),
+            "sql_rows_speedup": round(legacy_sql / vectorized_sql, 1),
+        }
+        print(json.dumps({size: report[size]}), flush=True)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
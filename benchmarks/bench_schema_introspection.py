@@ -0,0 +1,121 @@
+"""
+Schema introspection benchmark.
+
+Compares the legacy per-table introspection (SHOW TABLES + DESCRIBE per table + one sampling
+query per JSON/TEXT column) with the bulk information_schema path used by get_sql_schema(),
+against a synthetic schema served by an in-process fake connection that charges a fixed
+latency per round trip.
+
+Usage:
+    python benchmarks/bench_schema_introspection.py --tables 300 --rtt-ms 1.0
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("ENDPOINT_URL", "http://localhost")
+
+from src.llm.query_processing import _build_sql_schema, infer_json_array_type  # noqa: E402
+
+
+class SyntheticSchemaConnection:
+    """Minimal pymysql-like connection answering the introspection queries for a synthetic schema."""
+
+    def __init__(self, tables: int, columns: int, json_columns: int, rtt: float):
+        self.rtt = rtt
+        self.round_trips = 0
+        self.tables = {}
+        for t in range(tables):
+            cols = [("id", "int")] + [(f"col_{c}", "varchar(255)") for c in range(columns - json_columns - 1)]
+            cols += [(f"json_{c}", "json") for c in range(json_columns)]
+            self.tables[f"table_{t:04d}"] = cols
+        self.sample = json.dumps(["Tom Hanks", "Emma Watson"])
+
+    def cursor(self):
+        return _SyntheticCursor(self)
+
+    def close(self):
+        pass
+
+    def execute(self, query, args):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+        if query.startswith("SHOW TABLES"):
+            return [(name,) for name in self.tables]
+        if query.startswith("DESCRIBE"):
+            return list(self.tables[query.split()[1].rstrip(";")])
+        if "information_schema.COLUMNS" in query:
+            return [(table, name, col_type) for table, cols in self.tables.items() for name, col_type in cols]
+        if "UNION ALL" in query or query.startswith("(SELECT"):
+            pairs = zip(args[::2], args[1::2])
+            return [(table, column, self.sample) for table, column in pairs for _ in range(5)]
+        if re.match(r"SELECT `", query):
+            return [(self.sample,)] * 5
+        raise ValueError(f"Unexpected query: {query[:80]}")
+
+
+class _SyntheticCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, args=None):
+        self.rows = self.connection.execute(query.strip(), args)
+        return len(self.rows)
+
+    def fetchall(self):
+        return self.rows
+
+
+def legacy_build_sql_schema(connection):
+    """The per-table introspection loop get_sql_schema() used before the bulk path."""
+    schema = {}
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW TABLES;")
+        tables = [row[0] for row in cursor.fetchall()]
+        for table in tables:
+            cursor.execute(f"DESCRIBE {table};")
+            schema[table] = {}
+            for field_name, field_type in cursor.fetchall():
+                if "json" in field_type.lower() or "text" in field_type.lower():
+                    schema[table][field_name] = infer_json_array_type(connection, table, field_name)
+                else:
+                    schema[table][field_name] = field_type
+    return schema
+
+
+def run(build, args):
+    connection = SyntheticSchemaConnection(args.tables, args.columns, args.json_columns, args.rtt_ms / 1000)
+    start = time.perf_counter()
+    schema = build(connection)
+    return schema, {"round_trips": connection.round_trips, "wall_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=300)
+    parser.add_argument("--columns", type=int, default=8, help="columns per table")
+    parser.add_argument("--json-columns", type=int, default=2, help="JSON columns per table")
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="simulated latency per round trip")
+    args = parser.parse_args()
+
+    legacy_schema, legacy = run(legacy_build_sql_schema, args)
+    bulk_schema, bulk = run(_build_sql_schema, args)
+    assert legacy_schema == bulk_schema, "bulk introspection returned a different schema"
+
+    print(json.dumps({"tables": args.tables, "rtt_ms": args.rtt_ms, "legacy": legacy, "bulk": bulk}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Similarity cache benchmark.
+
+Fills a SemanticCache partition with synthetic questions and measures nearest-neighbour
+lookup latency and the memory held by the vector matrix. A lookup only scores the entries
+with the probe's guard (its numbers, names, ...); --unguarded leaves the numbers out so all
+entries share one guard, the worst case.
+
+Usage:
+    python benchmarks/bench_semantic_cache.py --entries 100000 --lookups 1000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("ENDPOINT_URL", "http://localhost")
+
+import numpy as np  # noqa: E402
+
+from src.llm.semantic_cache import SemanticCache  # noqa: E402
+
+SUBJECTS = ["movies", "directors", "actors", "customers", "orders", "products"]
+VERBS = ["count", "list", "show", "find", "rank", "average"]
+DIGITS = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine"]
+FILTERS = ["released after {n}", "with runtime over {n}", "born before {n}", "ordered more than {n} times",
+           "priced under {n}", "directed by person {n}", "starring actor {n}"]
+
+
+def num2words(n: int) -> str:
+    # Spelled-out digits keep the questions distinct without adding numbers to their guard
+    return "-".join(DIGITS[int(digit)] for digit in str(n))
+
+
+def synthetic_question(rng: random.Random, unguarded: bool = False) -> str:
+    n = rng.randint(1, 5000)
+    template = rng.choice(FILTERS).format(n=num2words(n) if unguarded else n)
+    return f"{rng.choice(VERBS)} the {rng.choice(SUBJECTS)} {template}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--unguarded", action="store_true", help="questions without numbers, so one guard group")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cache = SemanticCache(capacity=args.entries)
+    partition = ("mysql", "benchmark", "fake")
+
+    start = time.perf_counter()
+    questions = [synthetic_question(rng, args.unguarded) for _ in range(args.entries)]
+    for i, question in enumerate(questions):
+        cache.add(partition, question, f"SELECT {i}")
+    fill_seconds = time.perf_counter() - start
+
+    # Half exact repeats, half new questions
+    probes = [rng.choice(questions) if i % 2 else synthetic_question(rng, args.unguarded) for i in range(args.lookups)]
+    embed_ms, lookup_ms = [], []
+    for probe in probes:
+        t0 = time.perf_counter()
+        cache.vectorizer.embed(probe)
+        t1 = time.perf_counter()
+        cache.lookup(partition, probe)
+        t2 = time.perf_counter()
+        embed_ms.append((t1 - t0) * 1000)
+        lookup_ms.append((t2 - t1) * 1000)
+
+    index = cache._partitions[partition]
+    print(json.dumps({
+        "entries": len(index),
+        "dim": index.vectors.shape[1],
+        "matrix_mb": round(index.vectors.nbytes / 1024 / 1024, 1),
+        "fill_seconds": round(fill_seconds, 2),
+        "embed_ms_p50": round(float(np.percentile(embed_ms, 50)), 3),
+        "lookup_ms_p50": round(float(np.percentile(lookup_ms, 50)), 3),
+        "lookup_ms_p99": round(float(np.percentile(lookup_ms, 99)), 3),
+        "stats": cache.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
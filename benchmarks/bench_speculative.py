@@ -0,0 +1,182 @@
+"""
+Speculative generation benchmark: latency and success rate for K concurrent candidates.
+
+Runs generate_query() for a fixed set of MySQL questions with SPECULATIVE_CANDIDATES set
+to each K in --k, against a fake LLM with configurable behaviour: a completion fails
+outright with probability --failure-rate, names an unknown column with probability
+--invalid-rate, and otherwise is one of several correct queries of different EXPLAIN
+cost. Latencies are log-normal around --latency-ms, with a --tail-rate share slowed
+down --tail-factor times. Schema repairs are off, so a question succeeds only when the
+returned query passes the schema check.
+
+EXPLAIN and the schema are local stand-ins; no database or LLM is needed. Reports p50/p95
+latency, success rate, how much the chosen query costs relative to the cheapest correct
+one and LLM calls per question for each K, as JSON.
+
+Usage:
+    python benchmarks/bench_speculative.py --k 1,2,3,4,5 --rounds 20 --invalid-rate 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("ENDPOINT_URL", "http://localhost")
+
+from src.db import query_cost  # noqa: E402
+from src.db.query_cost import QueryCost  # noqa: E402
+from src.db.sql_analysis import normalize_sql  # noqa: E402
+from src.llm import query_processing, speculative  # noqa: E402
+
+SCHEMA = {
+    "movies": {"movie_id": "int", "name": "varchar(255)", "year": "int", "runtime": "int",
+               "release_date": "date", "director_id": "int"},
+    "directors": {"director_id": "int", "name": "varchar(255)", "birthplace": "varchar(255)"},
+    "actors": {"actor_id": "int", "name": "varchar(255)", "birth_date": "date"},
+}
+
+# question -> [(correct query, EXPLAIN cost)], and a query naming a column that does not exist
+QUESTIONS = {
+    "How many movies were released after 2000?": (
+        [("SELECT COUNT(*) FROM movies WHERE year > 2000", 120.0),
+         ("SELECT COUNT(movie_id) FROM movies WHERE release_date >= '2001-01-01'", 950.0)],
+        "SELECT COUNT(*) FROM movies WHERE release_year > 2000"),
+    "What are the 10 longest movies?": (
+        [("SELECT name, runtime FROM movies ORDER BY runtime DESC LIMIT 10", 300.0),
+         ("SELECT * FROM (SELECT name, runtime FROM movies ORDER BY runtime DESC) t LIMIT 10", 2400.0)],
+        "SELECT title, runtime FROM movies ORDER BY runtime DESC LIMIT 10"),
+    "Which 5 directors made the most movies?": (
+        [("SELECT d.name, COUNT(*) AS n FROM directors d JOIN movies m ON m.director_id = d.director_id "
+          "GROUP BY d.name ORDER BY n DESC LIMIT 5", 800.0),
+         ("SELECT d.name, (SELECT COUNT(*) FROM movies m WHERE m.director_id = d.director_id) AS n "
+          "FROM directors d ORDER BY n DESC LIMIT 5", 5200.0)],
+        "SELECT d.name, COUNT(*) AS n FROM directors d JOIN movies m ON m.directorid = d.director_id "
+        "GROUP BY d.name ORDER BY n DESC LIMIT 5"),
+    "Which directors were born in the USA?": (
+        [("SELECT name FROM directors WHERE birthplace LIKE '%USA%'", 60.0),
+         ("SELECT name, birthplace FROM directors WHERE birthplace LIKE '%USA%' ORDER BY name", 140.0)],
+        "SELECT name FROM directors WHERE country = 'USA'"),
+    "Show the first 100 actors alphabetically": (
+        [("SELECT name FROM actors ORDER BY name LIMIT 100", 400.0)],
+        "SELECT full_name FROM actors ORDER BY full_name LIMIT 100"),
+}
+
+
+class FakeLLM:
+    """Returns a correct, invalid or failed completion after a log-normal delay."""
+
+    def __init__(self, args, seed: int):
+        self.args = args
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.costs = {normalize_sql(query): cost
+                      for variants, _ in QUESTIONS.values() for query, cost in variants}
+
+    def _answer(self, messages: list):
+        self.calls += 1
+        question = next(message["content"] for message in messages if message["role"] == "user")
+        variants, invalid = QUESTIONS[question]
+        delay = self.args.latency_ms * self.random.lognormvariate(0, self.args.sigma)
+        if self.random.random() < self.args.tail_rate:
+            delay *= self.args.tail_factor
+        roll = self.random.random()
+        if roll < self.args.failure_rate:
+            return delay, None
+        if roll < self.args.failure_rate + self.args.invalid_rate:
+            return delay, f"```sql\n{invalid}\n```"
+        return delay, f"```sql\n{self.random.choice(variants)[0]}\n```"
+
+    def __call__(self, messages: list) -> str:
+        delay, completion = self._answer(messages)
+        time.sleep(delay / 1000)
+        if completion is None:
+            raise RuntimeError("fake LLM error")
+        return completion
+
+    async def call_async(self, messages: list, on_token=None, timeout=None, max_retries=None) -> str:
+        delay, completion = self._answer(messages)
+        await asyncio.sleep(delay / 1000)
+        if completion is None:
+            raise RuntimeError("fake LLM error")
+        return completion
+
+    def explain(self, sql_query: str) -> QueryCost:
+        time.sleep(self.args.explain_ms / 1000)
+        return QueryCost(query_cost=self.costs.get(normalize_sql(sql_query), 0.0))
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_k(k: int, args) -> dict:
+    fake = FakeLLM(args, seed=args.seed)
+    latencies, costs, succeeded = [], [], 0
+    patches = [
+        mock.patch.object(query_processing, "call_llm_api", fake),
+        mock.patch.object(speculative, "call_llm_api_async", fake.call_async),
+        mock.patch.object(query_cost, "explain_query", fake.explain),
+        mock.patch.object(query_processing, "get_sql_schema", lambda use_cache=True: SCHEMA),
+        mock.patch.object(query_processing, "SPECULATIVE_DEADLINE", args.deadline),
+        mock.patch.object(query_processing, "SPECULATIVE_GRACE", args.grace),
+    ]
+    for patch in patches:
+        patch.start()
+    try:
+        for _ in range(args.rounds):
+            for question in QUESTIONS:
+                start = time.perf_counter()
+                try:
+                    _, query = query_processing.generate_query(question, "mysql", use_cache=False,
+                                                               repair_attempts=0, candidates=k)
+                except RuntimeError:
+                    query = None
+                latencies.append((time.perf_counter() - start) * 1000)
+                if query is not None and not query_processing.check_generated_query("mysql", query, SCHEMA):
+                    succeeded += 1
+                    cheapest = min(cost for _, cost in QUESTIONS[question][0])
+                    costs.append(fake.costs.get(normalize_sql(query), cheapest) / cheapest)
+    finally:
+        for patch in reversed(patches):
+            patch.stop()
+    return {
+        "k": k,
+        "questions": len(latencies),
+        "success_rate": round(succeeded / len(latencies), 3),
+        "latency_ms_p50": round(statistics.median(latencies), 1),
+        "latency_ms_p95": round(percentile(latencies, 0.95), 1),
+        "cost_vs_cheapest_mean": round(statistics.fmean(costs), 2) if costs else None,
+        "llm_calls_per_question": round(fake.calls / len(latencies), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", default="1,2,3,4,5", help="comma-separated candidate counts")
+    parser.add_argument("--rounds", type=int, default=20, help="passes over the question set")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="median LLM latency")
+    parser.add_argument("--sigma", type=float, default=0.3, help="log-normal spread of the latency")
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="share of very slow completions")
+    parser.add_argument("--tail-factor", type=float, default=8.0, help="slowdown of a tail completion")
+    parser.add_argument("--invalid-rate", type=float, default=0.3, help="share of completions failing the schema check")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="share of LLM calls raising an error")
+    parser.add_argument("--explain-ms", type=float, default=5.0, help="latency of one EXPLAIN")
+    parser.add_argument("--deadline", type=float, default=15.0, help="SPECULATIVE_DEADLINE in seconds")
+    parser.add_argument("--grace", type=float, default=0.1, help="SPECULATIVE_GRACE in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    results = [run_k(int(k), args) for k in args.k.split(",")]
+    print(json.dumps({"results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 # Configuration file
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -11,6 +12,105 @@ LLM_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
 ENDPOINT_URL = os.getenv("ENDPOINT_URL")
 DEPLOYMENT_NAME = os.getenv("DEPLOYMENT_NAME")
 
+# Seconds a cached schema is served without checking the database for changes
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", "300"))
+# Number of JSON/TEXT columns sampled per UNION ALL statement during schema introspection
+SCHEMA_SAMPLE_BATCH = int(os.getenv("SCHEMA_SAMPLE_BATCH", "100"))
+
+# Connection pooling (MySQL pool size is also used as MongoClient maxPoolSize)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+# Streaming result fetching: rows per server-side fetch and limits on returned results
+SQL_FETCH_BATCH_SIZE = int(os.getenv("SQL_FETCH_BATCH_SIZE", "5000"))
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "100000"))
+SQL_MAX_RESULT_BYTES = int(float(os.getenv("SQL_MAX_RESULT_MB", "256")) * 1024 * 1024)
+
+# Persistent cache of LLM responses
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_responses.sqlite3"))
+LLM_CACHE_MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024)
+
+# Similarity cache for reworded questions (SEMANTIC_CACHE_MODEL: optional sentence-transformers model)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "256"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "100000"))
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "")
+
+# Schema pruning: only the tables/columns relevant to the question are sent to the LLM
+SCHEMA_PRUNING_ENABLED = os.getenv("SCHEMA_PRUNING_ENABLED", "true").lower() in ("1", "true", "yes")
+SCHEMA_PRUNING_TOP_K = int(os.getenv("SCHEMA_PRUNING_TOP_K", "8"))
+SCHEMA_PRUNING_MAX_COLUMNS = int(os.getenv("SCHEMA_PRUNING_MAX_COLUMNS", "40"))
+SCHEMA_PRUNING_EMBEDDINGS = os.getenv("SCHEMA_PRUNING_EMBEDDINGS", "true").lower() in ("1", "true", "yes")
+
+# LLM calls: per-attempt timeout in seconds, retries on 429/5xx, async concurrency and backoff
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+
+# MongoDB queries: documents returned at most, documents per cursor batch, server-side time limit
+MONGO_MAX_ROWS = int(os.getenv("MONGO_MAX_ROWS", str(SQL_MAX_ROWS)))
+MONGO_BATCH_SIZE = int(os.getenv("MONGO_BATCH_SIZE", "1000"))
+MONGO_MAX_TIME_MS = int(os.getenv("MONGO_MAX_TIME_MS", "30000"))
+
+# Cache of MySQL query results, invalidated by writes and checked against table UPDATE_TIME
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESULT_CACHE_MAX_BYTES = int(float(os.getenv("RESULT_CACHE_MAX_MB", "128")) * 1024 * 1024)
+RESULT_CACHE_RECHECK_INTERVAL = float(os.getenv("RESULT_CACHE_RECHECK_INTERVAL", "5"))
+
+# Time budget in seconds of a query run from the UI (0 disables it)
+QUERY_TIMEOUT = float(os.getenv("QUERY_TIMEOUT", "30"))
+
+# EXPLAIN-based cost gate for generated SQL (thresholds in estimated rows examined; 0 disables one)
+COST_GATE_ENABLED = os.getenv("COST_GATE_ENABLED", "true").lower() in ("1", "true", "yes")
+COST_WARN_ROWS = float(os.getenv("COST_WARN_ROWS", "1000000"))
+COST_REJECT_ROWS = float(os.getenv("COST_REJECT_ROWS", "100000000"))
+COST_FULL_SCAN_ROWS = float(os.getenv("COST_FULL_SCAN_ROWS", "100000"))
+
+# Log of executed queries analysed by the index advisor (python -m src.db.index_advisor)
+WORKLOAD_LOG_ENABLED = os.getenv("WORKLOAD_LOG_ENABLED", "true").lower() in ("1", "true", "yes")
+WORKLOAD_LOG_PATH = os.getenv("WORKLOAD_LOG_PATH", os.path.join(".cache", "workload.jsonl"))
+WORKLOAD_LOG_MAX_BYTES = int(float(os.getenv("WORKLOAD_LOG_MAX_MB", "50")) * 1024 * 1024)
+
+# Background job queue for query generation and execution
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_QUEUED_PER_USER = int(os.getenv("JOB_MAX_QUEUED_PER_USER", "4"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "600"))
+
+# Logging and telemetry (src/telemetry.py)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() in ("1", "true", "yes")
+TELEMETRY_SPANS_PATH = os.getenv("TELEMETRY_SPANS_PATH", "")
+TELEMETRY_SPAN_BUFFER = int(os.getenv("TELEMETRY_SPAN_BUFFER", "1000"))
+TELEMETRY_METRICS_PORT = int(os.getenv("TELEMETRY_METRICS_PORT", "0"))
+TELEMETRY_OTEL = os.getenv("TELEMETRY_OTEL", "false").lower() in ("1", "true", "yes")
+
+# Times the LLM is asked to fix a generated query that fails the local schema check (0 disables it)
+QUERY_REPAIR_ATTEMPTS = int(os.getenv("QUERY_REPAIR_ATTEMPTS", "2"))
+
+# Speculative generation: completions requested at once per question (1 disables it), the
+# overall wait in seconds and how long to keep waiting for cheaper ones after the first valid one
+SPECULATIVE_CANDIDATES = int(os.getenv("SPECULATIVE_CANDIDATES", "1"))
+SPECULATIVE_DEADLINE = float(os.getenv("SPECULATIVE_DEADLINE", "15"))
+SPECULATIVE_GRACE = float(os.getenv("SPECULATIVE_GRACE", "1.0"))
+
+# Move JSON_TABLE expansions of movies.actors_json onto the movie_actors side table when it exists
+MOVIE_ACTORS_REWRITE = os.getenv("MOVIE_ACTORS_REWRITE", "true").lower() in ("1", "true", "yes")
+
+# Result viewer and downloads (src/db/result_export.py)
+RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "100"))
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "chatdb-exports"))
+EXPORT_MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", "5000000"))
+EXPORT_TTL = float(os.getenv("EXPORT_TTL", "3600"))
+# Time budget in seconds of writing a download file, usually longer than QUERY_TIMEOUT (0 disables it)
+EXPORT_TIMEOUT = float(os.getenv("EXPORT_TIMEOUT", "600"))
+
 def get_config():
     """Returns the configuration settings."""
     return {
@@ -18,4 +118,10 @@ def get_config():
         "LLM_API_KEY": LLM_API_KEY,
         "ENDPOINT_URL": ENDPOINT_URL,
         "DEPLOYMENT_NAME": DEPLOYMENT_NAME,
-    } 
\ No newline at end of file
+        "SCHEMA_CACHE_TTL": SCHEMA_CACHE_TTL,
+        "LLM_TIMEOUT": LLM_TIMEOUT,
+        "LLM_MAX_RETRIES": LLM_MAX_RETRIES,
+        "LLM_MAX_CONCURRENCY": LLM_MAX_CONCURRENCY,
+        "LLM_BACKOFF_BASE": LLM_BACKOFF_BASE,
+        "LLM_BACKOFF_MAX": LLM_BACKOFF_MAX,
+    } 
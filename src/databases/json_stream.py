@@ -0,0 +1,102 @@
+# Incremental readers for large JSON data files, so imports never hold a whole file in memory
+import json
+
+CHUNK_SIZE = 1 << 16
+WHITESPACE = " \t\r\n"
+
+
+def iter_json_array(file, chunk_size: int = CHUNK_SIZE):
+    """
+    Yields the elements of a top-level JSON array one at a time, reading `file` (a text
+    file object) in chunks of `chunk_size` characters.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    started = False
+    after_value = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = file.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in WHITESPACE:
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            fill()
+            continue
+
+        char = buffer[pos]
+        if not started:
+            if char != "[":
+                raise ValueError("Expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if char == "]":
+            return
+        if char == ",":
+            if not after_value:
+                raise ValueError("Unexpected ',' in JSON array")
+            after_value = False
+            pos += 1
+            continue
+        if after_value:
+            raise ValueError("Expected ',' or ']' in JSON array")
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()  # the element continues in the next chunk
+            continue
+        if not eof and (end == len(buffer) or buffer[end] not in ",]" + WHITESPACE):
+            # A number may be cut off at the chunk boundary ("-4" of "-4.5"); decode it again with more input
+            fill()
+            continue
+        pos = end
+        after_value = True
+        yield value
+
+
+def iter_json_records(path: str, chunk_size: int = CHUNK_SIZE):
+    """
+    Yields records from a JSON file holding either one top-level array or newline-delimited
+    JSON documents (NDJSON), detected from the first non-whitespace character.
+    """
+    with open(path, encoding="utf-8") as file:
+        first = ""
+        while True:
+            char = file.read(1)
+            if not char or char not in WHITESPACE:
+                first = char
+                break
+        file.seek(0)
+        if first == "[":
+            yield from iter_json_array(file, chunk_size)
+            return
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def batched(records, batch_size: int):
+    """Groups an iterable into lists of at most `batch_size` items."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
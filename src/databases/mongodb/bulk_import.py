@@ -0,0 +1,142 @@
+"""
+Parallel bulk import of the sales sample data (or larger JSON/NDJSON exports) into MongoDB.
+
+Each collection's file is streamed and inserted in fixed-size unordered chunks. Collections
+are loaded concurrently on worker threads. With --defer-indexes, the non-unique secondary
+indexes of the target collections are dropped before the load and rebuilt afterwards;
+unique indexes stay, so they keep rejecting duplicates during the load.
+
+Usage (from the project root):
+    python -m src.databases.mongodb.bulk_import --workers 3 --chunk-size 1000 --defer-indexes
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.databases.json_stream import batched, iter_json_records
+from src.db.nosql_connector import MONGO_DATABASE, MONGO_URI
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+COLLECTIONS = ["customers", "orders", "products"]
+
+
+def data_file(data_dir: str, collection: str) -> str:
+    for extension in (".json", ".ndjson", ".jsonl"):
+        path = os.path.join(data_dir, collection + extension)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No data file for collection {collection!r} in {data_dir}")
+
+
+def max_rss_mb():
+    """Peak resident set size of this process in MB, or None where it is not available."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def drop_secondary_indexes(collection) -> list:
+    """
+    Drops the non-unique indexes except _id and returns their specs for create_indexes.
+    Unique (including partial unique) indexes are kept: an unordered load would otherwise
+    insert the duplicates they reject, and rebuilding them afterwards would fail.
+    """
+    from pymongo import IndexModel
+
+    models = []
+    for name, info in collection.index_information().items():
+        if name == "_id_" or info.get("unique"):
+            continue
+        options = {k: v for k, v in info.items() if k not in ("key", "v", "ns")}
+        models.append(IndexModel(info["key"], name=name, **options))
+    for model in models:
+        collection.drop_index(model.document["name"])
+    return models
+
+
+def import_collection(db, collection_name: str, path: str, chunk_size: int, defer_indexes: bool) -> dict:
+    from pymongo.errors import BulkWriteError
+
+    collection = db[collection_name]
+    deferred = drop_secondary_indexes(collection) if defer_indexes else []
+
+    start = time.perf_counter()
+    inserted = errors = 0
+    for chunk in batched(iter_json_records(path), chunk_size):
+        try:
+            inserted += len(collection.insert_many(chunk, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            # Unordered: everything but the failing documents (e.g. duplicate _id) was written
+            inserted += e.details.get("nInserted", 0)
+            errors += len(e.details.get("writeErrors", []))
+    load_seconds = time.perf_counter() - start
+
+    index_seconds = 0.0
+    if deferred:
+        start = time.perf_counter()
+        collection.create_indexes(deferred)
+        index_seconds = time.perf_counter() - start
+
+    return {
+        "collection": collection_name,
+        "inserted": inserted,
+        "errors": errors,
+        "load_seconds": load_seconds,
+        "index_seconds": index_seconds,
+        "docs_per_second": inserted / load_seconds if load_seconds else 0.0,
+        "indexes_rebuilt": len(deferred),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=MONGO_URI)
+    parser.add_argument("--database", default=MONGO_DATABASE)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--collections", default=",".join(COLLECTIONS),
+                        help="comma-separated; each is read from <data-dir>/<name>.json or .ndjson")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=len(COLLECTIONS))
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="drop non-unique secondary indexes before loading and rebuild them afterwards")
+    args = parser.parse_args()
+
+    from pymongo import MongoClient
+
+    collections = [name.strip() for name in args.collections.split(",") if name.strip()]
+    paths = {name: data_file(args.data_dir, name) for name in collections}
+    client = MongoClient(args.uri, maxPoolSize=max(args.workers, 1) + 1)
+    db = client[args.database]
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(args.workers, 1)) as executor:
+            futures = [
+                executor.submit(import_collection, db, name, paths[name], args.chunk_size, args.defer_indexes)
+                for name in collections
+            ]
+            results = [future.result() for future in futures]
+    finally:
+        client.close()
+    seconds = time.perf_counter() - start
+
+    for result in results:
+        print(f"{result['collection']}: {result['inserted']} documents in {result['load_seconds']:.2f}s "
+              f"({result['docs_per_second']:,.0f} docs/s), {result['errors']} write errors"
+              + (f", {result['indexes_rebuilt']} indexes rebuilt in {result['index_seconds']:.2f}s"
+                 if result["indexes_rebuilt"] else ""))
+    total = sum(result["inserted"] for result in results)
+    peak = max_rss_mb()
+    print(f"MongoDB bulk import complete: {total} documents in {seconds:.2f}s "
+          f"({total / seconds if seconds else 0:,.0f} docs/s)"
+          + (f", peak RSS {peak:.0f} MB" if peak is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
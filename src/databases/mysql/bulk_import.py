@@ -0,0 +1,204 @@
+"""
+Bulk import of the movie sample data (or larger catalogs in the same format) into MySQL.
+
+The JSON files are streamed and written in batches, either with executemany (one multi-row
+INSERT per batch) or with LOAD DATA LOCAL INFILE from a generated TSV file. Director ids for
+movies are resolved with one lookup per batch. With --movie-actors the movie_actors side table
+(see src/db/movie_actors.py) is built from the imported movies afterwards.
+
+Usage (from the project root):
+    python -m src.databases.mysql.bulk_import --method load-data --batch-size 20000
+"""
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import time
+
+from src.databases.json_stream import batched, iter_json_records
+from src.db.movie_actors import build_side_table
+from src.db.rdbms_connector import RDBMS_SETTINGS
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+PERSON_COLUMNS = ["name", "birthname", "birthdate", "birthplace"]
+MOVIE_COLUMNS = ["name", "year", "runtime", "release_date", "director_id", "actors_json", "storyline"]
+
+
+def person_row(record: dict) -> tuple:
+    return tuple(record.get(column) for column in PERSON_COLUMNS)
+
+
+def movie_row(record: dict, director_ids: dict) -> tuple:
+    """Converts a movie record; raises ValueError for records that cannot be imported."""
+    rdate = record.get("release-date")
+    release_date = datetime.datetime.strptime(rdate, "%Y-%m-%d").date() if rdate else None
+    return (
+        record.get("name"),
+        record.get("year"),
+        record.get("runtime"),
+        release_date,
+        director_ids.get(director_name(record)),
+        json.dumps(record.get("actors", []), ensure_ascii=False),
+        record.get("storyline") or record.get("description"),
+    )
+
+
+def director_name(record: dict):
+    name = record.get("director")
+    return name[0] if isinstance(name, list) and name else name
+
+
+def _tsv_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+class BatchWriter:
+    """Writes batches of rows to one table with executemany or LOAD DATA LOCAL INFILE."""
+
+    def __init__(self, connection, table: str, columns: list, method: str, ignore: bool = False):
+        self.connection = connection
+        self.table = table
+        self.columns = columns
+        self.method = method
+        self.ignore = ignore
+        self.rows_written = 0
+
+    def write(self, rows: list):
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            if self.method == "load-data":
+                self._load_data(cursor, rows)
+            else:
+                self._executemany(cursor, rows)
+        self.connection.commit()
+
+    def _executemany(self, cursor, rows: list):
+        placeholders = ", ".join(["%s"] * len(self.columns))
+        sql = (f"INSERT {'IGNORE ' if self.ignore else ''}INTO {self.table} ({', '.join(self.columns)}) "
+               f"VALUES ({placeholders})")
+        try:
+            # pymysql rewrites this into one multi-row INSERT per max_allowed_packet
+            self.rows_written += cursor.executemany(sql, rows)
+        except Exception as e:
+            # Find the offending rows one at a time, like the old per-row import did
+            self.connection.rollback()
+            print(f"Batch insert into {self.table} failed ({e}); retrying row by row")
+            for row in rows:
+                try:
+                    self.rows_written += cursor.execute(sql, row)
+                except Exception as row_error:
+                    print(f"Skipped erroneous {self.table} row:", row[0], row_error)
+
+    def _load_data(self, cursor, rows: list):
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".tsv", delete=False) as file:
+            for row in rows:
+                file.write("\t".join(_tsv_value(value) for value in row))
+                file.write("\n")
+        try:
+            self.rows_written += cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s {'IGNORE' if self.ignore else ''} INTO TABLE {self.table} "
+                "CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                f"({', '.join(self.columns)})",
+                (file.name,),
+            )
+        finally:
+            os.remove(file.name)
+
+
+def lookup_director_ids(connection, names: set, director_ids: dict):
+    """Adds the ids of `names` not yet in `director_ids` with one query."""
+    missing = sorted(name for name in names if name is not None and name not in director_ids)
+    if not missing:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT name, director_id FROM directors WHERE name IN ({', '.join(['%s'] * len(missing))})",
+            missing,
+        )
+        director_ids.update(cursor.fetchall())
+
+
+def import_people(connection, table: str, path: str, method: str, batch_size: int) -> BatchWriter:
+    writer = BatchWriter(connection, table, PERSON_COLUMNS, method, ignore=True)
+    for records in batched(iter_json_records(path), batch_size):
+        writer.write([person_row(record) for record in records])
+    return writer
+
+
+def import_movies(connection, path: str, method: str, batch_size: int) -> BatchWriter:
+    writer = BatchWriter(connection, "movies", MOVIE_COLUMNS, method)
+    director_ids = {}
+    for records in batched(iter_json_records(path), batch_size):
+        lookup_director_ids(connection, {director_name(record) for record in records}, director_ids)
+        rows = []
+        for record in records:
+            try:
+                rows.append(movie_row(record, director_ids))
+            except Exception as e:
+                print("Skipped erroneous movie:", record.get("name"), e)
+        writer.write(rows)
+    return writer
+
+
+def connect(args):
+    import pymysql
+
+    settings = {**RDBMS_SETTINGS, "host": args.host, "user": args.user, "database": args.database}
+    if args.password is not None:
+        settings["password"] = args.password
+    return pymysql.connect(**settings, charset="utf8mb4", local_infile=args.method == "load-data")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--directors", default="merged_directors.json")
+    parser.add_argument("--actors", default="merged_actors.json")
+    parser.add_argument("--movies", default="merged_movies.json")
+    parser.add_argument("--method", choices=["executemany", "load-data"], default="executemany")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--host", default=RDBMS_SETTINGS["host"])
+    parser.add_argument("--user", default=RDBMS_SETTINGS["user"])
+    parser.add_argument("--password", default=None, help="defaults to the password in rdbms_connector")
+    parser.add_argument("--database", default=RDBMS_SETTINGS["database"])
+    parser.add_argument("--movie-actors", action="store_true",
+                        help="build the movie_actors side table and its sync triggers after the import")
+    args = parser.parse_args()
+
+    connection = connect(args)
+    steps = [
+        ("directors", lambda: import_people(connection, "directors", os.path.join(args.data_dir, args.directors),
+                                            args.method, args.batch_size).rows_written),
+        ("actors", lambda: import_people(connection, "actors", os.path.join(args.data_dir, args.actors),
+                                         args.method, args.batch_size).rows_written),
+        # Directors first: movies resolve director ids by name
+        ("movies", lambda: import_movies(connection, os.path.join(args.data_dir, args.movies),
+                                         args.method, args.batch_size).rows_written),
+    ]
+    if args.movie_actors:
+        # One set-based backfill after the import is cheaper than the triggers firing per movie row
+        steps.append(("movie_actors", lambda: build_side_table(connection, args.batch_size)))
+    try:
+        total_rows, total_seconds = 0, 0.0
+        for table, step in steps:
+            start = time.perf_counter()
+            rows = step()
+            seconds = time.perf_counter() - start
+            total_rows += rows
+            total_seconds += seconds
+            print(f"{table}: {rows} rows in {seconds:.2f}s ({rows / seconds if seconds else 0:,.0f} rows/s)")
+        print(f"MySQL bulk import complete: {total_rows} rows in {total_seconds:.2f}s "
+              f"({total_rows / total_seconds if total_seconds else 0:,.0f} rows/s)")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
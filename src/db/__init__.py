@@ -1,17 +1,45 @@
-from .nosql_connector import connect_to_nosql
-#from .postgres_connector import connect_to_postgres
-from .query_execution import execute_nosql  # execute_postgres,
-from .query_execution import clean_mongodb_data, execute_sql, validate_sql
-from .rdbms_connector import connect_to_rdbms
+# Public names are resolved lazily (PEP 562), so importing src.db does not load pymysql,
+# pymongo or pandas until the backend that needs them is used.
+import importlib
 
-__all__ = [
-    "connect_to_nosql", 
-    "validate_sql", 
-    "execute_sql", 
-    "execute_nosql",
-    #"execute_postgres",
-    "connect_to_rdbms",
-    #"connect_to_postgres"
-    "clean_mongodb_data"
-]
+_EXPORTS = {
+    "connect_to_nosql": ".nosql_connector",
+    "validate_sql": ".query_execution",
+    "execute_sql": ".query_execution",
+    "stream_sql": ".query_execution",
+    "fetch_sql_dataframe": ".query_execution",
+    "is_read_query": ".query_execution",
+    "execute_nosql": ".query_execution",
+    "fetch_nosql": ".query_execution",
+    "execute_query": ".query_execution",
+    "QueryResult": ".query_control",
+    "run_with_timeout": ".query_control",
+    "start_query": ".query_control",
+    "get_query_result": ".query_control",
+    "cancel_query": ".query_control",
+    "check_query_cost": ".query_cost",
+    "sql_schema_errors": ".schema_validation",
+    "mongo_schema_errors": ".schema_validation",
+    "MongoQueryError": ".mongo_query",
+    #"execute_postgres": ".query_execution",
+    "connect_to_rdbms": ".rdbms_connector",
+    #"connect_to_postgres": ".postgres_connector",
+    "clean_mongodb_data": ".query_execution",
+    "get_pool_stats": ".connection_pool",
+    "get_result_cache": ".result_cache",
+    "result_to_dataframe": ".result_conversion",
+    "export_result": ".result_export",
+    "export_formats": ".result_export",
+    "build_side_table": ".movie_actors",
+    "rewrite_json_tables": ".movie_actors",
+}
 
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
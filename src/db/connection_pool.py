@@ -0,0 +1,202 @@
+# Process-wide connection pooling for MySQL (see mongo_pool.py for MongoDB)
+import sys
+import threading
+import time
+
+from ..config import DB_POOL_HEALTH_CHECK_INTERVAL, DB_POOL_MAX_LIFETIME, DB_POOL_SIZE, DB_POOL_TIMEOUT
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no pooled connection becomes available within the acquire timeout."""
+
+
+class PooledConnection:
+    """
+    Wraps a pooled DB-API connection. Everything is delegated to the real connection except
+    close(), which hands the connection back to the pool instead of closing the socket.
+    """
+
+    def __init__(self, pool, connection, created_at: float):
+        self._pool = pool
+        self._connection = connection
+        self._created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Returns the connection to the pool."""
+        if not self._released:
+            self._released = True
+            self._pool.release(self)
+
+    def discard(self):
+        """Closes the underlying connection instead of returning it, e.g. after an aborted stream."""
+        if not self._released:
+            self._released = True
+            self._pool.release(self, discard=True)
+
+
+class MySQLConnectionPool:
+    """
+    Bounded pool of DB-API connections.
+
+    Idle connections are health-checked with ping() when they have been idle for longer than
+    `health_check_interval` seconds and are recycled once they are older than `max_lifetime`.
+    """
+
+    def __init__(self, connect, max_size: int = 10, max_lifetime: float = 1800,
+                 health_check_interval: float = 30, acquire_timeout: float = 10):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self._idle = []  # (connection, created_at, last_used), most recently used last
+        self._open = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "discarded": 0,
+            "health_check_failures": 0,
+            "expired": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+        }
+
+    def acquire(self) -> PooledConnection:
+        deadline = time.monotonic() + self.acquire_timeout
+        waited = False
+        while True:
+            with self._condition:
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(f"No database connection available within {self.acquire_timeout}s")
+                    if not waited:
+                        waited = True
+                        self._stats["waits"] += 1
+                    wait_start = time.monotonic()
+                    self._condition.wait(remaining)
+                    self._stats["wait_seconds"] += time.monotonic() - wait_start
+                if not self._idle:
+                    self._open += 1
+                    break
+                connection, created_at, last_used = self._idle.pop()
+
+            # Checked outside the lock: a ping to an unresponsive server must not stall
+            # other threads acquiring or releasing connections
+            now = time.monotonic()
+            if now - created_at > self.max_lifetime:
+                self._drop(connection, "expired")
+                continue
+            if now - last_used > self.health_check_interval and not self._is_healthy(connection):
+                self._drop(connection, "health_check_failures")
+                continue
+            with self._condition:
+                self._stats["reused"] += 1
+            return PooledConnection(self, connection, created_at)
+
+        # Connect outside the lock so a slow handshake does not block other threads
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._stats["created"] += 1
+        return PooledConnection(self, connection, time.monotonic())
+
+    def release(self, pooled: PooledConnection, discard: bool = False):
+        connection = pooled._connection
+        if not discard:
+            try:
+                # End any open transaction so the next user does not see a stale snapshot
+                connection.rollback()
+            except Exception:
+                discard = True
+        if discard or time.monotonic() - pooled._created_at > self.max_lifetime:
+            self._drop(connection, "discarded")
+            return
+        with self._condition:
+            self._idle.append((connection, pooled._created_at, time.monotonic()))
+            self._condition.notify()
+
+    def close_all(self):
+        """Closes all idle connections, e.g. after a failover. Connections in use are unaffected."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for connection, _, _ in idle:
+            self._drop(connection)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+                **self._stats,
+            }
+
+    def _drop(self, connection, reason: str = None):
+        # Closes a connection taken out of the pool, outside the lock, then frees its slot
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._open -= 1
+            if reason is not None:
+                self._stats[reason] += 1
+            self._condition.notify()
+
+    @staticmethod
+    def _is_healthy(connection) -> bool:
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+
+_rdbms_pool = None
+_lock = threading.Lock()
+
+
+def get_rdbms_pool(connect=None) -> MySQLConnectionPool:
+    """Returns the process-wide MySQL pool, creating it with `connect` on first use."""
+    global _rdbms_pool
+    if _rdbms_pool is None:
+        with _lock:
+            if _rdbms_pool is None:
+                _rdbms_pool = MySQLConnectionPool(
+                    connect,
+                    max_size=DB_POOL_SIZE,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+                    acquire_timeout=DB_POOL_TIMEOUT,
+                )
+    return _rdbms_pool
+
+
+def get_pool_stats() -> dict:
+    """Returns connection pool metrics for MySQL and MongoDB (None for a backend not used yet)."""
+    # Only report MongoDB if its backend has been loaded, rather than importing pymongo here
+    mongo_pool = sys.modules.get(f"{__package__}.mongo_pool")
+    return {
+        "mysql": _rdbms_pool.stats() if _rdbms_pool is not None else None,
+        "mongodb": mongo_pool.get_mongo_pool_stats() if mongo_pool is not None else None,
+    }
@@ -0,0 +1,609 @@
+"""
+Index advisor for the recorded query workload.
+
+Reads the workload log written by execute_query, finds the columns the logged queries
+filter, join and sort on (sqlparse for SQL, the MongoDB query parser for PyMongo queries),
+checks with EXPLAIN which of those queries read whole tables, and recommends indexes that
+no existing index already covers:
+
+- B-tree indexes on MySQL filter, join and ORDER BY columns (equality columns first, then
+  the sort or range column);
+- multi-valued indexes on JSON arrays such as movies.actors_json that queries filter through
+  JSON_TABLE (MySQL 8.0.17+; the query must use MEMBER OF for MySQL to use them);
+- MongoDB compound indexes for the fields of find filters and leading $match stages,
+  ordered equality, sort, range.
+
+With --apply the indexes are created and the logged read queries are replayed before and
+after, giving a latency report.
+
+Usage (from the project root):
+    python -m src.db.index_advisor                        # recommendations only
+    python -m src.db.index_advisor --apply --runs 3       # create them and compare latency
+"""
+import argparse
+import json
+import statistics
+from dataclasses import dataclass, field
+
+import sqlparse
+from sqlparse import tokens as T
+
+from ..config import WORKLOAD_LOG_PATH
+from .sql_analysis import normalize_sql, statement_type, table_aliases
+from .workload_log import load_workload
+
+MAX_INDEX_COLUMNS = 4
+MYSQL_IDENTIFIER_LENGTH = 64
+# Top-level keywords that start a clause; only columns in WHERE/ON, ORDER BY and GROUP BY matter
+CLAUSES = {"WHERE": "where", "ON": "where", "ORDER BY": "order", "GROUP BY": "group", "SELECT": None,
+           "FROM": None, "HAVING": None, "LIMIT": None, "UNION": None, "WINDOW": None, "USING": None}
+EQUALITY_OPERATORS = {"=", "<=>"}
+RANGE_OPERATORS = {"<", ">", "<=", ">=", "LIKE"}
+MONGO_EQUALITY = {"$eq", "$in"}
+MONGO_RANGE = {"$gt", "$gte", "$lt", "$lte", "$regex"}
+
+
+@dataclass
+class QueryShape:
+    """The (table, column) pairs a SQL query filters, joins, groups and sorts on."""
+
+    equality: list = field(default_factory=list)
+    ranges: list = field(default_factory=list)
+    joins: list = field(default_factory=list)
+    order_by: list = field(default_factory=list)
+    group_by: list = field(default_factory=list)
+    json_filters: list = field(default_factory=list)  # (table, JSON column) filtered via JSON_TABLE
+    aliases: dict = field(default_factory=dict)
+
+
+@dataclass
+class IndexRecommendation:
+    """
+    An index to create. `columns` are column names for MySQL ("btree", "multi-valued") and
+    (field, direction) pairs for MongoDB ("compound"). `latency_ms` is the recorded latency
+    of the logged queries it serves.
+    """
+
+    db_type: str
+    target: str
+    columns: tuple
+    kind: str
+    count: int = 0
+    latency_ms: float = 0.0
+    queries: list = field(default_factory=list)
+    reasons: list = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        parts = [column if isinstance(column, str) else f"{column[0]}_{column[1]}" for column in self.columns]
+        suffix = "_mv" if self.kind == "multi-valued" else ""
+        name = "idx_" + "_".join([self.target] + parts).replace(".", "_")
+        return name[:MYSQL_IDENTIFIER_LENGTH - len(suffix)] + suffix
+
+    def statement(self) -> str:
+        if self.db_type == "mongodb":
+            return f"db.{self.target}.create_index({list(self.columns)}, name={self.name!r})"
+        if self.kind == "multi-valued":
+            return (f"CREATE INDEX `{self.name}` ON `{self.target}` "
+                    f"((CAST(`{self.columns[0]}`->'$' AS CHAR(255) ARRAY)))")
+        columns = ", ".join(f"`{column}`" for column in self.columns)
+        return f"CREATE INDEX `{self.name}` ON `{self.target}` ({columns})"
+
+
+def summarize_workload(records: list, db_type: str) -> list:
+    """
+    Groups the logged read queries of one db type by normalized text and returns
+    [{"query", "count", "latency_ms"}] ordered by total recorded latency.
+    """
+    groups = {}
+    for record in records:
+        if record.get("db_type") != db_type or record.get("status") not in ("ok", "timeout"):
+            continue
+        query = record["query"]
+        if db_type == "mongodb":
+            key = " ".join(query.split())
+        else:
+            if statement_type(query) not in ("SELECT", "WITH"):
+                continue
+            key = normalize_sql(query)
+        group = groups.setdefault(key, {"query": query, "count": 0, "latency_ms": 0.0})
+        group["count"] += 1
+        group["latency_ms"] += record.get("elapsed_ms", 0.0)
+    return sorted(groups.values(), key=lambda group: -group["latency_ms"])
+
+
+# --- MySQL -----------------------------------------------------------------------------
+
+def _name(token) -> str:
+    return token.value.strip("`").lower()
+
+
+def _column_at(tokens: list, i: int, allow_keyword: bool = False):
+    """Returns ((qualifier, column), next index) for a column reference at tokens[i], else (None, i)."""
+    token = tokens[i]
+    plain_keyword = allow_keyword and token.ttype is T.Keyword and token.normalized.upper() not in CLAUSES
+    if token.ttype not in T.Name and not plain_keyword:
+        return None, i
+    following = tokens[i + 1] if i + 1 < len(tokens) else None
+    if following is not None and following.match(T.Punctuation, "("):
+        return None, i  # a function call
+    if following is not None and following.match(T.Punctuation, ".") and i + 2 < len(tokens):
+        return (_name(token), _name(tokens[i + 2])), i + 3
+    return (None, _name(token)), i + 1
+
+
+def _json_table(tokens: list, i: int, aliases: dict, json_aliases: dict, json_columns: dict) -> int:
+    """
+    Records JSON_TABLE(alias.column, '$[*]' COLUMNS(...)) AS jt: jt and its columns map to the
+    (table, JSON column) they expand. Returns the index after the alias.
+    """
+    source, _ = _column_at(tokens, i + 2)
+    table = aliases.get(source[0]) if source and source[0] else None
+    depth, j, columns = 0, i + 1, []
+    while j < len(tokens):
+        token = tokens[j]
+        if token.match(T.Punctuation, "("):
+            depth += 1
+        elif token.match(T.Punctuation, ")"):
+            depth -= 1
+            if depth == 0:
+                break
+        elif depth == 2 and tokens[j - 1].match(T.Punctuation, ("(", ",")) and token.ttype in T.Name:
+            columns.append(_name(token))
+        j += 1
+    j += 1
+    if j < len(tokens) and tokens[j].match(T.Keyword, "AS"):
+        j += 1
+    if j < len(tokens) and tokens[j].ttype in T.Name:
+        if table:
+            json_aliases[_name(tokens[j])] = (table, source[1])
+            json_columns.update((column, (table, source[1])) for column in columns)
+        j += 1
+    return j
+
+
+def analyze_sql(sql_query: str, schema: dict = None) -> QueryShape:
+    """
+    Extracts the filter, join and sort columns of a SQL query. `schema` ({table: set of
+    columns}) resolves unqualified columns in multi-table queries and drops names that are
+    not table columns (select aliases, for example).
+    """
+    shape = QueryShape(aliases=table_aliases(sql_query))
+    json_aliases, json_columns = {}, {}
+
+    def resolve(reference):
+        # -> (table, column), ("json", (table, JSON column)) for JSON_TABLE columns, or None
+        qualifier, column = reference
+        if qualifier in json_aliases:
+            return "json", json_aliases[qualifier]
+        if qualifier is None and column in json_columns:
+            return "json", json_columns[column]
+        if qualifier is not None:
+            candidates = [shape.aliases[qualifier]] if qualifier in shape.aliases else []
+        else:
+            candidates = sorted(set(shape.aliases.values()))
+        if schema is not None:
+            candidates = [table for table in candidates if column in schema.get(table, ())]
+        return (candidates[0], column) if len(candidates) == 1 else None
+
+    def add_filter(resolved, operator):
+        if resolved is None:
+            return
+        if resolved[0] == "json":
+            shape.json_filters.append(resolved[1])
+        elif operator in EQUALITY_OPERATORS:
+            shape.equality.append(resolved)
+        elif operator in RANGE_OPERATORS:
+            shape.ranges.append(resolved)
+
+    for statement in sqlparse.parse(sql_query):
+        tokens = [token for token in statement.flatten() if not token.is_whitespace and token.ttype not in T.Comment]
+        clause, i = None, 0
+        while i < len(tokens):
+            token = tokens[i]
+            keyword = token.normalized.upper() if token.is_keyword else ""
+            if keyword in CLAUSES or keyword.endswith("JOIN"):
+                clause = CLAUSES.get(keyword)
+                i += 1
+                continue
+            if token.ttype in T.Name and token.value.upper() == "JSON_TABLE":
+                i = _json_table(tokens, i, shape.aliases, json_aliases, json_columns)
+                continue
+            reference, end = _column_at(tokens, i, allow_keyword=clause is not None)
+            if reference is None or clause is None:
+                i += 1
+                continue
+            resolved = resolve(reference)
+            if clause in ("order", "group"):
+                if resolved and resolved[0] != "json":
+                    (shape.order_by if clause == "order" else shape.group_by).append(resolved)
+                i = end
+                continue
+
+            # WHERE / ON: classify by the operator after the column, or before it ('x' = col)
+            before = tokens[i - 1] if i else None
+            following = tokens[end] if end < len(tokens) else None
+            i = end
+            operator = None
+            if following is not None and following.ttype in T.Operator.Comparison:
+                operator = following.normalized.upper()
+                other, after = _column_at(tokens, end + 1) if end + 1 < len(tokens) else (None, end)
+                if other is not None:
+                    # col = col: a join (or a JSON_TABLE column matched against a table column)
+                    other = resolve(other)
+                    if operator in EQUALITY_OPERATORS:
+                        for side in (resolved, other):
+                            if side is not None:
+                                (shape.json_filters.append(side[1]) if side[0] == "json"
+                                 else shape.joins.append(side))
+                    i = after
+                    continue
+            elif following is not None and following.is_keyword:
+                operator = {"IN": "=", "IS": "=", "BETWEEN": "<", "LIKE": "LIKE"}.get(following.normalized.upper())
+            if operator is None and before is not None and before.ttype in T.Operator.Comparison:
+                operator = before.normalized.upper()
+            add_filter(resolved, operator)
+    return shape
+
+
+def _unique(items) -> list:
+    return list(dict.fromkeys(items))
+
+
+def sql_candidates(shape: QueryShape) -> list:
+    """
+    Index candidates for one query as (table, columns, kind, reason): per table the equality
+    columns followed by its ORDER BY / GROUP BY columns (or one range column), each join
+    column, and a multi-valued index per JSON array filtered through JSON_TABLE.
+    """
+    candidates = []
+    for table in sorted(set(shape.aliases.values())):
+        equality = _unique(column for name, column in shape.equality if name == table)
+        ranges = _unique(column for name, column in shape.ranges if name == table and column not in equality)
+        order = _unique(column for name, column in shape.order_by if name == table)
+        group = _unique(column for name, column in shape.group_by if name == table)
+        # A sort can only be read from the index if all its columns belong to this table
+        if order and len(order) == len(_unique(shape.order_by)):
+            tail, reason = order, "ORDER BY"
+        elif group and len(group) == len(_unique(shape.group_by)):
+            tail, reason = group, "GROUP BY"
+        else:
+            tail, reason = ranges[:1], "range filter"
+        columns = _unique(equality + tail)[:MAX_INDEX_COLUMNS]
+        if columns:
+            parts = (["equality filter"] if equality else []) + ([reason] if tail else [])
+            candidates.append((table, tuple(columns), "btree", " + ".join(parts)))
+    for table, column in _unique(shape.joins):
+        candidates.append((table, (column,), "btree", "join"))
+    for table, column in _unique(shape.json_filters):
+        candidates.append((table, (column,), "multi-valued",
+                           f"JSON_TABLE filter on {column} (rewrite as '<value>' MEMBER OF ({column}->'$'))"))
+    return candidates
+
+
+def load_mysql_schema(connection) -> tuple:
+    """Returns ({table: set of columns}, {table: [index column tuples]}, {table: set of JSON
+    columns with a multi-valued index}) for the current database."""
+    schema, indexes, multi_valued = {}, {}, {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE()"
+        )
+        for table, column in cursor.fetchall():
+            schema.setdefault(table.lower(), set()).add(column.lower())
+        cursor.execute(
+            "SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME, EXPRESSION FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX"
+        )
+        current = {}
+        for table, index, column, expression in cursor.fetchall():
+            table = table.lower()
+            if column is None:
+                # Functional key part; multi-valued indexes are CAST(... AS ... ARRAY)
+                for json_column in schema.get(table, ()):
+                    if expression and " array" in expression.lower() and f"`{json_column}`" in expression.lower():
+                        multi_valued.setdefault(table, set()).add(json_column)
+                continue
+            current.setdefault((table, index), []).append(column.lower())
+        for (table, _), columns in current.items():
+            indexes.setdefault(table, []).append(tuple(columns))
+    return schema, indexes, multi_valued
+
+
+def _covered(columns: tuple, existing: list) -> bool:
+    # An index serves every query that uses a leftmost prefix of its columns
+    return any(index[:len(columns)] == columns for index in existing)
+
+
+def _scanned_tables(cost, aliases: dict) -> dict:
+    """{table: rows} of the full scans in an EXPLAIN estimate (EXPLAIN names tables by alias)."""
+    scanned = {}
+    for name, rows in cost.full_scans:
+        table = aliases.get(name.lower(), name.lower())
+        scanned[table] = max(scanned.get(table, 0.0), rows)
+    return scanned
+
+
+def _merge(recommendations: dict) -> list:
+    """Folds each candidate into a wider one on the same table that starts with its columns."""
+    merged = sorted(recommendations.values(), key=lambda rec: -len(rec.columns))
+    kept = []
+    for rec in merged:
+        wider = next((other for other in kept if other.db_type == rec.db_type and other.target == rec.target
+                      and other.kind == rec.kind and other.columns[:len(rec.columns)] == rec.columns), None)
+        if wider is None:
+            kept.append(rec)
+            continue
+        wider.count += rec.count
+        wider.latency_ms += rec.latency_ms
+        wider.queries += [query for query in rec.queries if query not in wider.queries]
+        wider.reasons += [reason for reason in rec.reasons if reason not in wider.reasons]
+    return sorted(kept, key=lambda rec: -rec.latency_ms)
+
+
+def recommend_mysql_indexes(workload: list, connection, explain: bool = True) -> list:
+    """
+    Recommends MySQL indexes for a summarized workload. With `explain`, a candidate is only
+    kept if EXPLAIN shows one of its queries scanning the table in full (or sorting in a
+    filesort, for ORDER BY candidates).
+    """
+    from .query_cost import explain_query
+
+    schema, indexes, multi_valued = load_mysql_schema(connection)
+    recommendations = {}
+    for entry in workload:
+        query = entry["query"]
+        shape = analyze_sql(query, schema)
+        candidates = sql_candidates(shape)
+        if not candidates:
+            continue
+        cost = None
+        if explain:
+            try:
+                cost = explain_query(query)
+            except Exception as e:
+                print(f"EXPLAIN failed, skipping query: {e}")
+                continue
+        scanned = _scanned_tables(cost, shape.aliases) if cost is not None else {}
+
+        for table, columns, kind, reason in candidates:
+            if kind == "multi-valued":
+                if columns[0] in multi_valued.get(table, ()):
+                    continue
+            elif _covered(columns, indexes.get(table, [])):
+                continue
+            evidence = []
+            if table in scanned:
+                evidence.append(f"full scan of {table} (~{scanned[table]:,.0f} rows)")
+            elif cost is not None and "ORDER BY" in reason and cost.using_filesort:
+                evidence.append("filesort")
+            if cost is not None and not evidence:
+                continue
+            rec = recommendations.setdefault(
+                (table, columns, kind), IndexRecommendation("mysql", table, columns, kind))
+            rec.count += entry["count"]
+            rec.latency_ms += entry["latency_ms"]
+            rec.queries.append(query)
+            for item in [reason] + evidence:
+                if item not in rec.reasons:
+                    rec.reasons.append(item)
+    return _merge(recommendations)
+
+
+def create_mysql_index(connection, rec: IndexRecommendation):
+    with connection.cursor() as cursor:
+        cursor.execute(rec.statement())
+
+
+# --- MongoDB -----------------------------------------------------------------------------
+
+def _filter_fields(query_filter: dict, equality: list, ranges: list):
+    for key, value in query_filter.items():
+        if key == "$and" and isinstance(value, list):
+            for clause in value:
+                if isinstance(clause, dict):
+                    _filter_fields(clause, equality, ranges)
+        elif key.startswith("$") or key == "_id":
+            continue  # $or / $expr / $text cannot use one compound index; _id is always indexed
+        elif isinstance(value, dict) and any(operator.startswith("$") for operator in value):
+            if MONGO_EQUALITY.intersection(value):
+                equality.append(key)
+            elif MONGO_RANGE.intersection(value):
+                ranges.append(key)
+        else:
+            equality.append(key)
+
+
+def _filter_and_sort(plan) -> tuple:
+    """The filter and sort of a find-like query, or of an aggregation's leading $match/$sort stages."""
+    if plan.operation != "aggregate":
+        return plan.filter or {}, list(plan.sort or [])
+    matches, sort = [], []
+    for stage in plan.pipeline or []:
+        if "$match" in stage and not sort:
+            matches.append(stage["$match"])
+        elif "$sort" in stage and not sort:
+            sort = list(stage["$sort"].items())
+        else:
+            break
+    return ({"$and": matches} if len(matches) > 1 else matches[0] if matches else {}), sort
+
+
+def mongo_candidate(plan):
+    """
+    Compound index keys [(field, direction)] for a parsed MongoDB query, following the
+    equality, sort, range rule, or None.
+    """
+    if plan.operation == "estimated_document_count":
+        return None
+    query_filter, sort = _filter_and_sort(plan)
+    equality, ranges = [], []
+    _filter_fields(query_filter, equality, ranges)
+    keys = [(name, 1) for name in _unique(equality)]
+    keys += [(name, direction) for name, direction in sort if name not in equality and name != "_id"]
+    keys += [(name, 1) for name in _unique(ranges)[:1] if name not in dict(keys)]
+    return keys[:MAX_INDEX_COLUMNS] or None
+
+
+def _mongo_collscan(db, plan):
+    """True if the query's filter and sort run as a collection scan or in-memory sort, None if explain fails."""
+    query_filter, sort = _filter_and_sort(plan)
+    try:
+        winning = db[plan.collection].find(query_filter, sort=sort or None).explain()["queryPlanner"]["winningPlan"]
+    except Exception:
+        return None
+    stages = json.dumps(winning, default=str)
+    return "COLLSCAN" in stages or '"SORT"' in stages
+
+
+def recommend_mongo_indexes(workload: list, db, explain: bool = True) -> list:
+    """Recommends compound indexes for a summarized MongoDB workload."""
+    from .mongo_query import MongoQueryError, parse_mongo_query
+
+    recommendations = {}
+    existing_by_collection = {}
+    for entry in workload:
+        try:
+            plan = parse_mongo_query(entry["query"])
+        except MongoQueryError:
+            continue
+        keys = mongo_candidate(plan)
+        if keys is None:
+            continue
+        if plan.collection not in existing_by_collection:
+            existing_by_collection[plan.collection] = [
+                tuple(tuple(key) for key in info["key"]) for info in db[plan.collection].index_information().values()
+            ]
+        if _covered(tuple(keys), existing_by_collection[plan.collection]):
+            continue
+        evidence = []
+        if explain:
+            scan = _mongo_collscan(db, plan)
+            if scan is False:
+                continue
+            if scan:
+                evidence.append("collection scan or in-memory sort")
+        rec = recommendations.setdefault(
+            (plan.collection, tuple(keys)), IndexRecommendation("mongodb", plan.collection, tuple(keys), "compound"))
+        rec.count += entry["count"]
+        rec.latency_ms += entry["latency_ms"]
+        rec.queries.append(entry["query"])
+        for item in [f"{plan.operation} filter/sort fields"] + evidence:
+            if item not in rec.reasons:
+                rec.reasons.append(item)
+    return _merge(recommendations)
+
+
+def create_mongo_index(db, rec: IndexRecommendation):
+    db[rec.target].create_index(list(rec.columns), name=rec.name)
+
+
+# --- Replay and report ----------------------------------------------------------------
+
+def replay_workload(workload: list, db_type: str, runs: int, timeout: float) -> dict:
+    """
+    Runs each logged query `runs` times through the regular execution path (result cache
+    bypassed) and returns {query: median latency in ms, or None if it timed out or failed}.
+    """
+    from .query_control import run_with_timeout
+    from .query_execution import execute_sql, fetch_nosql
+
+    def run_once(query):
+        if db_type == "mongodb":
+            return fetch_nosql(query)
+        return execute_sql(query, use_cache=False), False
+
+    latencies = {}
+    for entry in workload:
+        query = entry["query"]
+        samples = []
+        for _ in range(runs):
+            result = run_with_timeout(lambda: run_once(query), timeout=timeout)
+            if not result.ok:
+                samples = None
+                break
+            samples.append(result.elapsed * 1000)
+        latencies[query] = statistics.median(samples) if samples else None
+    return latencies
+
+
+def _format_ms(value) -> str:
+    return "timeout/error" if value is None else f"{value:,.1f} ms"
+
+
+def print_report(before: dict, after: dict):
+    print("\nLatency before/after (median per query):")
+    total_before = total_after = 0.0
+    for query, latency in before.items():
+        new = after.get(query)
+        change = f"{latency / new:,.1f}x" if latency and new else "n/a"
+        print(f"  {_format_ms(latency):>14} -> {_format_ms(new):>14}  ({change})  {' '.join(query.split())[:80]}")
+        if latency is not None and new is not None:
+            total_before += latency
+            total_after += new
+    if total_after:
+        print(f"Total: {total_before:,.1f} ms -> {total_after:,.1f} ms ({total_before / total_after:,.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default=WORKLOAD_LOG_PATH, help="workload log written by the app")
+    parser.add_argument("--db", choices=["mysql", "mongodb", "both"], default="both")
+    parser.add_argument("--min-count", type=int, default=1, help="ignore queries logged fewer times")
+    parser.add_argument("--no-explain", action="store_true", help="recommend without checking EXPLAIN plans")
+    parser.add_argument("--apply", action="store_true", help="create the recommended indexes")
+    parser.add_argument("--runs", type=int, default=3, help="replays per query for the latency report")
+    parser.add_argument("--replay-limit", type=int, default=20, help="replay at most this many queries")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds per replayed query")
+    args = parser.parse_args()
+
+    records = load_workload(args.log)
+    db_types = ["mysql", "mongodb"] if args.db == "both" else [args.db]
+    for db_type in db_types:
+        workload = [entry for entry in summarize_workload(records, db_type) if entry["count"] >= args.min_count]
+        if not workload:
+            print(f"No logged {db_type} queries in {args.log}")
+            continue
+
+        if db_type == "mysql":
+            from .rdbms_connector import open_rdbms_connection
+
+            connection = open_rdbms_connection()
+            try:
+                recommendations = recommend_mysql_indexes(workload, connection, explain=not args.no_explain)
+            finally:
+                connection.close()
+        else:
+            from .nosql_connector import connect_to_nosql
+
+            db = connect_to_nosql()
+            recommendations = recommend_mongo_indexes(workload, db, explain=not args.no_explain)
+
+        print(f"\n{db_type}: {len(workload)} distinct queries, {len(recommendations)} recommended indexes")
+        for rec in recommendations:
+            print(f"  {rec.statement()}")
+            print(f"    {rec.count} logged executions, {rec.latency_ms:,.1f} ms recorded; {'; '.join(rec.reasons)}")
+        if not (args.apply and recommendations):
+            continue
+
+        replayed = [entry for entry in workload
+                    if any(entry["query"] in rec.queries for rec in recommendations)][:args.replay_limit]
+        before = replay_workload(replayed, db_type, args.runs, args.timeout)
+        if db_type == "mysql":
+            connection = open_rdbms_connection()
+            try:
+                for rec in recommendations:
+                    print(f"Creating {rec.name}")
+                    create_mysql_index(connection, rec)
+            finally:
+                connection.close()
+        else:
+            for rec in recommendations:
+                print(f"Creating {rec.name}")
+                create_mongo_index(db, rec)
+        after = replay_workload(replayed, db_type, args.runs, args.timeout)
+        print_report(before, after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Shared MongoClient for the process, with connection pool metrics
+import threading
+
+from pymongo import MongoClient, monitoring
+
+from ..config import DB_POOL_SIZE, DB_POOL_TIMEOUT
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Counts MongoClient connection pool events for get_pool_stats()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "closed": 0, "checked_out": 0, "checked_in": 0, "checkout_failures": 0, "cleared": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._count("cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._count("created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._count("closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._count("checkout_failures")
+
+    def connection_checked_out(self, event):
+        self._count("checked_out")
+
+    def connection_checked_in(self, event):
+        self._count("checked_in")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["open"] = stats["created"] - stats["closed"]
+        stats["in_use"] = stats["checked_out"] - stats["checked_in"]
+        return stats
+
+
+_mongo_client = None
+_mongo_listener = MongoPoolListener()
+_lock = threading.Lock()
+
+
+def get_mongo_client(uri: str, on_create=None) -> MongoClient:
+    """Returns the process-wide MongoClient (which pools connections internally)."""
+    global _mongo_client
+    if _mongo_client is None:
+        with _lock:
+            if _mongo_client is None:
+                client = MongoClient(
+                    uri,
+                    maxPoolSize=DB_POOL_SIZE,
+                    waitQueueTimeoutMS=int(DB_POOL_TIMEOUT * 1000),
+                    event_listeners=[_mongo_listener],
+                )
+                if on_create is not None:
+                    try:
+                        on_create(client)
+                    except Exception:
+                        client.close()
+                        raise
+                _mongo_client = client
+    return _mongo_client
+
+
+def get_mongo_pool_stats() -> dict:
+    return _mongo_listener.snapshot() if _mongo_client is not None else None
@@ -0,0 +1,194 @@
+# Parses PyMongo-style query strings into structured plans and executes them without eval
+import ast
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from ..config import MONGO_BATCH_SIZE, MONGO_MAX_ROWS, MONGO_MAX_TIME_MS
+
+CURSOR_METHODS = {"sort", "skip", "limit", "batch_size", "max_time_ms"}
+OPERATIONS = {"find", "find_one", "aggregate", "count_documents", "distinct", "estimated_document_count"}
+# Names the LLM sometimes emits in shell or PyMongo style
+LITERAL_NAMES = {"true": True, "false": False, "null": None, "None": None, "True": True, "False": False}
+SORT_CONSTANTS = {"ASCENDING": 1, "DESCENDING": -1}
+
+
+class MongoQueryError(ValueError):
+    """Raised when a query string is not a supported PyMongo expression."""
+
+
+@dataclass(frozen=True)
+class MongoQueryPlan:
+    """A parsed MongoDB query. Plans are cached and shared, so treat them as read-only."""
+
+    collection: str
+    operation: str
+    filter: dict = field(default_factory=dict)
+    projection: dict = None
+    sort: list = None
+    skip: int = 0
+    limit: int = 0
+    pipeline: list = None
+    key: str = None
+
+
+class _LiteralNames(ast.NodeTransformer):
+    def visit_Name(self, node):
+        if node.id in LITERAL_NAMES:
+            return ast.copy_location(ast.Constant(LITERAL_NAMES[node.id]), node)
+        return node
+
+    def visit_Attribute(self, node):
+        # pymongo.ASCENDING / pymongo.DESCENDING
+        if node.attr in SORT_CONSTANTS:
+            return ast.copy_location(ast.Constant(SORT_CONSTANTS[node.attr]), node)
+        return self.generic_visit(node)
+
+
+def _literal(node):
+    try:
+        return ast.literal_eval(_LiteralNames().visit(node))
+    except (ValueError, TypeError, SyntaxError) as e:
+        raise MongoQueryError(f"Unsupported value in query: {ast.unparse(node)}") from e
+
+
+def _collection_name(node) -> str:
+    # db["movies"], db.movies or db.get_collection("movies")
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == "db":
+        name = _literal(node.slice)
+        if isinstance(name, str):
+            return name
+    if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "db":
+        return node.attr
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "get_collection"
+            and isinstance(node.func.value, ast.Name) and node.func.value.id == "db" and node.args):
+        return _literal(node.args[0])
+    raise MongoQueryError("Query must start with db[\"collection\"]")
+
+
+def _arguments(call: ast.Call, names: list) -> dict:
+    """Maps positional and keyword arguments of `call` onto `names`."""
+    if len(call.args) > len(names):
+        raise MongoQueryError(f"Too many arguments in {ast.unparse(call)}")
+    values = {name: _literal(arg) for name, arg in zip(names, call.args)}
+    for keyword in call.keywords:
+        if keyword.arg is None:
+            raise MongoQueryError("**kwargs are not supported")
+        values[keyword.arg] = _literal(keyword.value)
+    return values
+
+
+def _sort_spec(arguments: dict) -> list:
+    key = arguments.get("key_or_list")
+    if isinstance(key, str):
+        return [(key, arguments.get("direction", 1))]
+    if isinstance(key, dict):
+        return list(key.items())
+    if isinstance(key, (list, tuple)):
+        return [tuple(item) for item in key]
+    raise MongoQueryError("Unsupported sort specification")
+
+
+@lru_cache(maxsize=1024)
+def parse_mongo_query(query: str) -> MongoQueryPlan:
+    """
+    Parses a PyMongo-style expression such as
+    db["orders"].find({"quantity": {"$gt": 2}}, {"_id": 0}).sort("order_date", -1).limit(10)
+    into a MongoQueryPlan. Only literal arguments are accepted; nothing is evaluated.
+    """
+    try:
+        node = ast.parse(query.strip().rstrip(";"), mode="eval").body
+    except SyntaxError as e:
+        raise MongoQueryError(f"Invalid query syntax: {e.msg}") from e
+
+    # Tolerate a wrapping list(...)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "list" and len(node.args) == 1:
+        node = node.args[0]
+
+    # Unwind the method chain: [(method, call), ...] from the collection outwards
+    chain = []
+    while isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr != "get_collection":
+        chain.append((node.func.attr, node))
+        node = node.func.value
+    chain.reverse()
+    if not chain or chain[0][0] not in OPERATIONS:
+        raise MongoQueryError(f"Supported operations are: {', '.join(sorted(OPERATIONS))}")
+
+    collection = _collection_name(node)
+    operation, call = chain[0]
+    plan = {"collection": collection, "operation": operation}
+
+    if operation in ("find", "find_one"):
+        arguments = _arguments(call, ["filter", "projection"])
+        plan["filter"] = arguments.get("filter") or {}
+        plan["projection"] = arguments.get("projection")
+        if "sort" in arguments:
+            plan["sort"] = _sort_spec({"key_or_list": arguments["sort"]})
+        plan["skip"] = arguments.get("skip", 0)
+        plan["limit"] = arguments.get("limit", 0)
+    elif operation == "aggregate":
+        pipeline = _arguments(call, ["pipeline"]).get("pipeline")
+        if not isinstance(pipeline, list) or not all(isinstance(stage, dict) for stage in pipeline):
+            raise MongoQueryError("aggregate() needs a pipeline list of stage dicts")
+        plan["pipeline"] = pipeline
+    elif operation == "count_documents":
+        plan["filter"] = _arguments(call, ["filter"]).get("filter") or {}
+    elif operation == "distinct":
+        arguments = _arguments(call, ["key", "filter"])
+        plan["key"] = arguments.get("key")
+        plan["filter"] = arguments.get("filter") or {}
+
+    for method, call in chain[1:]:
+        if operation != "find" or method not in CURSOR_METHODS:
+            raise MongoQueryError(f"Unsupported method .{method}() after .{operation}()")
+        if method == "sort":
+            plan["sort"] = _sort_spec(_arguments(call, ["key_or_list", "direction"]))
+        elif method in ("skip", "limit"):
+            value = _arguments(call, ["value"]).get("value")
+            if not isinstance(value, int):
+                raise MongoQueryError(f".{method}() needs an integer")
+            plan[method] = value
+        # batch_size / max_time_ms from the query are ignored in favour of the configured bounds
+
+    if not isinstance(plan.get("filter", {}), dict):
+        raise MongoQueryError("The query filter must be a dict")
+    return MongoQueryPlan(**plan)
+
+
+def execute_mongo_plan(db, plan: MongoQueryPlan, max_rows: int = MONGO_MAX_ROWS,
+                       batch_size: int = MONGO_BATCH_SIZE, max_time_ms: int = MONGO_MAX_TIME_MS,
+                       comment: str = None) -> tuple:
+    """
+    Executes a plan with a bounded result size and server-side time limit. `comment` is
+    attached to the operation, so it can be found in currentOp (and killed).
+    Returns (result, truncated); `result` is a list of documents, a document, or a scalar.
+    """
+    extra = {"comment": comment} if comment is not None else {}
+    collection = db[plan.collection]
+
+    if plan.operation == "find":
+        # A limit from the query is honoured as is; otherwise fetch one document beyond the
+        # cap to detect truncation
+        capped = not plan.limit or plan.limit > max_rows
+        limit = max_rows + 1 if capped else plan.limit
+        cursor = collection.find(
+            plan.filter, plan.projection, sort=plan.sort, skip=plan.skip, limit=limit,
+            batch_size=batch_size, max_time_ms=max_time_ms, **extra,
+        )
+        documents = list(cursor)
+        return documents[:max_rows], capped and len(documents) > max_rows
+    if plan.operation == "find_one":
+        return collection.find_one(plan.filter, plan.projection, sort=plan.sort, max_time_ms=max_time_ms,
+                                   **extra), False
+    if plan.operation == "aggregate":
+        pipeline = list(plan.pipeline)
+        writes = pipeline and isinstance(pipeline[-1], dict) and any(
+            stage in pipeline[-1] for stage in ("$out", "$merge"))
+        if not writes:
+            pipeline.append({"$limit": max_rows + 1})
+        documents = list(collection.aggregate(pipeline, maxTimeMS=max_time_ms, batchSize=batch_size, **extra))
+        return documents[:max_rows], len(documents) > max_rows
+    if plan.operation == "count_documents":
+        return collection.count_documents(plan.filter, maxTimeMS=max_time_ms, **extra), False
+    if plan.operation == "distinct":
+        return collection.distinct(plan.key, plan.filter, maxTimeMS=max_time_ms, **extra), False
+    return collection.estimated_document_count(maxTimeMS=max_time_ms, **extra), False
@@ -0,0 +1,208 @@
+"""
+movie_actors: a normalized copy of movies.actors_json, one row per array element.
+
+Queries that expand actors_json with JSON_TABLE parse the JSON of every movie row they
+touch, so filtering movies by actor is a full scan. The side table holds the same values,
+indexed by movie and by actor name, and is kept in sync by triggers on movies. Once it
+exists it is part of the schema like any other table, and rewrite_json_tables() moves
+the JSON_TABLE expansions of generated queries onto it.
+
+Usage (from the project root):
+    python -m src.db.movie_actors                 # create or rebuild it in the configured database
+    python -m src.db.movie_actors --drop          # remove the table and its triggers
+"""
+import argparse
+import re
+import time
+
+SIDE_TABLE = "movie_actors"
+# Values longer than this come out of JSON_TABLE as NULL, in queries and in the side table alike
+ACTOR_NAME_LENGTH = 255
+# What a JSON_TABLE VARCHAR column uses unless told otherwise: names compare case-sensitively
+ACTOR_NAME_COLLATION = "utf8mb4_bin"
+# The join key of the derived table, named so it cannot clash with the query's own movie_id
+JOIN_KEY = "_ma_movie_id"
+TRIGGERS = ("movie_actors_insert", "movie_actors_update", "movie_actors_delete")
+
+CREATE_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {SIDE_TABLE} (
+    movie_id INT NOT NULL,
+    position INT NOT NULL,
+    actor_name VARCHAR({ACTOR_NAME_LENGTH}) CHARACTER SET utf8mb4 COLLATE {ACTOR_NAME_COLLATION},
+    PRIMARY KEY (movie_id, position),
+    KEY idx_movie_actors_actor_name (actor_name, movie_id)
+)"""
+
+# The array elements of `{source}`.actors_json with their positions; invalid JSON yields no rows
+_ELEMENTS = f"""JSON_TABLE(
+    IF(JSON_VALID({{source}}.actors_json), {{source}}.actors_json, '[]'),
+    '$[*]' COLUMNS(position FOR ORDINALITY, actor_name VARCHAR({ACTOR_NAME_LENGTH}) PATH '$')
+) AS jt"""
+# Rows of the movie a trigger fires for
+_EXPAND = f"SELECT NEW.movie_id, jt.position - 1, jt.actor_name FROM {_ELEMENTS.format(source='NEW')}"
+BACKFILL = f"""
+INSERT INTO {SIDE_TABLE} (movie_id, position, actor_name)
+SELECT m.movie_id, jt.position - 1, jt.actor_name
+FROM movies m JOIN {_ELEMENTS.format(source='m')}
+WHERE m.movie_id BETWEEN %s AND %s"""
+
+CREATE_TRIGGERS = [
+    f"""CREATE TRIGGER movie_actors_insert AFTER INSERT ON movies FOR EACH ROW
+INSERT INTO {SIDE_TABLE} (movie_id, position, actor_name) {_EXPAND}""",
+    f"""CREATE TRIGGER movie_actors_update AFTER UPDATE ON movies FOR EACH ROW
+BEGIN
+    IF NOT (NEW.actors_json <=> OLD.actors_json) OR NEW.movie_id <> OLD.movie_id THEN
+        DELETE FROM {SIDE_TABLE} WHERE movie_id = OLD.movie_id;
+        INSERT INTO {SIDE_TABLE} (movie_id, position, actor_name) {_EXPAND};
+    END IF;
+END""",
+    f"""CREATE TRIGGER movie_actors_delete AFTER DELETE ON movies FOR EACH ROW
+DELETE FROM {SIDE_TABLE} WHERE movie_id = OLD.movie_id""",
+]
+
+# JOIN JSON_TABLE(m.actors_json, '$[*]' COLUMNS(name VARCHAR(255) PATH '$')) [AS] jt [ON TRUE]
+# (or `, JSON_TABLE(...)` right after the movies table). Other shapes are left alone.
+JSON_TABLE_EXPANSION = re.compile(
+    r"\s*(?P<join>(?:\b(?:INNER|CROSS)\s+)?\bJOIN\b|,)\s*JSON_TABLE\s*\(\s*"
+    r"(?:`?(?P<qualifier>\w+)`?\s*\.\s*)?`?actors_json`?\s*,\s*"
+    r"(?P<quote>['\"])\$\[\*\](?P=quote)\s*COLUMNS\s*\(\s*"
+    r"`?(?P<column>\w+)`?\s+(?:VARCHAR|CHAR)\s*\(\s*(?P<length>\d+)\s*\)"
+    r"(?:\s+(?:CHARACTER\s+SET|CHARSET)\s+(?P<charset>\w+))?(?:\s+COLLATE\s+(?P<collation>\w+))?"
+    r"\s+PATH\s+(?P<path_quote>['\"])\$(?P=path_quote)\s*\)\s*\)"
+    r"\s*(?:AS\s+)?`?(?P<alias>\w+)`?(?P<on_true>\s+ON\s+(?:TRUE|1)\b)?",
+    re.IGNORECASE,
+)
+OUTER_JOIN_BEFORE = re.compile(r"\b(LEFT|RIGHT|OUTER|NATURAL)\s*$", re.IGNORECASE)
+# An ON condition of its own would have to be merged with the movie_id join condition
+ON_AFTER = re.compile(r"\s+ON\b", re.IGNORECASE)
+
+
+def has_side_table(schema: dict) -> bool:
+    """Whether `schema` (as built by get_sql_schema) has movie_actors next to movies.actors_json."""
+    columns = schema.get(SIDE_TABLE) or {}
+    return "actors_json" in (schema.get("movies") or {}) and {"movie_id", "actor_name"} <= set(columns)
+
+
+def _movies_alias(aliases: dict, qualifier: str):
+    # The name the query uses for movies: the JSON_TABLE's qualifier, or its only alias
+    if qualifier is not None:
+        return qualifier if aliases.get(qualifier.lower()) == "movies" else None
+    names = [alias for alias, table in aliases.items() if table == "movies" and alias != "movies"]
+    if len(names) > 1 or not any(table == "movies" for table in aliases.values()):
+        return None
+    return names[0] if names else "movies"
+
+
+def rewrite_json_tables(sql_query: str) -> str:
+    """
+    Replaces inner joins of JSON_TABLE over movies.actors_json with joins of movie_actors.
+
+    The side table is joined as a derived table that keeps the JSON_TABLE's alias, column
+    name and collation, so the rest of the query is unchanged; MySQL merges it into the
+    outer query and reads movie_actors through its indexes. LEFT JOINs, joins with an
+    ON condition, other paths, columns and character sets, and numeric casts keep their
+    JSON_TABLE.
+    """
+    from .sql_analysis import table_aliases
+
+    if "json_table" not in sql_query.lower():
+        return sql_query
+    aliases = table_aliases(sql_query)
+
+    def replace(match):
+        before = sql_query[:match.start()]
+        movies = _movies_alias(aliases, match.group("qualifier"))
+        charset = match.group("charset")
+        if (movies is None or int(match.group("length")) < ACTOR_NAME_LENGTH
+                or charset is not None and charset.lower() != "utf8mb4"
+                or OUTER_JOIN_BEFORE.search(before)
+                or not match.group("on_true") and ON_AFTER.match(sql_query, match.end())):
+            return match.group(0)
+        if match.group("join") == ",":
+            # Only `movies m, JSON_TABLE(...)`: behind other comma-joined tables ON can't see movies
+            if not re.search(rf"\bmovies(?:\s+(?:AS\s+)?`?{re.escape(movies)}`?)?\s*$", before, re.IGNORECASE):
+                return match.group(0)
+        alias, column = match.group("alias"), match.group("column")
+        collation = match.group("collation")
+        name = f"actor_name COLLATE {collation}" if collation else "actor_name"
+        return (f" JOIN (SELECT movie_id AS {JOIN_KEY}, {name} AS {column} FROM {SIDE_TABLE}) AS {alias} "
+                f"ON {alias}.{JOIN_KEY} = {movies}.movie_id")
+
+    return JSON_TABLE_EXPANSION.sub(replace, sql_query)
+
+
+def create_side_table(connection):
+    """Creates movie_actors if needed and (re)creates the triggers that keep it in sync."""
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLE)
+        # Tables created before actor_name had an explicit collation
+        cursor.execute("SELECT COLLATION_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() "
+                       "AND TABLE_NAME = %s AND COLUMN_NAME = 'actor_name'", (SIDE_TABLE,))
+        row = cursor.fetchone()
+        if row is not None and row[0] != ACTOR_NAME_COLLATION:
+            cursor.execute(f"ALTER TABLE {SIDE_TABLE} MODIFY actor_name VARCHAR({ACTOR_NAME_LENGTH}) "
+                           f"CHARACTER SET utf8mb4 COLLATE {ACTOR_NAME_COLLATION}")
+        for trigger in TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        for statement in CREATE_TRIGGERS:
+            cursor.execute(statement)
+    connection.commit()
+
+
+def backfill(connection, batch_size: int = 20000) -> int:
+    """
+    Rebuilds the rows of all movies, `batch_size` movie ids per transaction. The triggers
+    are created first, so writes during the backfill are not lost. Returns the rows written.
+    """
+    rows = 0
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT MIN(movie_id), MAX(movie_id) FROM movies")
+        low, high = cursor.fetchone()
+    if low is None:
+        return 0
+    for start in range(low, high + 1, batch_size):
+        end = start + batch_size - 1
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SIDE_TABLE} WHERE movie_id BETWEEN %s AND %s", (start, end))
+            rows += cursor.execute(BACKFILL, (start, end))
+        connection.commit()
+    return rows
+
+
+def build_side_table(connection, batch_size: int = 20000) -> int:
+    """Creates movie_actors and its triggers and fills it from movies. Returns the rows written."""
+    create_side_table(connection)
+    return backfill(connection, batch_size)
+
+
+def drop_side_table(connection):
+    with connection.cursor() as cursor:
+        for trigger in TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute(f"DROP TABLE IF EXISTS {SIDE_TABLE}")
+    connection.commit()
+
+
+def main():
+    from .rdbms_connector import connect_to_rdbms
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=20000, help="movie ids per backfill transaction")
+    parser.add_argument("--drop", action="store_true", help="drop the table and its triggers instead")
+    args = parser.parse_args()
+
+    connection = connect_to_rdbms()
+    try:
+        if args.drop:
+            drop_side_table(connection)
+            print(f"Dropped {SIDE_TABLE} and its triggers")
+            return
+        start = time.perf_counter()
+        rows = build_side_table(connection, args.batch_size)
+        print(f"{SIDE_TABLE}: {rows} rows in {time.perf_counter() - start:.2f}s")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,33 @@
 # Handles MongoDB database connection
-from pymongo import MongoClient
+from ..telemetry import get_logger
+
+logger = get_logger(__name__)
+
+MONGO_URI = "mongodb://localhost:27017/"
+MONGO_DATABASE = "sales"
+
+
+def _check_connection(client):
+    # Test the connection once, when the shared client is created
+    client.server_info()
+    
+    # Debug: Print available collections
+    collections = client[MONGO_DATABASE].list_collection_names()
+    logger.info("Available collections: %s", collections)
 
 
 def connect_to_nosql():
-    """Establishes a connection to a NoSQL database."""
+    """Returns the NoSQL database from the process-wide shared MongoClient."""
+    # Imported on first use so pymongo is only loaded when MongoDB is actually used
+    from .mongo_pool import get_mongo_client
     try:
-        client = MongoClient("mongodb://localhost:27017/")
-        # Test the connection
-        client.server_info()
-        db = client["sales"]  # Use the existing database
-        
-        # Debug: Print available collections
-        collections = db.list_collection_names()
-        print("Available collections:", collections)
-        
-        return db
+        client = get_mongo_client(MONGO_URI, on_create=_check_connection)
+        return client[MONGO_DATABASE]  # Use the existing database
     except Exception as e:
-        print(f"Error connecting to MongoDB: {str(e)}")
+        logger.error("Error connecting to MongoDB: %s", e)
         raise
+
+
+def get_nosql_target() -> str:
+    """Returns a string identifying the MongoDB connection target (used as a cache key)."""
+    return f"{MONGO_URI.rstrip('/')}/{MONGO_DATABASE}"
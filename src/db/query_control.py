@@ -0,0 +1,258 @@
+# Time budgets and cancellation for generated queries
+import itertools
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+from ..config import QUERY_TIMEOUT
+from ..jobs import get_job_queue
+from ..telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# MySQL error codes for interrupted statements
+ER_QUERY_TIMEOUT = 3024  # MAX_EXECUTION_TIME exceeded
+ER_QUERY_INTERRUPTED = 1317  # KILL QUERY
+# MongoDB error codes
+MONGO_EXCEEDED_TIME_LIMIT = 50
+MONGO_INTERRUPTED = 11601
+
+SELECT_PREFIX = re.compile(r"^\s*select\b", re.IGNORECASE)
+
+
+@dataclass
+class QueryResult:
+    """
+    Outcome of a query run with a time budget.
+
+    `status` is "ok", "timeout", "cancelled" or "error". For timeouts and cancellations
+    `data` holds the rows fetched before the query was stopped, if any (`truncated` is then
+    True); for errors `message` describes what went wrong.
+    """
+
+    status: str
+    data: Any = None
+    truncated: bool = False
+    elapsed: float = 0.0
+    message: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+
+class QueryInterrupted(RuntimeError):
+    """Raised when a running query is stopped by its time budget or by cancel_query."""
+
+    def __init__(self, status: str, message: str, partial=None):
+        super().__init__(message)
+        self.status = status
+        self.partial = partial
+
+
+class QueryHandle:
+    """A running query: its deadline and what is needed to stop it on the server."""
+
+    def __init__(self, query_id: str, timeout: float):
+        self.query_id = query_id
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.stop_reason = None  # "timeout" or "cancelled" once stopping was requested
+        self.mysql_thread_id = None
+        self.mongo_db = None
+        self.lock = threading.Lock()
+
+    @property
+    def mongo_comment(self) -> str:
+        return f"chatdb:{self.query_id}"
+
+    def remaining_ms(self):
+        if self.deadline is None:
+            return None
+        return max(1, int((self.deadline - time.monotonic()) * 1000))
+
+    def check(self):
+        if self.stop_reason is not None:
+            raise QueryInterrupted(self.stop_reason, f"Query {self.stop_reason}")
+
+    def stop(self, reason: str):
+        """Marks the query as stopped and interrupts it on the server, if it is running there."""
+        # Held while killing, so the connection cannot go back to the pool (and run someone
+        # else's statement) before the KILL has been delivered
+        with self.lock:
+            if self.stop_reason is not None:
+                return
+            self.stop_reason = reason
+            try:
+                if self.mysql_thread_id is not None:
+                    _kill_mysql_query(self.mysql_thread_id)
+                elif self.mongo_db is not None:
+                    _kill_mongo_operation(self.mongo_db, self.mongo_comment)
+            except Exception as e:
+                logger.warning("Could not interrupt query %s: %s", self.query_id, e)
+
+
+def _kill_mysql_query(thread_id: int):
+    # A separate, unpooled connection, so this works even when the pool is exhausted
+    from .rdbms_connector import open_rdbms_connection
+
+    connection = open_rdbms_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"KILL QUERY {int(thread_id)}")
+    finally:
+        connection.close()
+
+
+def _kill_mongo_operation(db, comment: str):
+    admin = db.client.admin
+    for operation in admin.command({"currentOp": 1, "command.comment": comment}).get("inprog", []):
+        admin.command("killOp", op=operation["opid"])
+
+
+_local = threading.local()
+
+
+def current_query():
+    """The QueryHandle of the query running on this thread, or None."""
+    return getattr(_local, "handle", None)
+
+
+def attach_mysql_connection(connection):
+    """Records the connection the current query runs on, so it can be killed."""
+    handle = current_query()
+    if handle is None:
+        return
+    with handle.lock:
+        handle.mysql_thread_id = connection.thread_id()
+    handle.check()
+
+
+def detach_mysql_connection():
+    handle = current_query()
+    if handle is not None:
+        with handle.lock:
+            handle.mysql_thread_id = None
+
+
+def check_stopped():
+    """Raises QueryInterrupted if the current query was asked to stop."""
+    handle = current_query()
+    if handle is not None:
+        handle.check()
+
+
+def apply_time_limit(sql_query: str) -> str:
+    """Adds a MAX_EXECUTION_TIME optimizer hint for the current query's remaining budget (SELECT only)."""
+    handle = current_query()
+    if handle is None or handle.deadline is None or not SELECT_PREFIX.match(sql_query):
+        return sql_query
+    return SELECT_PREFIX.sub(f"SELECT /*+ MAX_EXECUTION_TIME({handle.remaining_ms()}) */", sql_query, count=1)
+
+
+def mongo_options(db, max_time_ms: int) -> dict:
+    """maxTimeMS capped by the current query's budget, plus a comment that identifies it for killOp."""
+    handle = current_query()
+    if handle is None:
+        return {"max_time_ms": max_time_ms}
+    with handle.lock:
+        handle.mongo_db = db
+    handle.check()
+    remaining = handle.remaining_ms()
+    return {
+        "max_time_ms": min(max_time_ms, remaining) if remaining is not None else max_time_ms,
+        "comment": handle.mongo_comment,
+    }
+
+
+def interruption(error: Exception):
+    """Translates a driver error caused by a time limit or KILL into a QueryInterrupted, else None."""
+    if isinstance(error, QueryInterrupted):
+        return error
+    handle = current_query()
+    reason = handle.stop_reason if handle is not None else None
+    code = error.args[0] if error.args and isinstance(error.args[0], int) else getattr(error, "code", None)
+    if code in (ER_QUERY_TIMEOUT, MONGO_EXCEEDED_TIME_LIMIT):
+        return QueryInterrupted("timeout", "Query exceeded its time limit")
+    if code in (ER_QUERY_INTERRUPTED, MONGO_INTERRUPTED) or reason is not None:
+        reason = reason or "cancelled"
+        return QueryInterrupted(reason, f"Query {reason}")
+    return None
+
+
+_ids = itertools.count(1)
+
+
+def _new_handle(timeout: float) -> QueryHandle:
+    return QueryHandle(f"{next(_ids)}-{uuid.uuid4().hex[:8]}", timeout)
+
+
+def _run(handle: QueryHandle, fn) -> QueryResult:
+    _local.handle = handle
+    # The budget starts when the query starts running, not when it was queued
+    handle.deadline = time.monotonic() + handle.timeout if handle.timeout else None
+    watchdog = threading.Timer(handle.timeout, handle.stop, args=("timeout",)) if handle.timeout else None
+    if watchdog is not None:
+        watchdog.daemon = True
+        watchdog.start()
+    start = time.monotonic()
+    try:
+        handle.check()  # cancelled between leaving the queue and starting
+        data, truncated = fn()
+        return QueryResult("ok", data, truncated, time.monotonic() - start)
+    except Exception as e:
+        interrupted = interruption(e)
+        if interrupted is None:
+            return QueryResult("error", elapsed=time.monotonic() - start, message=str(e))
+        partial = interrupted.partial
+        return QueryResult(interrupted.status, partial, partial is not None, time.monotonic() - start,
+                           "Query exceeded its time limit" if interrupted.status == "timeout" else "Query cancelled")
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+        _local.handle = None
+
+
+def run_with_timeout(fn, timeout: float = QUERY_TIMEOUT) -> QueryResult:
+    """
+    Runs `fn` (returning (data, truncated)) on this thread with a time budget of `timeout`
+    seconds (0 or None: unbounded). MySQL SELECTs get a MAX_EXECUTION_TIME hint, MongoDB
+    operations a capped maxTimeMS, and a watchdog thread issues KILL QUERY / killOp when
+    the budget runs out for statements the server does not bound itself.
+    """
+    return _run(_new_handle(timeout), fn)
+
+
+def start_query(fn, timeout: float = QUERY_TIMEOUT, user_id: str = "anonymous", kind: str = "query") -> str:
+    """
+    Queues `fn` to run like run_with_timeout on the shared job queue and returns its query
+    id. Raises JobQueueFull if `user_id` already has too many queued jobs.
+    """
+    handle = _new_handle(timeout)
+    return get_job_queue().submit(user_id, lambda job: _run(handle, fn), kind=kind, job_id=handle.query_id,
+                                  on_cancel=lambda: handle.stop("cancelled"))
+
+
+def get_query_result(query_id: str, wait: float = 0):
+    """
+    Returns the QueryResult of a query started with start_query once it has finished, or
+    None while it is queued or running. Waits up to `wait` seconds. Results stay available
+    for JOB_RESULT_TTL seconds; unknown or expired ids raise KeyError.
+    """
+    job = get_job_queue().wait(query_id, wait)
+    if not job.finished:
+        return None
+    if job.status == "cancelled":
+        # Cancelled before it left the queue
+        return QueryResult("cancelled", message="Query cancelled")
+    if job.status == "failed":
+        return QueryResult("error", message=job.error)
+    return job.result
+
+
+def cancel_query(query_id: str) -> bool:
+    """Cancels a queued query or interrupts a running one. Returns False if it is not queued or running."""
+    return get_job_queue().cancel(query_id)
@@ -0,0 +1,150 @@
+# Estimates the cost of a MySQL statement with EXPLAIN FORMAT=JSON before it is executed
+import json
+from dataclasses import dataclass, field
+
+from ..config import COST_FULL_SCAN_ROWS, COST_REJECT_ROWS, COST_WARN_ROWS
+from ..telemetry import span
+from .rdbms_connector import connect_to_rdbms
+from .sql_analysis import statement_type
+
+EXPLAINABLE = {"SELECT", "WITH", "INSERT", "REPLACE", "UPDATE", "DELETE"}
+# access_type values that read every row of the table (or of an index)
+FULL_SCAN_ACCESS = {"ALL", "index"}
+
+
+@dataclass
+class QueryCost:
+    """What EXPLAIN FORMAT=JSON estimates for a statement."""
+
+    rows_examined: float = 0.0
+    query_cost: float = 0.0
+    full_scans: list = field(default_factory=list)  # [(table, rows examined per scan)]
+    using_temporary: bool = False
+    using_filesort: bool = False
+
+
+@dataclass
+class CostAssessment:
+    """`verdict` is "ok", "warn" or "reject"; `reasons` explain warnings and rejections."""
+
+    verdict: str
+    cost: QueryCost = None
+    reasons: list = field(default_factory=list)
+
+    def summary(self) -> str:
+        if self.cost is None:
+            return "; ".join(self.reasons)
+        cost = self.cost
+        parts = [f"~{cost.rows_examined:,.0f} rows examined", f"query cost {cost.query_cost:,.1f}"]
+        if cost.full_scans:
+            parts.append("full scans of " + ", ".join(f"{table} (~{rows:,.0f} rows)" for table, rows in cost.full_scans))
+        if cost.using_temporary:
+            parts.append("temporary table")
+        if cost.using_filesort:
+            parts.append("filesort")
+        return "; ".join(parts + self.reasons)
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _walk(node, cost: QueryCost) -> float:
+    """
+    Accumulates flags and full scans from a plan node and returns the rows it examines.
+    A nested loop examines rows_examined_per_scan of each table once for every row produced
+    by the tables joined before it; materialized subqueries are counted once.
+    """
+    if isinstance(node, list):
+        return sum(_walk(item, cost) for item in node)
+    if not isinstance(node, dict):
+        return 0.0
+
+    cost.using_temporary |= bool(node.get("using_temporary_table"))
+    cost.using_filesort |= bool(node.get("using_filesort"))
+    rows = 0.0
+    if "table_name" in node:
+        rows += _table_rows(node, cost)
+    if "nested_loop" in node:
+        produced = 1.0
+        for item in node["nested_loop"]:
+            table = item.get("table", {})
+            rows += produced * _table_rows(table, cost) + _walk(_children(table), cost)
+            produced = max(_number(table.get("rows_produced_per_join")), 1.0)
+    rows += _walk(_children(node), cost)
+    return rows
+
+
+def _children(node: dict) -> list:
+    return [value for key, value in node.items() if key != "nested_loop" and isinstance(value, (dict, list))]
+
+
+def _table_rows(table: dict, cost: QueryCost) -> float:
+    rows = _number(table.get("rows_examined_per_scan"))
+    if table.get("access_type") in FULL_SCAN_ACCESS and "table_function" not in table:
+        cost.full_scans.append((table.get("table_name", "?"), rows))
+    return rows
+
+
+def parse_explain(plan: dict) -> QueryCost:
+    """Builds a QueryCost from the parsed output of EXPLAIN FORMAT=JSON."""
+    cost = QueryCost()
+    block = plan.get("query_block", plan)
+    cost.query_cost = _number(block.get("cost_info", {}).get("query_cost"))
+    cost.rows_examined = _walk(block, cost)
+    return cost
+
+
+def explain_query(sql_query: str) -> QueryCost:
+    """Runs EXPLAIN FORMAT=JSON for a statement and returns the estimated cost."""
+    connection = connect_to_rdbms()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN FORMAT=JSON " + sql_query)
+            return parse_explain(json.loads(cursor.fetchone()[0]))
+    finally:
+        connection.close()
+
+
+def assess_cost(cost: QueryCost, warn_rows: float = COST_WARN_ROWS, reject_rows: float = COST_REJECT_ROWS,
+                full_scan_rows: float = COST_FULL_SCAN_ROWS) -> CostAssessment:
+    """Applies the thresholds (0 disables one): reject above `reject_rows` examined rows, warn above the others."""
+    assessment = CostAssessment("ok", cost)
+
+    def flag(verdict, reason):
+        if assessment.verdict != "reject":
+            assessment.verdict = verdict
+        assessment.reasons.append(reason)
+
+    if reject_rows and cost.rows_examined >= reject_rows:
+        flag("reject", f"examines more than {reject_rows:,.0f} rows")
+    elif warn_rows and cost.rows_examined >= warn_rows:
+        flag("warn", f"examines more than {warn_rows:,.0f} rows")
+    large_scans = [table for table, rows in cost.full_scans if full_scan_rows and rows >= full_scan_rows]
+    if large_scans:
+        flag("warn", "full scan of large table " + ", ".join(large_scans))
+    if (cost.using_temporary or cost.using_filesort) and warn_rows and cost.rows_examined >= warn_rows / 10:
+        flag("warn", "sorts or groups a large intermediate result")
+    return assessment
+
+
+def check_query_cost(sql_query: str, **thresholds) -> CostAssessment:
+    """
+    Runs EXPLAIN for statements MySQL can explain and assesses the estimate. Statements that
+    cannot be explained (SHOW, DDL) pass; statements EXPLAIN rejects are rejected.
+    """
+    if statement_type(sql_query) not in EXPLAINABLE:
+        return CostAssessment("ok")
+    with span("cost_check") as stage:
+        try:
+            cost = explain_query(sql_query)
+        except Exception as e:
+            stage.set_attribute("verdict", "reject")
+            return CostAssessment("reject", reasons=[f"EXPLAIN failed: {e}"])
+        assessment = assess_cost(cost, **thresholds)
+        stage.set_attribute("verdict", assessment.verdict)
+        stage.set_attribute("rows_examined", cost.rows_examined)
+        return assessment
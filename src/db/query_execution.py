@@ -1,11 +1,28 @@
 # Executes and validates SQL queries
-import pandas as pd
+# pandas, pymysql and bson are imported inside the functions that need them to keep
+# startup fast when only one backend is used.
+import sys
+import time
+
 import sqlparse
-from bson import ObjectId
 
-from db.nosql_connector import connect_to_nosql
-#from db.postgres_connector import connect_to_postgres
-from db.rdbms_connector import connect_to_rdbms
+from ..config import (MONGO_MAX_TIME_MS, RESULT_CACHE_ENABLED,
+                      SQL_FETCH_BATCH_SIZE, SQL_MAX_RESULT_BYTES, SQL_MAX_ROWS)
+from ..telemetry import get_logger, span
+from .mongo_query import execute_mongo_plan, parse_mongo_query
+from .nosql_connector import connect_to_nosql
+from .query_control import (apply_time_limit, attach_mysql_connection,
+                            check_stopped, detach_mysql_connection,
+                            interruption, mongo_options)
+#from .postgres_connector import connect_to_postgres
+from .rdbms_connector import connect_to_rdbms, get_rdbms_target
+from .result_cache import get_result_cache, make_result_key, result_size
+from .sql_analysis import (is_cacheable, is_write_statement,
+                           main_statement_type, normalize_sql,
+                           referenced_tables)
+from .workload_log import record_query
+
+logger = get_logger(__name__)
 
 
 def validate_sql(sql_query: str) -> bool:
@@ -17,34 +34,180 @@ def validate_sql(sql_query: str) -> bool:
         return False
 
 
-def execute_sql(sql_query: str):
-    """Executes an SQL query with validation."""
-    if not validate_sql(sql_query):
-        return "SQL statement is invalid and cannot be executed."
+def is_read_query(sql_query: str) -> bool:
+    """Returns True for statements that produce a result set rather than modifying data."""
+    return main_statement_type(sql_query) in ("SELECT", "SHOW", "DESCRIBE")
+
+
+def _cached(kind: str, sql_query: str, use_cache: bool, run, size_fn, *key_parts):
+    """
+    Returns run() through the result cache when caching applies to the query. The table
+    versions are read before running the query, so a write during the query is never missed.
+    """
+    if not (use_cache and RESULT_CACHE_ENABLED and is_cacheable(sql_query)):
+        return run()
+    cache = get_result_cache()
+    key = make_result_key(kind, get_rdbms_target(), normalize_sql(sql_query), *key_parts)
+    value = cache.get(key)
+    if value is None:
+        tables = referenced_tables(sql_query)
+        versions = cache.table_versions(tables)
+        value = run()
+        cache.put(key, value, size_fn(value), tables, versions)
+    return value
+
 
+def _run_sql(sql_query: str):
     connection = connect_to_rdbms()
     try:
+        attach_mysql_connection(connection)
         with connection.cursor() as cursor:
-            affected_rows = cursor.execute(sql_query)
-            query_lower = sql_query.strip().lower()
-            if query_lower.startswith(("select", "show", "describe")):
+            affected_rows = cursor.execute(apply_time_limit(sql_query))
+            if is_read_query(sql_query):
                 # Get column names
                 columns = [desc[0] for desc in cursor.description]
-                # Fetch results and convert to list of dictionaries
-                results = []
-                for row in cursor.fetchall():
-                    result_dict = {}
-                    for i, value in enumerate(row):
-                        result_dict[columns[i]] = value
-                    results.append(result_dict)
-                return results
+                return columns, cursor.fetchall()
             else:
                 connection.commit()
-                return f"{affected_rows} rows affected."
+                return None, affected_rows
     finally:
+        detach_mysql_connection()
         connection.close()
 
 
+def execute_sql(sql_query: str, use_cache: bool = True):
+    """
+    Executes an SQL query with validation. Read results are served from the result cache
+    when possible; writes invalidate the cached results of the tables they touch.
+    """
+    if not validate_sql(sql_query):
+        return "SQL statement is invalid and cannot be executed."
+
+    if not is_read_query(sql_query):
+        try:
+            _, affected_rows = _run_sql(sql_query)
+        finally:
+            if RESULT_CACHE_ENABLED and is_write_statement(sql_query):
+                # Invalidate even when the statement failed part-way
+                get_result_cache().invalidate_tables(referenced_tables(sql_query))
+        return f"{affected_rows} rows affected."
+
+    columns, rows = _cached("rows", sql_query, use_cache, lambda: _run_sql(sql_query), result_size)
+    # Convert to a fresh list of dictionaries, so callers never modify cached rows
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def stream_sql(sql_query: str, batch_size: int = SQL_FETCH_BATCH_SIZE):
+    """
+    Executes a read query with an unbuffered server-side cursor (SSCursor) and yields
+    (columns, rows) batches of at most `batch_size` rows, so the full result set is never
+    held in memory at once.
+
+    If the caller stops iterating early the connection is discarded rather than returned
+    to the pool, because draining the unread rows could take as long as the query itself.
+    When run under query_control, the query's time budget and cancellation apply.
+    """
+    from pymysql.cursors import SSCursor
+
+    connection = connect_to_rdbms()
+    finished = False
+    try:
+        attach_mysql_connection(connection)
+        cursor = connection.cursor(SSCursor)
+        cursor.execute(apply_time_limit(sql_query))
+        columns = [desc[0] for desc in cursor.description]
+        empty = True
+        while True:
+            check_stopped()
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            empty = False
+            yield columns, rows
+        if empty:
+            yield columns, []
+        cursor.close()
+        finished = True
+    finally:
+        detach_mysql_connection()
+        if finished:
+            connection.close()
+        else:
+            connection.discard()
+
+
+def _estimate_row_bytes(rows) -> int:
+    sample = rows[:200]
+    total = sum(sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in sample)
+    return max(1, total // len(sample))
+
+
+def fetch_sql_dataframe(sql_query: str, max_rows: int = SQL_MAX_ROWS, max_bytes: int = SQL_MAX_RESULT_BYTES,
+                        batch_size: int = SQL_FETCH_BATCH_SIZE, use_cache: bool = True) -> tuple:
+    """
+    Executes a read query and builds a DataFrame column by column from streamed batches.
+
+    Stops after `max_rows` rows or once the estimated size of the fetched rows exceeds
+    `max_bytes` (either limit may be None). Returns (DataFrame, truncated). Results are
+    served from the result cache when possible; the returned DataFrame is always a copy.
+    """
+    result_df, truncated = _cached(
+        "frame", sql_query, use_cache,
+        lambda: _fetch_sql_dataframe(sql_query, max_rows, max_bytes, batch_size),
+        lambda value: result_size(value[0]),
+        max_rows, max_bytes,
+    )
+    return result_df.copy(), truncated
+
+
+def _fetch_sql_dataframe(sql_query: str, max_rows: int, max_bytes: int, batch_size: int) -> tuple:
+    import pandas as pd
+
+    from .result_conversion import columns_to_dataframe, convert_columns
+
+    columns = None
+    column_data = None
+    row_count = 0
+    row_bytes = None
+    truncated = False
+
+    batches = stream_sql(sql_query, batch_size)
+    try:
+        for columns, rows in batches:
+            if column_data is None:
+                column_data = [[] for _ in columns]
+            if row_bytes is None and rows:
+                row_bytes = _estimate_row_bytes(rows)
+
+            limit = len(rows)
+            if max_rows is not None:
+                limit = min(limit, max_rows - row_count)
+            if max_bytes is not None and row_bytes is not None:
+                limit = min(limit, max_bytes // row_bytes - row_count)
+            if limit < len(rows):
+                rows = rows[:max(limit, 0)]
+                truncated = True
+
+            for values, column_values in zip(column_data, zip(*rows)):
+                values.extend(column_values)
+            row_count += len(rows)
+            if truncated:
+                break
+    except Exception as e:
+        interrupted = interruption(e)
+        if interrupted is None or not row_count:
+            raise
+        # Keep the rows fetched before the time limit or a cancellation stopped the query
+        interrupted.partial = convert_columns(columns_to_dataframe(columns, column_data))
+        raise interrupted from e
+    finally:
+        batches.close()
+
+    if columns is None:
+        return pd.DataFrame(), False
+    return convert_columns(columns_to_dataframe(columns, column_data)), truncated
+
+
 # def execute_postgres(query: str):
 #     """Executes a PostgreSQL query."""
 #     print("Executing PostgreSQL query:", query)
@@ -66,31 +229,79 @@ def execute_sql(sql_query: str):
 #         connection.close()
 
 
+def fetch_nosql(nosql_query: str) -> tuple:
+    """
+    Parses a PyMongo-style query string (see mongo_query.parse_mongo_query) and runs it on
+    the shared client, bounded by MONGO_MAX_ROWS, MONGO_BATCH_SIZE and MONGO_MAX_TIME_MS
+    (or the remaining time budget when run under query_control).
+    Returns (result, truncated). Raises MongoQueryError for unsupported queries.
+    """
+    plan = parse_mongo_query(nosql_query)
+    db = connect_to_nosql()
+    return execute_mongo_plan(db, plan, **mongo_options(db, MONGO_MAX_TIME_MS))
+
+
+def execute_query(db_type: str, query: str) -> tuple:
+    """
+    Runs a generated query the way the app displays it and returns (data, truncated):
+    a DataFrame for MySQL reads, a status message for MySQL writes and documents or a
+    scalar for MongoDB. Every call is recorded in the workload log.
+    """
+    start = time.perf_counter()
+    status = "error"
+    with span("execute", db_type=db_type) as stage:
+        try:
+            if db_type == "mongodb":
+                result = fetch_nosql(query)
+            elif is_read_query(query):
+                result = fetch_sql_dataframe(query)
+            else:
+                result = execute_sql(query), False
+            status = "ok"
+            data, truncated = result
+            stage.set_attribute("rows", len(data) if hasattr(data, "__len__") and not isinstance(data, str) else 1)
+            stage.set_attribute("truncated", truncated)
+            return result
+        except Exception as e:
+            interrupted = interruption(e)
+            if interrupted is not None:
+                status = interrupted.status
+            raise
+        finally:
+            stage.set_attribute("outcome", status)
+            # Queries that timed out are the most interesting ones for the index advisor
+            record_query(db_type, query, status, (time.perf_counter() - start) * 1000)
+
+
 def execute_nosql(nosql_query: str):
     """
     Execute a MongoDB query.
-    The parameter `nosql_query` is expected to be a Python expression string that can be executed on MongoDB,
+    The parameter `nosql_query` is expected to be a PyMongo-style expression string,
     for example: "db['students'].find({'name': 'Alice'})".
 
-    Note: This uses eval to execute the query, so make sure the query content is trusted.
+    The query is parsed into a plan rather than evaluated, so only find, find_one,
+    aggregate, count_documents, distinct and estimated_document_count with literal
+    arguments are accepted.
     """
-    print("Executing MongoDB query:", nosql_query)
-    db = connect_to_nosql()  # Already returns the database object
+    logger.debug("Executing MongoDB query: %s", nosql_query)
     try:
-        # Execute the query in a secure context, providing the `db` variable for use in the expression
-        result = eval(nosql_query, {"db": db})
-        # If the result is a pymongo Cursor, convert it to a list
-        if hasattr(result, "sort") or hasattr(result, "batch_size"):
-            result = list(result)
-        print("MongoDB query result:", result)
+        result, truncated = fetch_nosql(nosql_query)
+        if truncated:
+            logger.info("MongoDB result truncated to %s documents", len(result))
+        # Only the size: formatting a large result set would cost more than the query
+        size = f"{len(result)} documents" if isinstance(result, list) else type(result).__name__
+        logger.debug("MongoDB query returned %s", size)
         return result
     except Exception as e:
         error_msg = f"Error executing MongoDB query: {str(e)}"
-        print(error_msg)
+        logger.error(error_msg)
         return error_msg
 
 def clean_mongodb_data(data):
     """Clean MongoDB data by converting special types to strings, and flatten lists to comma-separated strings for DataFrame compatibility."""
+    import pandas as pd
+    from bson import ObjectId
+
     if isinstance(data, dict):
         return {k: clean_mongodb_data(v) for k, v in data.items()}
     elif isinstance(data, list):
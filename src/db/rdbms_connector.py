@@ -1,7 +1,28 @@
 # Handles MySQL/PostgreSQL database connection
-import pymysql
+from .connection_pool import get_rdbms_pool
+
+RDBMS_SETTINGS = {
+    "host": "localhost",
+    "user": "root",
+    "password": "Dsci-551",
+    "database": "Movie",
+}
+
+
+def open_rdbms_connection():
+    """Opens a new, unpooled connection to the RDBMS."""
+    import pymysql
+    return pymysql.connect(**RDBMS_SETTINGS)
 
 
 def connect_to_rdbms():
-    """Establishes a connection to an RDBMS."""
-    return pymysql.connect(host="localhost", user="root", password="Dsci-551", database="Movie")
+    """
+    Returns a connection to an RDBMS from the process-wide pool.
+    Calling close() on it returns it to the pool.
+    """
+    return get_rdbms_pool(open_rdbms_connection).acquire()
+
+
+def get_rdbms_target() -> str:
+    """Returns a string identifying the RDBMS connection target (used as a cache key)."""
+    return f"mysql://{RDBMS_SETTINGS['user']}@{RDBMS_SETTINGS['host']}/{RDBMS_SETTINGS['database']}"
@@ -0,0 +1,198 @@
+# In-process cache of query results with table-level invalidation
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from ..config import RESULT_CACHE_MAX_BYTES, RESULT_CACHE_RECHECK_INTERVAL
+
+
+def result_size(value) -> int:
+    """Approximate bytes held by a cached value (a DataFrame or a (columns, rows) pair)."""
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    columns, rows = value
+    sample = rows[:200]
+    if not sample:
+        return sys.getsizeof(rows)
+    per_row = sum(sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row) for row in sample) / len(sample)
+    return int(per_row * len(rows)) + sys.getsizeof(rows)
+
+
+def make_result_key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    LRU cache of query results bounded by their total size in bytes.
+
+    Each entry records the tables its query read and their versions (e.g. UPDATE_TIME) at
+    execution time. Entries are dropped when a write touches one of those tables
+    (invalidate_tables) or, checked at most every `recheck_interval` seconds per entry, when
+    `version_fn(tables)` reports different versions. Versions are shared between entries
+    and asked for at most once per table per `recheck_interval`.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES,
+                 recheck_interval: float = RESULT_CACHE_RECHECK_INTERVAL, version_fn=None):
+        self.max_bytes = max_bytes
+        self.recheck_interval = recheck_interval
+        self.version_fn = version_fn
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> [value, size, tables, versions, checked_at]
+        self._versions = {}  # table -> (version or None, checked_at)
+        self._lock = threading.Lock()
+
+    def table_versions(self, tables) -> dict:
+        """{table: version} for `tables`, from version_fn or read within the last recheck_interval."""
+        if self.version_fn is None:
+            return {}
+        now = time.monotonic()
+        with self._lock:
+            known = {table: self._versions[table][0] for table in tables
+                     if table in self._versions and now - self._versions[table][1] < self.recheck_interval}
+        missing = set(tables) - set(known)
+        if missing:
+            fresh = self.version_fn(missing)
+            with self._lock:
+                for table in missing:
+                    known[table] = fresh.get(table)
+                    self._versions[table] = (known[table], now)
+        return {table: version for table, version in known.items() if version is not None}
+
+    def get(self, key: str):
+        """Returns the cached value for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            stale_check = entry is not None and time.monotonic() - entry[4] >= self.recheck_interval
+        if stale_check:
+            # Query the versions outside the lock; a concurrent invalidation just wins
+            versions = self.table_versions(entry[2])
+            with self._lock:
+                if versions != entry[3]:
+                    self._remove_locked(key)
+                    self.invalidations += 1
+                    entry = None
+                elif key in self._entries:
+                    entry[4] = time.monotonic()
+        with self._lock:
+            if entry is None or key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, value, size: int, tables, versions: dict):
+        """
+        Stores `value`, which holds about `size` bytes. `versions` should be read before the
+        query ran, so a write that lands during the query is never missed.
+        """
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove_locked(key)
+            self._entries[key] = [value, size, frozenset(tables), versions, time.monotonic()]
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+
+    def invalidate_tables(self, tables):
+        """Drops entries that read any of `tables`; an empty or unknown set drops everything."""
+        tables = {table.lower() for table in tables or ()}
+        with self._lock:
+            for table in tables or list(self._versions):
+                self._versions.pop(table, None)
+            stale = [key for key, entry in self._entries.items() if not tables or entry[2] & tables]
+            for key in stale:
+                self._remove_locked(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove_locked(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+
+def mysql_table_versions(tables) -> dict:
+    """
+    {table: UPDATE_TIME} for the given tables of the current MySQL database.
+
+    MySQL 8 caches UPDATE_TIME for information_schema_stats_expiry seconds (a day by
+    default), so the check runs with it set to 0 and always reads the current value. Even so
+    UPDATE_TIME only has one-second resolution and is reset by a server restart: a write
+    from outside the app in the same second as the version read, or before a restart, can
+    go unnoticed until the entry is evicted. Writes made through the app invalidate entries
+    directly.
+    """
+    from .rdbms_connector import connect_to_rdbms
+
+    if not tables:
+        return {}
+    tables = sorted(tables)
+    connection = connect_to_rdbms()
+    try:
+        with connection.cursor() as cursor:
+            disable_stats_cache(cursor)
+            placeholders = ", ".join(["%s"] * len(tables))
+            cursor.execute(
+                "SELECT LOWER(TABLE_NAME), UPDATE_TIME FROM information_schema.TABLES "
+                f"WHERE TABLE_SCHEMA = DATABASE() AND LOWER(TABLE_NAME) IN ({placeholders})",
+                tables,
+            )
+            return {name: str(update_time) for name, update_time in cursor.fetchall()}
+    finally:
+        connection.close()
+
+
+def disable_stats_cache(cursor):
+    """
+    Makes information_schema reads on the cursor's connection return current table
+    statistics such as UPDATE_TIME. Stays set on the pooled connection, which is harmless.
+    """
+    import pymysql
+
+    try:
+        cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+    except pymysql.err.OperationalError:
+        pass  # before MySQL 8: no such variable, and no cache either
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Returns the process-wide cache of MySQL query results."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache(version_fn=mysql_table_versions)
+    return _cache
@@ -0,0 +1,132 @@
+# Converts query results into DataFrames column by column instead of row by row
+import datetime
+from decimal import Decimal
+
+import pandas as pd
+
+# Values of object columns inspected to decide how a column is converted
+SAMPLE_SIZE = 200
+
+
+def columns_to_dataframe(columns: list, column_data: list) -> pd.DataFrame:
+    """
+    Builds a DataFrame from parallel lists of column names and column values. Built
+    positionally and renamed afterwards, so duplicate column names survive.
+    """
+    result_df = pd.DataFrame({i: values for i, values in enumerate(column_data)})
+    result_df.columns = columns
+    return result_df
+
+
+def rows_to_dataframe(columns: list, rows: list) -> pd.DataFrame:
+    """Builds a DataFrame from cursor rows (tuples) and the cursor description's names."""
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    return columns_to_dataframe(columns, [list(values) for values in zip(*rows)])
+
+
+def _sample(values: pd.Series) -> list:
+    return values.dropna().head(SAMPLE_SIZE).tolist()
+
+
+def _is_bson_scalar(value) -> bool:
+    # ObjectId, Decimal128, Binary, ... without importing bson
+    return type(value).__module__.startswith("bson")
+
+
+def _clean_nested(value):
+    """Converts BSON scalars inside nested documents and arrays, keeping their structure."""
+    if isinstance(value, dict):
+        return {k: _clean_nested(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean_nested(v) for v in value]
+    if _is_bson_scalar(value):
+        return str(value)
+    return value
+
+
+def _needs_cleaning(value) -> bool:
+    if isinstance(value, dict):
+        return any(_needs_cleaning(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_needs_cleaning(v) for v in value)
+    return _is_bson_scalar(value)
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    # One vectorized str conversion; nulls stay null
+    return values.astype(str).where(values.notna(), None)
+
+
+def _convert_column(values: pd.Series) -> pd.Series:
+    if values.dtype != object:
+        return values
+    sample = _sample(values)
+    if not sample:
+        return values
+    kinds = {type(value) for value in sample}
+
+    if any(isinstance(value, (dict, list, tuple)) for value in sample):
+        # Arrays stay list columns; only nested BSON values are converted
+        return values.map(_clean_nested, na_action="ignore") if any(map(_needs_cleaning, sample)) else values
+    if all(_is_bson_scalar(value) for value in sample):
+        return _as_text(values)
+    if kinds <= {datetime.datetime, pd.Timestamp}:
+        try:
+            return pd.to_datetime(values)
+        except (ValueError, TypeError):
+            return _as_text(values)
+    if len(kinds) > 1 and not kinds <= {int, float, bool, Decimal}:
+        # Mixed types (e.g. str and int from schemaless documents) break Arrow serialization in the UI
+        return _as_text(values)
+    return values
+
+
+def convert_columns(result_df: pd.DataFrame) -> pd.DataFrame:
+    """Converts object columns holding BSON values or mixed types, one column at a time."""
+    for i in range(result_df.shape[1]):
+        values = result_df.iloc[:, i]
+        converted = _convert_column(values)
+        if converted is not values:
+            result_df.isetitem(i, converted)
+    return result_df
+
+
+def documents_to_dataframe(documents: list) -> pd.DataFrame:
+    """
+    Builds a DataFrame from MongoDB documents (or rows returned as dicts). Columns appear in
+    first-seen key order; documents without a key get a null. Arrays stay list columns.
+    """
+    if not documents:
+        return pd.DataFrame()
+    keys = dict.fromkeys(documents[0])
+    if any(doc.keys() != documents[0].keys() for doc in documents):
+        for doc in documents:
+            keys.update(dict.fromkeys(doc))
+    columns = list(keys)
+    column_data = [[doc.get(key) for doc in documents] for key in columns]
+    return convert_columns(columns_to_dataframe(columns, column_data))
+
+
+def result_to_dataframe(result) -> pd.DataFrame:
+    """
+    Converts what execute_sql/fetch_nosql return into a DataFrame: a list of dicts or
+    tuples, a list of scalars (distinct), a single document (find_one) or a scalar (counts,
+    status messages).
+    """
+    if isinstance(result, pd.DataFrame):
+        return convert_columns(result)
+    if isinstance(result, dict):
+        return documents_to_dataframe([result])
+    if not isinstance(result, list):
+        return pd.DataFrame([str(result)])
+    if not result:
+        return pd.DataFrame()
+    first = result[0]
+    if hasattr(first, "keys"):
+        # dicts, or dict-like rows such as psycopg2's RealDictRow
+        return documents_to_dataframe(result if isinstance(first, dict) else [dict(row) for row in result])
+    if isinstance(first, tuple):
+        columns = [f"Column_{i + 1}" for i in range(len(first))]
+        return convert_columns(rows_to_dataframe(columns, result))
+    return convert_columns(pd.DataFrame({"Column_1": result}))
@@ -0,0 +1,200 @@
+# Writes query results to CSV or Parquet files in chunks, for downloads from the UI
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from importlib.util import find_spec
+
+from ..config import EXPORT_DIR, EXPORT_MAX_ROWS, EXPORT_TTL, SQL_FETCH_BATCH_SIZE
+
+# Rows held back at most while waiting for all-null columns to show their type (Parquet)
+PARQUET_SCHEMA_ROWS = 100000
+
+FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+
+@dataclass
+class Export:
+    """A finished export: the temp file at `path` holds `rows` rows (`truncated` if EXPORT_MAX_ROWS cut it short)."""
+
+    path: str
+    format: str
+    rows: int = 0
+    truncated: bool = False
+
+    @property
+    def mime(self) -> str:
+        return FORMATS[self.format][0]
+
+    @property
+    def file_name(self) -> str:
+        return "results" + FORMATS[self.format][1]
+
+
+def export_formats() -> list:
+    """CSV, plus Parquet when pyarrow is installed."""
+    return ["csv", "parquet"] if find_spec("pyarrow") is not None else ["csv"]
+
+
+def frame_batches(result_df, batch_size: int = SQL_FETCH_BATCH_SIZE):
+    """Yields consecutive row slices of a DataFrame (views, not copies)."""
+    yield result_df.iloc[:batch_size]
+    for start in range(batch_size, len(result_df), batch_size):
+        yield result_df.iloc[start:start + batch_size]
+
+
+def sql_batches(sql_query: str, batch_size: int = SQL_FETCH_BATCH_SIZE):
+    """Yields DataFrames of `batch_size` rows streamed from a server-side cursor (see stream_sql)."""
+    from .query_execution import stream_sql
+    from .result_conversion import convert_columns, rows_to_dataframe
+
+    batches = stream_sql(sql_query, batch_size)
+    try:
+        for columns, rows in batches:
+            yield convert_columns(rows_to_dataframe(columns, rows))
+    finally:
+        batches.close()
+
+
+def _limit(batches, export: Export, max_rows: int):
+    # Counts the rows passed on and stops after max_rows, marking the export truncated
+    for chunk in batches:
+        if max_rows is not None and export.rows + len(chunk) > max_rows:
+            chunk = chunk.iloc[:max_rows - export.rows]
+            export.truncated = True
+        export.rows += len(chunk)
+        yield chunk
+        if export.truncated:
+            break
+
+
+def write_csv(batches, path: str):
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        for i, chunk in enumerate(batches):
+            chunk.to_csv(file, index=False, header=i == 0)
+
+
+def _untyped_columns(chunk, columns=None) -> set:
+    # Positions of the columns (among `columns`, default all) that hold only nulls in `chunk`
+    positions = range(chunk.shape[1]) if columns is None else columns
+    return {i for i in positions if chunk.iloc[:, i].isna().all()}
+
+
+def _parquet_schema(chunks: list) -> tuple:
+    """
+    (schema, positions of the columns typed as strings because they were all-null),
+    inferred from all held-back batches together.
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    inferred = pa.Schema.from_pandas(pd.concat(chunks, ignore_index=True), preserve_index=False)
+    promoted = {i for i, field in enumerate(inferred) if pa.types.is_null(field.type)}
+    schema = pa.schema([field.with_type(pa.string()) if i in promoted else field for i, field in enumerate(inferred)],
+                       metadata=inferred.metadata)
+    return schema, promoted
+
+
+def _parquet_table(chunk, schema, promoted: set):
+    import pyarrow as pa
+
+    if promoted:
+        # Values that turn up in a column that was null while the schema was inferred are written as text
+        chunk = chunk.copy(deep=False)
+        for i in promoted:
+            chunk.isetitem(i, chunk.iloc[:, i].astype("string"))
+    try:
+        return pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise ValueError(f"A column changed type partway through the result, which Parquet can't hold: {e}") from e
+
+
+def write_parquet(batches, path: str, schema_rows: int = PARQUET_SCHEMA_ROWS):
+    """
+    Writes one row group per batch. Batches are held back until every column has had a
+    non-null value (or `schema_rows` rows were seen) and the schema is inferred from them
+    together, so a column that starts out null gets the type of its later values; columns
+    null throughout become strings.
+    """
+    import pyarrow.parquet as pq
+
+    pending, untyped, rows = [], None, 0
+    writer = schema = promoted = None
+    try:
+        for chunk in batches:
+            if writer is not None:
+                writer.write_table(_parquet_table(chunk, schema, promoted))
+                continue
+            pending.append(chunk)
+            rows += len(chunk)
+            untyped = _untyped_columns(chunk, untyped)
+            if untyped and rows < schema_rows:
+                continue
+            schema, promoted = _parquet_schema(pending)
+            writer = pq.ParquetWriter(path, schema)
+            for held in pending:
+                writer.write_table(_parquet_table(held, schema, promoted))
+            pending = []
+        if pending:
+            # The whole result was held back
+            schema, promoted = _parquet_schema(pending)
+            writer = pq.ParquetWriter(path, schema)
+            for held in pending:
+                writer.write_table(_parquet_table(held, schema, promoted))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def cleanup_exports(directory: str = EXPORT_DIR, max_age: float = EXPORT_TTL):
+    """Removes export files older than `max_age` seconds."""
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass  # removed by another session, or still open on Windows
+
+
+def export_result(db_type: str, query: str, data, truncated: bool, fmt: str = "csv",
+                  max_rows: int = EXPORT_MAX_ROWS) -> tuple:
+    """
+    Writes a query result to a new temp file in EXPORT_DIR and returns (Export, truncated),
+    the shape run_with_timeout and start_query expect.
+
+    `data` and `truncated` are what execute_query returned. A complete result is written
+    from memory in chunks; a MySQL read that was cut short for display is run again and
+    streamed from a server-side cursor, up to `max_rows` rows, so the export holds the
+    full result without loading it at once.
+    """
+    from .query_execution import is_read_query
+    from .result_conversion import result_to_dataframe
+
+    if fmt not in export_formats():
+        raise ValueError(f"Unsupported export format {fmt!r}")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    cleanup_exports()
+    export = Export(os.path.join(EXPORT_DIR, f"{uuid.uuid4().hex}{FORMATS[fmt][1]}"), fmt)
+
+    if db_type == "mysql" and truncated and is_read_query(query):
+        batches = sql_batches(query)
+    else:
+        batches = frame_batches(result_to_dataframe(data))
+    try:
+        (write_parquet if fmt == "parquet" else write_csv)(_limit(batches, export, max_rows), export.path)
+    except BaseException:
+        # Timeouts and cancellations land here too; don't leave half-written files behind
+        if os.path.exists(export.path):
+            os.remove(export.path)
+        raise
+    finally:
+        batches.close()
+    return export, export.truncated
@@ -0,0 +1,276 @@
+# Checks generated queries against the cached schema before they reach the database
+import difflib
+import re
+
+import sqlparse
+from sqlparse import tokens as T
+
+from .mongo_query import MongoQueryError, parse_mongo_query
+from .sql_analysis import referenced_tables, statement_type, table_aliases
+
+# Statements whose tables and columns must already exist
+CHECKED_STATEMENTS = {"SELECT", "WITH", "INSERT", "REPLACE", "UPDATE", "DELETE"}
+# Keywords after which a bare name is a column reference; after other keywords (AS, FROM,
+# COLLATE, a type name, ...) it is an alias, a table or something else
+COLUMN_AFTER = {"SELECT", "DISTINCT", "WHERE", "AND", "OR", "NOT", "XOR", "ON", "HAVING", "ORDER BY", "GROUP BY",
+                "PARTITION BY", "WHEN", "THEN", "ELSE", "CASE", "IN", "IS", "BETWEEN", "LIKE", "REGEXP", "RLIKE",
+                "SET", "VALUES", "DIV", "MOD"}
+# Words sqlparse reads as names that are MySQL syntax
+NOT_COLUMNS = {"interval", "separator", "dual"}
+# Queries on the server's own schemas are not checked against the application schema
+SYSTEM_SCHEMA = re.compile(r"\b(information_schema|performance_schema|mysql|sys)\s*\.", re.IGNORECASE)
+CTE_NAME = re.compile(r"(?:\bWITH(?:\s+RECURSIVE)?|,)\s*`?(\w+)`?\s*(?:\(([^)]*)\))?\s+AS\s*\(", re.IGNORECASE)
+# (pattern, problem) for syntax MySQL does not accept, mostly PostgreSQL habits
+FOREIGN_SYNTAX = [
+    (re.compile(r"::"), "`::` casts are PostgreSQL syntax; use CAST(expr AS type)"),
+    (re.compile(r"\bILIKE\b", re.I), "ILIKE is PostgreSQL syntax; use LIKE (case-insensitive with the default collation)"),
+    (re.compile(r"\bDISTINCT\s+ON\b", re.I), "DISTINCT ON is PostgreSQL syntax; use GROUP BY or a window function"),
+    (re.compile(r"\bRETURNING\b", re.I), "RETURNING is not supported by MySQL"),
+    (re.compile(r"\bFULL\s+(OUTER\s+)?JOIN\b", re.I),
+     "MySQL has no FULL OUTER JOIN; combine a LEFT JOIN and a RIGHT JOIN with UNION"),
+    (re.compile(r"\bNULLS\s+(FIRST|LAST)\b", re.I), "NULLS FIRST/LAST is not supported by MySQL; sort on `col IS NULL` first"),
+    (re.compile(r"\bSELECT\s+TOP\s+\d", re.I), "SELECT TOP is SQL Server syntax; use LIMIT"),
+    (re.compile(r"\b(STRING_AGG|ARRAY_AGG|DATE_TRUNC|GENERATE_SERIES|TO_CHAR|JSONB_\w+)\s*\(", re.I),
+     "{0} is a PostgreSQL function and does not exist in MySQL"),
+]
+# Pipeline stages after which documents no longer have the collection's fields
+RESHAPING_STAGES = {"$group", "$project", "$replaceRoot", "$replaceWith", "$facet", "$bucket", "$bucketAuto",
+                    "$sortByCount", "$count", "$unionWith"}
+MAX_LISTED_NAMES = 30
+
+
+def _name(token) -> str:
+    return token.value.strip("`").lower()
+
+
+def _listing(names) -> str:
+    names = sorted(names)
+    more = f", ... ({len(names) - MAX_LISTED_NAMES} more)" if len(names) > MAX_LISTED_NAMES else ""
+    return ", ".join(names[:MAX_LISTED_NAMES]) + more
+
+
+def _unknown(kind: str, name: str, known, context: str = "") -> str:
+    message = f"Unknown {kind} '{name}'{context}."
+    close = difflib.get_close_matches(name, list(known), n=1)
+    if close:
+        message += f" Did you mean '{close[0]}'?"
+    return message
+
+
+def _json_tables(tokens: list, errors: list) -> tuple:
+    """
+    Finds JSON_TABLE(..., COLUMNS(...)) [AS] alias expressions. Returns ({alias: columns},
+    indexes of tokens inside the COLUMNS definitions, which are not column references).
+    """
+    aliases, skipped = {}, set()
+    for i, token in enumerate(tokens):
+        if not (token.ttype in T.Name and token.value.upper() == "JSON_TABLE"):
+            continue
+        depth, j, columns = 0, i + 1, set()
+        while j < len(tokens):
+            current = tokens[j]
+            if current.match(T.Punctuation, "("):
+                depth += 1
+            elif current.match(T.Punctuation, ")"):
+                depth -= 1
+                if depth == 0:
+                    break
+            if depth >= 2:
+                skipped.add(j)
+                if depth == 2 and current.ttype in T.Name and tokens[j - 1].match(T.Punctuation, ("(", ",")):
+                    columns.add(_name(current))
+            j += 1
+        j += 1
+        if j < len(tokens) and tokens[j].match(T.Keyword, "AS"):
+            j += 1
+        if j < len(tokens) and tokens[j].ttype in T.Name:
+            aliases[_name(tokens[j])] = columns
+        else:
+            errors.append("JSON_TABLE(...) must be followed by an alias, e.g. JSON_TABLE(...) AS jt")
+    return aliases, skipped
+
+
+def _column_position(before) -> bool:
+    # Whether a bare name after `before` is a column reference rather than an alias or type
+    if before is None or before.match(T.Punctuation, ("(", ",")):
+        return True
+    if before.ttype in T.Operator:
+        return before.value != "@"  # @variable
+    return before.is_keyword and before.normalized.upper() in COLUMN_AFTER
+
+
+def _output_names(tokens: list, skipped: set) -> set:
+    # Names in alias position (select aliases, derived table names, ...): valid as bare names later
+    return {_name(token) for i, token in enumerate(tokens)
+            if token.ttype in T.Name and i not in skipped and i and not _column_position(tokens[i - 1])}
+
+
+def sql_schema_errors(sql_query: str, schema: dict) -> list:
+    """
+    Checks a generated MySQL statement without running it: a single statement, no
+    PostgreSQL (or other foreign) syntax, and for queries and DML, tables and columns that
+    exist in `schema` ({table: {column: type}}). JSON_TABLE aliases and their COLUMNS,
+    select aliases, CTEs and derived tables are understood. Returns a list of problems
+    phrased so they can be sent back to the LLM; an empty list means no problem was found.
+
+    The check errs on the side of accepting: names it cannot place are not reported.
+    """
+    statements = [statement for statement in sqlparse.parse(sql_query) if str(statement).strip(" \n\t;")]
+    if not statements:
+        return ["The query is empty."]
+    if len(statements) > 1:
+        return ["Generate exactly one SQL statement."]
+    statement = statements[0]
+    tokens = [token for token in statement.flatten() if not token.is_whitespace and token.ttype not in T.Comment]
+    code = " ".join(token.value for token in tokens if token.ttype not in T.Literal.String)
+
+    errors = []
+    for pattern, problem in FOREIGN_SYNTAX:
+        match = pattern.search(code)
+        if match:
+            errors.append(problem.format(match.group(1).upper() if match.groups() and match.group(1) else ""))
+    if statement_type(sql_query) not in CHECKED_STATEMENTS or SYSTEM_SCHEMA.search(code):
+        return errors
+
+    columns = {table.lower(): {column.lower() for column in fields} for table, fields in schema.items()}
+    aliases = table_aliases(sql_query)
+    tables = referenced_tables(sql_query) | set(aliases.values())
+    ctes = {}
+    for match in CTE_NAME.finditer(code):
+        ctes[match.group(1).lower()] = {name.strip(" `").lower() for name in (match.group(2) or "").split(",")}
+    for table in sorted(tables):
+        if table not in columns and table not in ctes and table not in ("dual", "json_table"):
+            errors.append(_unknown("table", table, columns, f". Available tables: {_listing(columns)}"))
+
+    json_aliases, skipped = _json_tables(tokens, errors)
+    json_columns = set().union(*json_aliases.values())
+    scope = set().union(*(columns.get(table, set()) for table in tables))
+    known = scope | json_columns | _output_names(tokens, skipped) | set(aliases) | set(ctes)
+    known |= set().union(*ctes.values()) | NOT_COLUMNS
+
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        before = tokens[i - 1] if i else None
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if token.ttype not in T.Name or i in skipped or (following is not None and following.match(T.Punctuation, "(")):
+            i += 1
+            continue
+        if before is not None and (before.match(T.Punctuation, ".") or before.match(T.Operator, "@")):
+            i += 1
+            continue
+        if following is not None and following.match(T.Punctuation, ".") and i + 2 < len(tokens):
+            # qualifier.column
+            qualifier, column_token = _name(token), tokens[i + 2]
+            i += 3
+            if column_token.ttype not in T.Name or (i < len(tokens) and tokens[i].match(T.Punctuation, ".")):
+                continue  # qualifier.*, or schema.table.column
+            column = _name(column_token)
+            if qualifier in json_aliases:
+                if column not in json_aliases[qualifier]:
+                    errors.append(_unknown("column", column, json_aliases[qualifier],
+                                           f" in {qualifier}.{column}; the JSON_TABLE only defines "
+                                           f"{_listing(json_aliases[qualifier])}"))
+            elif qualifier in aliases:
+                table = aliases[qualifier]
+                if table in columns and column not in columns[table]:
+                    errors.append(_unknown("column", column, columns[table],
+                                           f" in {qualifier}.{column}. Columns of {table}: {_listing(columns[table])}"))
+            elif column in aliases:
+                pass  # database.table
+            elif qualifier not in known:
+                errors.append(_unknown("table or alias", qualifier, set(aliases) | set(json_aliases),
+                                       f" in {qualifier}.{column}"))
+            continue
+        i += 1
+        name = _name(token)
+        # Without a schema table in scope (only derived tables, say) bare names can't be placed
+        if not scope or name in known or not _column_position(before):
+            continue
+        in_scope = ", ".join(sorted(tables & set(columns)))
+        errors.append(_unknown("column", name, scope | json_columns, f". Columns of {in_scope}: {_listing(scope)}"))
+    return list(dict.fromkeys(errors))
+
+
+def _field_references(expression, found: list):
+    # "$field" strings inside an aggregation expression ("$$variables" excluded)
+    if isinstance(expression, str):
+        if expression.startswith("$") and not expression.startswith("$$") and len(expression) > 1:
+            found.append(expression[1:])
+    elif isinstance(expression, dict):
+        for value in expression.values():
+            _field_references(value, found)
+    elif isinstance(expression, list):
+        for value in expression:
+            _field_references(value, found)
+
+
+def _filter_fields(query_filter, found: list):
+    if not isinstance(query_filter, dict):
+        return
+    for key, value in query_filter.items():
+        if key in ("$and", "$or", "$nor") and isinstance(value, list):
+            for condition in value:
+                _filter_fields(condition, found)
+        elif key == "$expr":
+            _field_references(value, found)
+        elif not key.startswith("$"):
+            found.append(key)
+
+
+def mongo_schema_errors(nosql_query: str, schema: dict) -> list:
+    """
+    Checks a generated PyMongo-style query without running it: it must parse (see
+    parse_mongo_query), name an existing collection and only use fields of that collection
+    in filters, projections, sorts, distinct keys and the pipeline stages that run before
+    documents are reshaped. Returns a list of problems; empty means none was found.
+    """
+    try:
+        plan = parse_mongo_query(nosql_query)
+    except MongoQueryError as e:
+        return [str(e)]
+    if plan.collection not in schema:
+        return [_unknown("collection", plan.collection, schema, f". Available collections: {_listing(schema)}")]
+    fields = set(schema[plan.collection])
+    if not fields:
+        return []  # empty collection: nothing to check against
+    fields.add("_id")
+    found = []  # (where, field path)
+
+    def collect(where, paths):
+        found.extend((where, path) for path in paths)
+
+    filter_paths = []
+    _filter_fields(plan.filter, filter_paths)
+    collect("the filter", filter_paths)
+    collect("the projection", [key for key in plan.projection or {} if not key.startswith("$")])
+    collect("the sort", [key for key, _ in plan.sort or []])
+    if plan.key:
+        collect("distinct()", [plan.key])
+    for stage in plan.pipeline or []:
+        if not isinstance(stage, dict) or len(stage) != 1:
+            continue
+        operator, spec = next(iter(stage.items()))
+        paths = []
+        if operator == "$match":
+            _filter_fields(spec, paths)
+        elif operator == "$sort" and isinstance(spec, dict):
+            paths = list(spec)
+        elif operator in ("$addFields", "$set") and isinstance(spec, dict):
+            _field_references(spec, paths)
+            fields.update(key.split(".")[0] for key in spec)
+        elif operator == "$lookup" and isinstance(spec, dict):
+            paths = [spec["localField"]] if "localField" in spec else []
+            fields.add(spec.get("as", ""))
+        else:
+            _field_references(spec, paths)
+        collect(f"the {operator} stage", paths)
+        if operator in RESHAPING_STAGES:
+            break
+
+    errors = []
+    for where, path in found:
+        if path.split(".")[0] not in fields:
+            errors.append(_unknown("field", path, fields,
+                                   f" in {where}. Fields of {plan.collection}: {_listing(fields)}"))
+    return list(dict.fromkeys(errors))
@@ -0,0 +1,119 @@
+# Lightweight SQL analysis with sqlparse: normalization and the tables a statement touches
+import re
+
+import sqlparse
+from sqlparse import sql as sql_tokens
+from sqlparse import tokens as T
+
+WRITE_KEYWORDS = {"INSERT", "UPDATE", "DELETE", "REPLACE", "DROP", "ALTER", "TRUNCATE", "CREATE", "RENAME"}
+# Keywords after which a table name follows
+TABLE_CONTEXT = re.compile(r"^(FROM|(\w+ )*JOIN|INTO|UPDATE|TABLE|TRUNCATE)$")
+# Functions whose result differs between executions of the same statement
+NONDETERMINISTIC = re.compile(
+    r"\b(NOW|SYSDATE|CURDATE|CURTIME|CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|UTC_\w+|UNIX_TIMESTAMP|RAND|UUID\w*|"
+    r"CONNECTION_ID|LAST_INSERT_ID|ROW_COUNT|FOUND_ROWS|USER|CURRENT_USER|SLEEP)\b",
+    re.IGNORECASE,
+)
+
+
+def normalize_sql(sql_query: str) -> str:
+    """
+    Canonical text of a statement: comments dropped, whitespace collapsed, keywords upper
+    case, so differently formatted copies of one query compare equal.
+    """
+    parts = []
+    for statement in sqlparse.parse(sql_query):
+        for token in statement.flatten():
+            if token.is_whitespace or token.ttype in T.Comment:
+                continue
+            parts.append(token.normalized if token.is_keyword else token.value)
+    return " ".join(parts).rstrip("; ")
+
+
+def statement_type(sql_query: str) -> str:
+    """Upper-case first keyword of the statement ("SELECT", "INSERT", ...), or ""."""
+    for token in sqlparse.parse(sql_query)[0].flatten() if sql_query.strip() else ():
+        if token.is_keyword or token.ttype in T.DML or token.ttype in T.DDL:
+            return token.normalized.upper()
+    return ""
+
+
+def main_statement_type(sql_query: str) -> str:
+    """
+    statement_type, with WITH resolved to the statement its CTEs belong to, so
+    `WITH t AS (...) DELETE ...` is "DELETE". A parenthesized query after the CTEs is "SELECT".
+    """
+    kind = statement_type(sql_query)
+    if kind != "WITH":
+        return kind
+    # The CTE bodies are parenthesized groups, so the first top-level DML keyword is the statement's
+    for token in sqlparse.parse(sql_query)[0].tokens:
+        if token.ttype in T.DML:
+            return token.normalized.upper()
+    return "SELECT"
+
+
+def _identifier_tables(token, tables: set, aliases: dict = None):
+    if isinstance(token, sql_tokens.IdentifierList):
+        for identifier in token.get_identifiers():
+            _identifier_tables(identifier, tables, aliases)
+    elif isinstance(token, sql_tokens.Identifier):
+        first = token.token_first(skip_cm=True)
+        if isinstance(first, (sql_tokens.Function, sql_tokens.Parenthesis)):
+            # JSON_TABLE(...) AS jt or (SELECT ...) AS sub: only subqueries name further tables
+            _collect_tables(token, tables, aliases)
+        else:
+            name = token.get_real_name().lower()
+            tables.add(name)
+            if aliases is not None:
+                aliases[name] = name
+                aliases[(token.get_alias() or name).lower()] = name
+    elif isinstance(token, sql_tokens.Function):
+        # INSERT INTO t (a, b) parses as a function call
+        name = token.get_real_name()
+        if name:
+            tables.add(name.lower())
+    elif isinstance(token, sql_tokens.Parenthesis):
+        _collect_tables(token, tables, aliases)
+
+
+def _collect_tables(token_list, tables: set, aliases: dict = None):
+    expect_table = False
+    for token in token_list.tokens:
+        if token.is_whitespace or token.ttype in T.Comment:
+            continue
+        if token.is_keyword:
+            expect_table = bool(TABLE_CONTEXT.match(token.normalized.upper()))
+            continue
+        if expect_table:
+            _identifier_tables(token, tables, aliases)
+            expect_table = False
+        elif token.is_group:
+            _collect_tables(token, tables, aliases)
+
+
+def referenced_tables(sql_query: str) -> frozenset:
+    """Lower-case names of the tables a statement reads or writes, including subqueries."""
+    tables = set()
+    for statement in sqlparse.parse(sql_query):
+        _collect_tables(statement, tables)
+    return frozenset(tables)
+
+
+def table_aliases(sql_query: str) -> dict:
+    """Maps every lower-case table name and alias in a statement to its table name."""
+    aliases = {}
+    for statement in sqlparse.parse(sql_query):
+        _collect_tables(statement, set(), aliases)
+    return aliases
+
+
+def is_write_statement(sql_query: str) -> bool:
+    return main_statement_type(sql_query) in WRITE_KEYWORDS
+
+
+def is_cacheable(sql_query: str) -> bool:
+    """SELECT statements (with or without CTEs) over known tables whose result depends only on the data."""
+    return (main_statement_type(sql_query) == "SELECT"
+            and not NONDETERMINISTIC.search(sql_query)
+            and bool(referenced_tables(sql_query)))
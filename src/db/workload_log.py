@@ -0,0 +1,53 @@
+# Append-only log of executed queries, used by the index advisor
+import json
+import os
+import threading
+import time
+
+from ..config import (WORKLOAD_LOG_ENABLED, WORKLOAD_LOG_MAX_BYTES,
+                      WORKLOAD_LOG_PATH)
+from ..telemetry import get_logger
+
+logger = get_logger(__name__)
+
+_lock = threading.Lock()
+
+
+def record_query(db_type: str, query: str, status: str, elapsed_ms: float, path: str = WORKLOAD_LOG_PATH):
+    """Appends one executed query as a JSON line. The log is rotated to <path>.1 at WORKLOAD_LOG_MAX_MB."""
+    if not WORKLOAD_LOG_ENABLED:
+        return
+    line = json.dumps({
+        "ts": time.time(),
+        "db_type": db_type,
+        "query": query,
+        "status": status,
+        "elapsed_ms": round(elapsed_ms, 3),
+    }, ensure_ascii=False)
+    try:
+        with _lock:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > WORKLOAD_LOG_MAX_BYTES:
+                os.replace(path, path + ".1")
+            with open(path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+    except OSError as e:
+        # Logging must never fail a query
+        logger.warning("Could not write workload log: %s", e)
+
+
+def load_workload(path: str = WORKLOAD_LOG_PATH, db_type: str = None) -> list:
+    """Reads the logged queries (oldest first), optionally only those of one db type."""
+    records = []
+    for candidate in (path + ".1", path):
+        if not os.path.exists(candidate):
+            continue
+        with open(candidate, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a partially written line
+                if db_type is None or record.get("db_type") == db_type:
+                    records.append(record)
+    return records
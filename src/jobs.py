@@ -0,0 +1,201 @@
+# Background job queue shared by all Streamlit sessions of the process
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from .config import JOB_MAX_QUEUED_PER_USER, JOB_RESULT_TTL, JOB_WORKERS
+from .telemetry import get_logger
+
+logger = get_logger(__name__)
+
+FINISHED = {"done", "failed", "cancelled"}
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when a user already has the maximum number of queued jobs."""
+
+
+class JobCancelled(RuntimeError):
+    """Raised inside a running job (by set_progress) once its cancellation was requested."""
+
+
+@dataclass
+class Job:
+    """
+    A unit of background work. `status` goes from "queued" to "running" to "done", "failed"
+    or "cancelled"; `result` is what the job function returned, `progress` whatever it last
+    reported with set_progress (e.g. the text streamed so far).
+    """
+
+    job_id: str
+    user_id: str
+    kind: str
+    fn: Callable = field(repr=False)
+    on_cancel: Callable = field(default=None, repr=False)
+    status: str = "queued"
+    result: Any = None
+    error: str = ""
+    progress: Any = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+    cancel_requested: bool = False
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def set_progress(self, progress):
+        """Reports progress from inside the job; raises JobCancelled once cancellation was requested."""
+        if self.cancel_requested:
+            raise JobCancelled("Job cancelled")
+        self.progress = progress
+
+
+class JobQueue:
+    """
+    A fixed pool of worker threads fed from per-user queues. Workers take the oldest job of
+    each user in turn (round robin), so one user submitting many jobs cannot starve the
+    others. Finished jobs stay readable for `result_ttl` seconds.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queued_per_user: int = JOB_MAX_QUEUED_PER_USER,
+                 result_ttl: float = JOB_RESULT_TTL):
+        self.workers = max(workers, 1)
+        self.max_queued_per_user = max_queued_per_user
+        self.result_ttl = result_ttl
+        self._queues = OrderedDict()  # user_id -> deque of queued jobs; the first user is served next
+        self._jobs = {}
+        lock = threading.Lock()
+        self._condition = threading.Condition(lock)  # job state changes, for wait()
+        # Idle workers wait on their own condition, so a new job never wakes a wait() poller instead
+        self._work_available = threading.Condition(lock)
+        self._threads = []
+        self._ids = itertools.count(1)
+        self._completed = {status: 0 for status in FINISHED}
+
+    def submit(self, user_id: str, fn, kind: str = "job", job_id: str = None, on_cancel=None) -> str:
+        """
+        Queues fn(job) for `user_id` and returns the job id. `on_cancel` is called when a
+        running job is cancelled, to interrupt whatever it is waiting on.
+        """
+        with self._condition:
+            self._expire()
+            queue = self._queues.get(user_id)
+            if queue is not None and self.max_queued_per_user and len(queue) >= self.max_queued_per_user:
+                raise JobQueueFull(f"Too many queued jobs ({len(queue)}), wait for one to finish")
+            job = Job(job_id or f"{next(self._ids)}-{uuid.uuid4().hex[:8]}", user_id, kind, fn, on_cancel)
+            self._jobs[job.job_id] = job
+            self._queues.setdefault(user_id, deque()).append(job)
+            self._start_workers()
+            self._work_available.notify()
+        return job.job_id
+
+    def get(self, job_id: str) -> Job:
+        """Returns the job; raises KeyError for unknown or expired ids."""
+        with self._condition:
+            return self._jobs[job_id]
+
+    def wait(self, job_id: str, timeout: float = 0) -> Job:
+        """Returns the job once it has finished or after `timeout` seconds, whichever is first."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            job = self._jobs[job_id]
+            while not job.finished and (remaining := deadline - time.monotonic()) > 0:
+                self._condition.wait(remaining)
+            return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancels a queued job, or asks a running one to stop. Returns False if it already finished."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            if job.status == "queued":
+                queue = self._queues[job.user_id]
+                queue.remove(job)
+                if not queue:
+                    del self._queues[job.user_id]
+                self._finish(job, "cancelled")
+                return True
+            job.cancel_requested = True
+        if job.on_cancel is not None:
+            job.on_cancel()
+        return True
+
+    def stats(self) -> dict:
+        with self._condition:
+            running = sum(1 for job in self._jobs.values() if job.status == "running")
+            return {
+                "workers": self.workers,
+                "running": running,
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "queued_by_user": {user: len(queue) for user, queue in self._queues.items()},
+                "completed": dict(self._completed),
+                "stored": len(self._jobs),
+            }
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads) + 1}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_job(self) -> Job:
+        # Round robin: the first user's oldest job; that user then goes to the back of the line
+        user_id, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        if queue:
+            self._queues.move_to_end(user_id)
+        else:
+            del self._queues[user_id]
+        return job
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queues:
+                    self._work_available.wait()
+                job = self._next_job()
+                job.status = "running"
+                job.started_at = time.time()
+            result, status, error = None, "done", ""
+            try:
+                result = job.fn(job)
+            except JobCancelled:
+                status = "cancelled"
+            except Exception as e:
+                status, error = "failed", str(e)
+                logger.warning("Job %s (%s) failed: %s", job.job_id, job.kind, e)
+            with self._condition:
+                job.result, job.error = result, error
+                self._finish(job, status)
+
+    def _finish(self, job: Job, status: str):
+        # Called with the lock held
+        job.status = status
+        job.finished_at = time.time()
+        self._completed[status] += 1
+        self._condition.notify_all()
+
+    def _expire(self):
+        cutoff = time.time() - self.result_ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Returns the process-wide job queue."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
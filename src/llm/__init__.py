@@ -1,16 +1,30 @@
 # src/llm/__init__.py
+# Public names are resolved lazily (PEP 562), so importing src.llm does not load the OpenAI
+# SDK, NumPy or the database drivers until they are used.
+import importlib
 
-from .llm_integration import call_llm_api
-from .query_processing import get_nosql_schema  # get_postgres_schema,
-from .query_processing import (extract_sql_from_response, generate_query,
-                               get_sql_schema)
+_EXPORTS = {
+    "generate_query": ".query_processing",
+    "regenerate_cheaper_query": ".query_processing",
+    "extract_sql_from_response": ".query_processing",
+    "check_generated_query": ".query_processing",
+    "call_llm_api": ".llm_integration",
+    "call_llm_api_async": ".llm_integration",
+    "get_sql_schema": ".query_processing",
+    "get_nosql_schema": ".query_processing",
+    "invalidate_schema_cache": ".query_processing",
+    "get_response_cache": ".response_cache",
+    "get_semantic_cache": ".semantic_cache",
+    "llm_cache_stats": ".response_cache",
+    #"get_postgres_schema": ".query_processing",
+}
 
-__all__ = [
-    "generate_query", 
-    "extract_sql_from_response", 
-    "call_llm_api", 
-    "get_sql_schema", 
-    "get_nosql_schema",
-    #"get_postgres_schema"
-]
+__all__ = list(_EXPORTS)
 
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
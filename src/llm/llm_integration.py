@@ -1,20 +1,174 @@
-from openai import AzureOpenAI
+# The OpenAI SDK is imported and the clients are created on first use, which keeps importing
+# this module (and starting a Streamlit worker) cheap.
+import asyncio
+import random
+import threading
 
 from ..config import get_config
+from ..telemetry import current_span, get_logger, increment
 
 config = get_config()
+logger = get_logger(__name__)
 
-# Initialize Azure OpenAI client
-client = AzureOpenAI(
-    azure_endpoint=config["ENDPOINT_URL"],
-    api_key=config["LLM_API_KEY"],
-    api_version="2025-01-01-preview",
-)
+AZURE_API_VERSION = "2025-01-01-preview"
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the shared Azure OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import AzureOpenAI
+
+                # The SDK retries 429/5xx with exponential backoff itself
+                _client = AzureOpenAI(
+                    azure_endpoint=config["ENDPOINT_URL"],
+                    api_key=config["LLM_API_KEY"],
+                    api_version=AZURE_API_VERSION,
+                    timeout=config["LLM_TIMEOUT"],
+                    max_retries=config["LLM_MAX_RETRIES"],
+                )
+    return _client
 
 def call_llm_api(messages: list) -> str:
     """Calls LLM API with the given messages."""
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model=config["DEPLOYMENT_NAME"],
         messages=messages
     )
-    return response.choices[0].message.content
\ No newline at end of file
+    _record_usage(response.usage)
+    return response.choices[0].message.content
+
+
+def _record_usage(usage, stage=None):
+    """Adds the token counts of a completion to `stage` (or the current span) and the token counters."""
+    if usage is None:
+        return
+    stage = stage if stage is not None else current_span()
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None) or 0
+        increment("chatdb_llm_tokens_total", tokens, kind=kind)
+        if stage is not None:
+            stage.set_attribute(f"{kind}_tokens", tokens)
+
+
+# Async clients and semaphores are bound to the event loop they were created on, while
+# callers each run on a loop of their own (one asyncio.run() per generation). So one
+# long-lived loop thread owns the async client and its connection pool, and the
+# LLM_MAX_CONCURRENCY semaphore there limits calls across the whole process.
+_llm_loop = None
+_llm_loop_lock = threading.Lock()
+_async_client = None
+_async_semaphore = None
+
+
+def _get_llm_loop():
+    global _llm_loop
+    if _llm_loop is None:
+        with _llm_loop_lock:
+            if _llm_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="chatdb-llm", daemon=True).start()
+                _llm_loop = loop
+    return _llm_loop
+
+
+def _get_async_state():
+    # Only runs on the LLM loop thread, so creating the client needs no lock
+    global _async_client, _async_semaphore
+    if _async_client is None:
+        from openai import AsyncAzureOpenAI
+
+        _async_client = AsyncAzureOpenAI(
+            azure_endpoint=config["ENDPOINT_URL"],
+            api_key=config["LLM_API_KEY"],
+            api_version=AZURE_API_VERSION,
+            max_retries=0,  # retries are handled by call_llm_api_async
+        )
+        _async_semaphore = asyncio.Semaphore(config["LLM_MAX_CONCURRENCY"])
+    return _async_client, _async_semaphore
+
+
+def _is_retryable(error: Exception) -> bool:
+    import openai
+
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def _backoff_delay(attempt: int, error: Exception) -> float:
+    """Exponential backoff with full jitter, honouring a Retry-After header when present."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), config["LLM_BACKOFF_MAX"])
+        except ValueError:
+            pass
+    return random.uniform(0, min(config["LLM_BACKOFF_MAX"], config["LLM_BACKOFF_BASE"] * 2 ** attempt))
+
+
+async def _stream_completion(client, messages: list, on_token, stage) -> str:
+    stream = await client.chat.completions.create(
+        model=config["DEPLOYMENT_NAME"],
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    text = ""
+    async for chunk in stream:
+        # The last chunk carries the token usage and no choices
+        if getattr(chunk, "usage", None) is not None:
+            _record_usage(chunk.usage, stage)
+        # Azure sends content-filter chunks without choices
+        if not chunk.choices:
+            continue
+        token = chunk.choices[0].delta.content
+        if token:
+            text += token
+            if on_token is not None:
+                on_token(text)
+    return text
+
+
+async def call_llm_api_async(messages: list, on_token=None, timeout: float = None,
+                             max_retries: int = None) -> str:
+    """
+    Calls the LLM API asynchronously, streaming the completion.
+
+    `on_token` is called with the completion text received so far whenever a new fragment
+    arrives (a retried call starts again from the beginning); it runs on the LLM loop
+    thread. Each attempt is bounded by `timeout` seconds; 429, 5xx, timeout and connection
+    errors are retried up to `max_retries` times with jittered exponential backoff. At most
+    LLM_MAX_CONCURRENCY calls run at once in the process. Cancelling the awaiting task
+    cancels the call.
+    """
+    timeout = config["LLM_TIMEOUT"] if timeout is None else timeout
+    max_retries = config["LLM_MAX_RETRIES"] if max_retries is None else max_retries
+    call = _call_with_retries(messages, on_token, timeout, max_retries, current_span())
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(call, _get_llm_loop()))
+
+
+async def _call_with_retries(messages: list, on_token, timeout: float, max_retries: int, stage) -> str:
+    client, semaphore = _get_async_state()
+    attempt = 0
+    while True:
+        try:
+            async with semaphore:
+                return await asyncio.wait_for(_stream_completion(client, messages, on_token, stage), timeout)
+        except Exception as e:
+            if attempt >= max_retries or not _is_retryable(e):
+                raise
+            delay = _backoff_delay(attempt, e)
+            attempt += 1
+            logger.warning("LLM call failed (%s), retry %s/%s in %.1fs", type(e).__name__, attempt, max_retries, delay)
+            if stage is not None:
+                stage.set_attribute("retries", attempt)
+            await asyncio.sleep(delay)
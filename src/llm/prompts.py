@@ -0,0 +1,167 @@
+"""
+Prompt text for query generation, laid out for provider-side prompt caching: the static
+rules of the target database, then the schema, then the question.
+
+Providers only cache prefixes of at least 1024 tokens. The rules block alone is shorter
+(about 700 tokens for MySQL and 350 for MongoDB), so a request only gets a cache hit when
+the rules plus its schema block reach that size and the same schema block was sent
+before. That happens with large schemas, either with pruning off or when questions keep
+the same tables. With small or heavily pruned schemas nothing is cached. The layout then
+still saves the other database's rules and the per-request prompt rebuild.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+from .response_cache import prompt_fingerprint
+
+DB_TYPE_NAMES = {"mysql": "MySQL", "mongodb": "MongoDB"}
+# Pruned schema blocks kept per schema fingerprint
+SCHEMA_BLOCK_CACHE_SIZE = 256
+
+INTRO = """You are a professional database query generator. Your task is to convert the following natural language query into a valid database query, based on the provided schema.
+The target database type is {db_type_desc}.
+"""
+
+GENERAL_RULES = """
+General rules:
+- Only output the final query code, do not include any explanations, comments, or natural language.
+- Always use the table/collection and column/field names exactly as provided in the schema.
+- Never use or assume any field, table, or relationship that does not appear in the schema.
+- If unsure, generate the simplest and safest query possible.
+- Always wrap your output in a code block (e.g., ```sql ... ``` for MySQL, ```python ... ``` for MongoDB).
+"""
+
+MYSQL_RULES = """
+For MySQL queries:
+- Use standard MySQL syntax only.
+- Do not use PostgreSQL or any other database-specific syntax.
+- Do not include comments or explanations.
+-For JSON arrays like actors_json, if the extracted values are clearly names (e.g., "Tom Hanks", "Emma Watson"), assume they are actor names and JOIN using actor.name.
+
+-Do not assume actor_id unless the extracted values are numeric or look like IDs. Use CAST only if values are numeric.
+
+Example:
+If actors_json = ["Robert Downey Jr.", "Chris Evans"], then:
+JOIN actors a ON a.name = aj.actor_name
+-If comparing string fields across tables or JSON_TABLE, always ensure collation compatibility.
+Use COLLATE explicitly if needed, e.g., COLLATE utf8mb4_general_ci, to avoid collation mismatch errors.
+- Only use table and column names that appear in the schema. Do not assume any extra fields or relationships.
+- If the query is about "the most", "the least", "top N", always use ORDER BY and LIMIT.
+- If the query cannot be generated with the given schema, output a simple SELECT statement from an existing table.
+- Never generate queries that cannot be executed with the provided schema.
+-When comparing two VARCHAR or TEXT fields—especially from different tables—you must explicitly specify a collation using COLLATE to avoid illegal collation mix errors.
+-If working with a JSON array field such as `actors_json`: Always use JSON_TABLE to expand the array.
+- Use VARCHAR as the data type inside JSON_TABLE to safely extract string-based IDs or names.
+- Always wrap with JSON_VALID to avoid parsing errors.
+- Do NOT use JSON_EXTRACT or JSON_UNQUOTE to manually extract array values.
+- Do NOT cast to INT unless you're certain the values are numeric.
+- Avoid joining to other tables unless absolutely necessary for the result.
+- You may directly COUNT(DISTINCT actor_id) from the JSON_TABLE result.
+
+Correct usage example:
+
+SELECT d.name, COUNT(DISTINCT aj.actor_id) AS unique_actors
+FROM directors d
+JOIN movies m ON d.director_id = m.director_id
+JOIN JSON_TABLE(
+    m.actors_json,
+    '$[*]' COLUMNS(actor_id VARCHAR(255) PATH '$')
+) AS aj
+WHERE JSON_VALID(m.actors_json)
+GROUP BY d.name;
+"""
+
+MONGODB_RULES = """
+For MongoDB queries:
+- Use Python syntax for MongoDB queries (PyMongo style).
+- Start with db["collection_name"].
+- Always output a complete and executable query. Never output incomplete code (e.g., do not end with an open bracket).
+- If you use aggregate, the pipeline must be complete and valid. If you cannot generate a complete and valid aggregate pipeline, you MUST output a simple find query instead, such as db["collection_name"].find({}).
+- Never output only the beginning of an aggregate statement. Outputting only db["collection_name"].aggregate([ is strictly forbidden.
+- Do not include comments or explanations.
+-If a field is already of type array, do not apply $split. Use $size directly for counting elements, or $unwind for flattening.
+"""
+
+DIALECT_RULES = {"mysql": MYSQL_RULES, "mongodb": MONGODB_RULES}
+
+CHEAPER_QUERY_PROMPT = """The query you generated is too expensive to run: {summary}.
+Rewrite it so it returns the same result while examining far fewer rows: filter as early as possible, \
+avoid full scans of large tables and cross joins, avoid sorting or grouping large intermediate results, \
+and add a LIMIT when the question allows it. Only output the final query code."""
+
+REPAIR_PROMPT = """The query you generated does not match the schema:
+{problems}
+Fix these problems using only the tables, columns, collections and fields in the schema. \
+Only output the final query code."""
+
+
+@dataclass(frozen=True)
+class PromptBlock:
+    """A piece of prompt text and its SHA-256, computed once when the block is built."""
+
+    text: str
+    fingerprint: str
+
+    @classmethod
+    def of(cls, text: str) -> "PromptBlock":
+        return cls(text, prompt_fingerprint(text))
+
+
+@lru_cache(maxsize=None)
+def rules_block(db_type: str) -> PromptBlock:
+    """
+    The static system message for `db_type`: the general rules and that database's rules
+    only. Built once and byte-identical across requests, so it forms a cacheable prefix.
+    """
+    text = INTRO.format(db_type_desc=DB_TYPE_NAMES[db_type]) + GENERAL_RULES + DIALECT_RULES[db_type]
+    return PromptBlock.of(text.strip() + "\n")
+
+
+_schema_blocks = OrderedDict()
+_schema_blocks_lock = threading.Lock()
+
+
+def _layout(schema: dict) -> tuple:
+    # Which tables and columns a (pruned) schema keeps; the types follow from the fingerprint
+    return tuple((table, tuple(fields)) for table, fields in schema.items())
+
+
+def schema_block(schema: dict, fingerprint=None) -> PromptBlock:
+    """
+    The schema message, memoized per schema fingerprint (from the schema cache) and the
+    tables and columns kept by pruning. Without a fingerprint it is built every time.
+    """
+    from .schema_pruning import serialize_schema
+
+    if fingerprint is None:
+        return PromptBlock.of("Schema:\n" + serialize_schema(schema))
+    key = (fingerprint, _layout(schema))
+    with _schema_blocks_lock:
+        block = _schema_blocks.get(key)
+        if block is not None:
+            _schema_blocks.move_to_end(key)
+            return block
+    block = PromptBlock.of("Schema:\n" + serialize_schema(schema))
+    with _schema_blocks_lock:
+        _schema_blocks[key] = block
+        while len(_schema_blocks) > SCHEMA_BLOCK_CACHE_SIZE:
+            _schema_blocks.popitem(last=False)
+    return block
+
+
+def build_messages(db_type: str, schema: dict, question: str, fingerprint=None) -> tuple:
+    """
+    Returns (messages, prompt_key). The messages run from the most to the least shared
+    content (rules, schema, question) so providers can reuse the cached prefix once it is
+    long enough (see above); prompt_key identifies the rules and schema for the response
+    caches without rehashing them.
+    """
+    rules, schema_text = rules_block(db_type), schema_block(schema, fingerprint)
+    messages = [
+        {"role": "system", "content": rules.text},
+        {"role": "system", "content": schema_text.text},
+        {"role": "user", "content": question},
+    ]
+    return messages, f"{rules.fingerprint}:{schema_text.fingerprint}"
@@ -1,22 +1,35 @@
 # Converts natural language queries into structured database queries
+import asyncio
 import json
 import re
+import threading
+import time
 
-import pymysql
+from ..config import (DEPLOYMENT_NAME, LLM_CACHE_ENABLED,
+                      MOVIE_ACTORS_REWRITE, QUERY_REPAIR_ATTEMPTS,
+                      SCHEMA_CACHE_TTL, SCHEMA_PRUNING_ENABLED, SCHEMA_SAMPLE_BATCH,
+                      SEMANTIC_CACHE_ENABLED, SPECULATIVE_CANDIDATES,
+                      SPECULATIVE_DEADLINE, SPECULATIVE_GRACE)
+from ..db.nosql_connector import connect_to_nosql, get_nosql_target
+# from ..db.postgres_connector import connect_to_postgres
+from ..db.rdbms_connector import connect_to_rdbms, get_rdbms_target
+from ..telemetry import get_logger, increment, span
+from .llm_integration import call_llm_api, call_llm_api_async
+from .prompts import (CHEAPER_QUERY_PROMPT, REPAIR_PROMPT, build_messages,
+                      rules_block)
+from .response_cache import (get_response_cache, make_cache_key,
+                             prompt_fingerprint)
 
-from ..db.nosql_connector import connect_to_nosql
-from ..db.postgres_connector import connect_to_postgres
-from ..db.rdbms_connector import connect_to_rdbms
-from .llm_integration import call_llm_api
+logger = get_logger(__name__)
 
+# Schema cache: (db_type, target) -> {"schema", "fingerprint", "hash", "checked_at"}
+_schema_cache = {}
+_schema_cache_lock = threading.Lock()
 
-def infer_json_array_type(connection, table_name: str, field_name: str, sample_size: int = 5):
-    cursor = connection.cursor()
-    query = f"SELECT `{field_name}` FROM `{table_name}` WHERE `{field_name}` IS NOT NULL LIMIT {sample_size};"
-    cursor.execute(query)
-    rows = cursor.fetchall()
+
+def _classify_json_samples(values) -> str:
     element_types = set()
-    for (json_str,) in rows:
+    for json_str in values:
         try:
             parsed = json.loads(json_str)
             if isinstance(parsed, list):
@@ -34,29 +47,149 @@ def infer_json_array_type(connection, table_name: str, field_name: str, sample_s
     else:
         return "array<mixed>"
 
-def get_sql_schema():
-    connection = connect_to_rdbms()
+def infer_json_array_type(connection, table_name: str, field_name: str, sample_size: int = 5):
+    cursor = connection.cursor()
+    query = f"SELECT `{field_name}` FROM `{table_name}` WHERE `{field_name}` IS NOT NULL LIMIT {sample_size};"
+    cursor.execute(query)
+    rows = cursor.fetchall()
+    return _classify_json_samples(json_str for (json_str,) in rows)
+
+def _quote_identifier(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
+
+def infer_json_array_types(connection, columns: list, sample_size: int = 5, batch_size: int = SCHEMA_SAMPLE_BATCH):
+    """
+    Infers the JSON array element type of many (table, column) pairs at once.
+    Samples are fetched with one UNION ALL statement per `batch_size` columns instead of one
+    query per column. Returns {(table, column): inferred_type}.
+    """
+    samples = {key: [] for key in columns}
+    with connection.cursor() as cursor:
+        for start in range(0, len(columns), batch_size):
+            batch = columns[start:start + batch_size]
+            branches = []
+            params = []
+            for table, column in batch:
+                quoted = _quote_identifier(column)
+                branches.append(
+                    f"(SELECT %s, %s, CAST({quoted} AS CHAR) FROM {_quote_identifier(table)} "
+                    f"WHERE {quoted} IS NOT NULL LIMIT {int(sample_size)})"
+                )
+                params.extend((table, column))
+            cursor.execute(" UNION ALL ".join(branches), params)
+            for table, column, value in cursor.fetchall():
+                samples[(table, column)].append(value)
+    return {key: _classify_json_samples(values) for key, values in samples.items()}
+
+def _get_cached_schema(key, fingerprint_fn, build_fn, use_cache: bool = True):
+    """
+    Returns the schema for `key`, rebuilding it only when needed.
+
+    Within SCHEMA_CACHE_TTL seconds of the last check the cached schema is returned without
+    touching the database. After that a single cheap fingerprint query decides whether the
+    cached schema is still valid or has to be rebuilt.
+    """
+    now = time.monotonic()
+    with _schema_cache_lock:
+        entry = _schema_cache.get(key)
+    if use_cache and entry and now - entry["checked_at"] < SCHEMA_CACHE_TTL:
+        return entry["schema"]
+
+    fingerprint = fingerprint_fn()
+    if use_cache and entry and entry["fingerprint"] == fingerprint:
+        with _schema_cache_lock:
+            entry["checked_at"] = now
+        return entry["schema"]
+
+    schema = build_fn()
+    entry = {"schema": schema, "fingerprint": fingerprint, "hash": _hash_schema(schema), "checked_at": now}
+    with _schema_cache_lock:
+        _schema_cache[key] = entry
+    return schema
+
+
+def _hash_schema(schema: dict) -> str:
+    # Unlike the fingerprint, only changes when the schema itself does, not with the data
+    return prompt_fingerprint(json.dumps(schema, sort_keys=True, default=str))
+
+def _schema_fingerprint(key):
+    # Fingerprint of the cached schema for `key`, used to memoize its prompt text
+    with _schema_cache_lock:
+        entry = _schema_cache.get(key)
+    return entry["fingerprint"] if entry else None
+
+
+def _schema_hash(key, schema: dict) -> str:
+    # Hash of the cached schema for `key`, computed once per build
+    with _schema_cache_lock:
+        entry = _schema_cache.get(key)
+    return entry["hash"] if entry and entry["schema"] is schema else _hash_schema(schema)
+
+def invalidate_schema_cache(db_type: str = None):
+    """Drops cached schemas, either for one db type ("mysql"/"mongodb") or all of them."""
+    with _schema_cache_lock:
+        for key in list(_schema_cache):
+            if db_type is None or key[0] == db_type:
+                del _schema_cache[key]
+
+def _sql_schema_fingerprint(connection):
+    # One round trip: column definitions catch DDL changes, table timestamps catch data
+    # changes that may alter the inferred JSON element types. MySQL 8 would otherwise serve
+    # UPDATE_TIME from its statistics cache for information_schema_stats_expiry seconds.
+    from ..db.result_cache import disable_stats_cache
+
+    with connection.cursor() as cursor:
+        disable_stats_cache(cursor)
+        cursor.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE()),
+                (SELECT SUM(CRC32(CONCAT_WS('.', TABLE_NAME, COLUMN_NAME, COLUMN_TYPE)))
+                    FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE()),
+                (SELECT MAX(CREATE_TIME) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE()),
+                (SELECT MAX(UPDATE_TIME) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE());
+        """)
+        return tuple(cursor.fetchone())
+
+def _build_sql_schema(connection):
+    # All column metadata in one round trip, then batched sampling of JSON/TEXT columns
     schema = {}
+    json_columns = []
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            ORDER BY TABLE_NAME, ORDINAL_POSITION;
+        """)
+        for table, field_name, field_type in cursor.fetchall():
+            schema.setdefault(table, {})[field_name] = field_type
+            if "json" in field_type.lower() or "text" in field_type.lower():
+                json_columns.append((table, field_name))
+
+    for (table, field_name), inferred_type in infer_json_array_types(connection, json_columns).items():
+        schema[table][field_name] = inferred_type
+    return schema
+
+def get_sql_schema(use_cache: bool = True):
+    """Returns the MySQL schema, served from the schema cache while the database is unchanged."""
+    connection = None
+
+    def connection_():
+        nonlocal connection
+        if connection is None:
+            connection = connect_to_rdbms()
+        return connection
+
     try:
-        with connection.cursor() as cursor:
-            cursor.execute("SHOW TABLES;")
-            tables = [row[0] for row in cursor.fetchall()]
-
-            for table in tables:
-                cursor.execute(f"DESCRIBE {table};")
-                columns = cursor.fetchall()
-                schema[table] = {}
-                for column in columns:
-                    field_name = column[0]
-                    field_type = column[1]
-                    if "json" in field_type.lower() or "text" in field_type.lower():
-                        inferred_type = infer_json_array_type(connection, table, field_name)
-                        schema[table][field_name] = inferred_type
-                    else:
-                        schema[table][field_name] = field_type
+        return _get_cached_schema(
+            ("mysql", get_rdbms_target()),
+            lambda: _sql_schema_fingerprint(connection_()),
+            lambda: _build_sql_schema(connection_()),
+            use_cache,
+        )
     finally:
-        connection.close()
-    return schema
+        if connection is not None:
+            connection.close()
 
 # def get_postgres_schema():
 #     connection = connect_to_postgres()
@@ -89,8 +222,11 @@ def get_sql_schema():
 #         if document:
 #             schema[collection] = {key: "string" for key in document.keys() if key != '_id'}
 #     return schema
-def get_nosql_schema():
-    db = connect_to_nosql()
+def _nosql_schema_fingerprint(db):
+    stats = db.command("dbStats")
+    return (stats.get("collections"), stats.get("views"), stats.get("objects"), stats.get("dataSize"))
+
+def _build_nosql_schema(db):
     schema = {}
     collections = db.list_collection_names()
     for collection in collections:
@@ -118,6 +254,24 @@ def get_nosql_schema():
                 else:
                     schema[collection][key] = "unknown"
     return schema
+
+def get_nosql_schema(use_cache: bool = True):
+    """Returns the MongoDB schema, served from the schema cache while collection stats are unchanged."""
+    db = None
+
+    def db_():
+        nonlocal db
+        if db is None:
+            db = connect_to_nosql()
+        return db
+
+    return _get_cached_schema(
+        ("mongodb", get_nosql_target()),
+        lambda: _nosql_schema_fingerprint(db_()),
+        lambda: _build_nosql_schema(db_()),
+        use_cache,
+    )
+
 def extract_sql_from_response(llm_response: str) -> str:
     pattern =  r"```[^\n]*\n([\s\S]*?)```"
     match = re.search(pattern, llm_response)
@@ -144,93 +298,143 @@ def rewrite_field_for_json(schema: dict, query: str) -> str:
                         r"JSON_CONTAINS(\1actors_json, JSON_QUOTE(\2name))",
                         query
                     )
+    if MOVIE_ACTORS_REWRITE and "json_table" in query.lower():
+        from ..db.movie_actors import has_side_table, rewrite_json_tables
+
+        if has_side_table(schema):
+            query = rewrite_json_tables(query)
     return query
 
-def generate_query(user_query: str, db_type: str) -> tuple:
+
+def check_generated_query(db_type: str, query: str, schema: dict = None) -> list:
+    """
+    Checks a generated query against the schema (by default the cached one) without running
+    it (see db.schema_validation) and returns the problems found, or an empty list.
+    """
+    from ..db.schema_validation import mongo_schema_errors, sql_schema_errors
+
     if db_type == "mysql":
-        schema = get_sql_schema()
-        db_type_desc = "MySQL"
-        schema_str = json.dumps(schema, indent=2, ensure_ascii=False)
-    # elif db_type == "postgres":
-    #     schema = get_postgres_schema()
-    #     db_type_desc = "PostgreSQL"
-    #     schema_str = str(schema)
-    else:
-        schema = get_nosql_schema()
-        db_type_desc = "MongoDB"
-        schema_str = json.dumps(schema, indent=2, ensure_ascii=False)
-
-    system_prompt = f"""
-You are a professional database query generator. Your task is to convert the following natural language query into a valid database query, based on the provided schema.
-The target database type is {db_type_desc}.
-
-General rules:
-- Only output the final query code, do not include any explanations, comments, or natural language.
-- Always use the table/collection and column/field names exactly as provided in the schema.
-- Never use or assume any field, table, or relationship that does not appear in the schema.
-- If unsure, generate the simplest and safest query possible.
-- Always wrap your output in a code block (e.g., ```sql ... ``` for MySQL, ```python ... ``` for MongoDB).
-
-For MySQL queries:
-- Use standard MySQL syntax only.
-- Do not use PostgreSQL or any other database-specific syntax.
-- Do not include comments or explanations.
--For JSON arrays like actors_json, if the extracted values are clearly names (e.g., "Tom Hanks", "Emma Watson"), assume they are actor names and JOIN using actor.name.
-
--Do not assume actor_id unless the extracted values are numeric or look like IDs. Use CAST only if values are numeric.
-
-Example:
-If actors_json = ["Robert Downey Jr.", "Chris Evans"], then:
-JOIN actors a ON a.name = aj.actor_name
--If comparing string fields across tables or JSON_TABLE, always ensure collation compatibility.
-Use COLLATE explicitly if needed, e.g., COLLATE utf8mb4_general_ci, to avoid collation mismatch errors.
-- Only use table and column names that appear in the schema. Do not assume any extra fields or relationships.
-- If the query is about "the most", "the least", "top N", always use ORDER BY and LIMIT.
-- If the query cannot be generated with the given schema, output a simple SELECT statement from an existing table.
-- Never generate queries that cannot be executed with the provided schema.
--When comparing two VARCHAR or TEXT fields—especially from different tables—you must explicitly specify a collation using COLLATE to avoid illegal collation mix errors.
--If working with a JSON array field such as `actors_json`: Always use JSON_TABLE to expand the array.
-- Use VARCHAR as the data type inside JSON_TABLE to safely extract string-based IDs or names.
-- Always wrap with JSON_VALID to avoid parsing errors.
-- Do NOT use JSON_EXTRACT or JSON_UNQUOTE to manually extract array values.
-- Do NOT cast to INT unless you're certain the values are numeric.
-- Avoid joining to other tables unless absolutely necessary for the result.
-- You may directly COUNT(DISTINCT actor_id) from the JSON_TABLE result.
-
-Correct usage example:
-
-SELECT d.name, COUNT(DISTINCT aj.actor_id) AS unique_actors
-FROM directors d
-JOIN movies m ON d.director_id = m.director_id
-JOIN JSON_TABLE(
-    m.actors_json,
-    '$[*]' COLUMNS(actor_id VARCHAR(255) PATH '$')
-) AS aj
-WHERE JSON_VALID(m.actors_json)
-GROUP BY d.name;
-
-For MongoDB queries:
-- Use Python syntax for MongoDB queries (PyMongo style).
-- Start with db["collection_name"].
-- Always output a complete and executable query. Never output incomplete code (e.g., do not end with an open bracket).
-- If you use aggregate, the pipeline must be complete and valid. If you cannot generate a complete and valid aggregate pipeline, you MUST output a simple find query instead, such as db["collection_name"].find({{}}).
-- Never output only the beginning of an aggregate statement. Outputting only db["collection_name"].aggregate([ is strictly forbidden.
-- Do not include comments or explanations.
--If a field is already of type array, do not apply $split. Use $size directly for counting elements, or $unwind for flattening.
-
-Schema:
-{schema_str}
-"""
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_query}
-    ]
-
-    completion = call_llm_api(messages)
-    extracted_query = extract_sql_from_response(completion)
-    final_query = rewrite_field_for_json(schema, extracted_query)
-    print("Generated query:", final_query)
+        return sql_schema_errors(query, schema if schema is not None else get_sql_schema())
+    return mongo_schema_errors(query, schema if schema is not None else get_nosql_schema())
+
+
+def _schema_problems(db_type: str, query: str) -> list:
+    with span("schema_check") as stage:
+        try:
+            problems = check_generated_query(db_type, query)
+        except Exception as e:
+            # The check is an optimization; without a schema the query simply runs unchecked
+            logger.warning("Could not check the generated query: %s", e)
+            problems = []
+        stage.set_attribute("problems", len(problems))
+    return problems
+
+
+def generate_query(user_query: str, db_type: str, use_cache: bool = True, on_token=None,
+                   previous_query: str = None, feedback: str = None,
+                   repair_attempts: int = QUERY_REPAIR_ATTEMPTS, candidates: int = SPECULATIVE_CANDIDATES) -> tuple:
+    """
+    Converts a natural language question into a (query_type, query) tuple.
+    If `on_token` is given the completion is streamed and `on_token` receives the text so far.
+    With `feedback`, the LLM is asked to revise `previous_query` accordingly; the revision
+    bypasses the cache lookups and replaces the cached query for the question.
+
+    A query that fails the schema check (unknown tables, columns or fields, PostgreSQL
+    syntax) is sent back with the problems found, at most `repair_attempts` times.
+
+    With `candidates` > 1 that many completions are requested concurrently on a cache miss
+    and the cheapest valid one is used (see speculative.py); revisions ask for one.
+    """
+    with span("generate_query", db_type=db_type, streamed=on_token is not None,
+              revision=bool(feedback)) as stage:
+        result = _generate_query(user_query, db_type, use_cache, on_token, previous_query, feedback, candidates)
+        problems = _schema_problems(db_type, result[1]) if repair_attempts else []
+        attempt = 0
+        while problems and attempt < repair_attempts:
+            attempt += 1
+            logger.info("Generated query failed the schema check (attempt %d): %s", attempt, problems)
+            increment("chatdb_events_total", name="query_repair")
+            repair = REPAIR_PROMPT.format(problems="\n".join(f"- {problem}" for problem in problems))
+            result = _generate_query(user_query, db_type, use_cache, on_token, result[1], repair)
+            problems = _schema_problems(db_type, result[1])
+        stage.set_attribute("repairs", attempt)
+        if problems:
+            logger.warning("Generated query still fails the schema check: %s", problems)
+        return result
+
+
+def _generate_query(user_query: str, db_type: str, use_cache: bool, on_token, previous_query: str,
+                    feedback: str, candidates: int = 1) -> tuple:
+    with span("schema_fetch", db_type=db_type):
+        if db_type == "mysql":
+            key = ("mysql", get_rdbms_target())
+            schema = get_sql_schema()
+            fingerprint = _schema_fingerprint(key)
+        # elif db_type == "postgres":
+        #     schema = get_postgres_schema()
+        else:
+            key = ("mongodb", get_nosql_target())
+            schema = get_nosql_schema()
+            fingerprint = _schema_fingerprint(key)
+
+    # NumPy-backed helpers are imported on first use rather than at startup
+    from .schema_pruning import prune_schema
+    from .semantic_cache import get_semantic_cache
+
+    with span("prompt_build") as stage:
+        # Only send the tables/collections relevant to the question, compactly serialized
+        if SCHEMA_PRUNING_ENABLED:
+            prompt_schema, pruning_report = prune_schema(user_query, schema)
+            logger.debug("Schema pruning: %s", pruning_report)
+        else:
+            prompt_schema = schema
+        # Static rules first, then the schema, then the question: the longest shared prefix
+        messages, prompt_key = build_messages(db_type, prompt_schema, user_query, fingerprint)
+        stage.set_attribute("prompt_chars", sum(len(message["content"]) for message in messages[:-1]))
+
+    if feedback:
+        messages += [
+            {"role": "assistant", "content": previous_query or ""},
+            {"role": "user", "content": feedback},
+        ]
+
+    with span("llm_cache_lookup") as stage:
+        # Repeated questions against an unchanged schema are answered from the response cache
+        cache = get_response_cache() if use_cache and LLM_CACHE_ENABLED else None
+        cache_key = make_cache_key(user_query, prompt_key, db_type, DEPLOYMENT_NAME)
+        completion = cache.get(cache_key) if cache and not feedback else None
+        hit = "exact" if completion is not None else "miss"
+
+        # Reworded versions of earlier questions are answered from the similarity cache,
+        # partitioned by the full schema (rewordings may prune differently) but not the data
+        semantic_cache = get_semantic_cache() if use_cache and SEMANTIC_CACHE_ENABLED else None
+        partition = (db_type, rules_block(db_type).fingerprint, _schema_hash(key, schema), DEPLOYMENT_NAME)
+        if completion is None and semantic_cache and not feedback:
+            match = semantic_cache.lookup(partition, user_query)
+            if match:
+                completion, similarity, cached_question = match
+                hit = "similar"
+                logger.info("Reusing query generated for %r (similarity %.2f)", cached_question, similarity)
+        stage.set_attribute("hit", hit)
+        increment("chatdb_events_total", name=f"llm_cache_{hit}")
+
+    if completion is None:
+        with span("llm_call", model=DEPLOYMENT_NAME, streamed=on_token is not None) as stage:
+            if candidates > 1 and not feedback:
+                stage.set_attribute("candidates", candidates)
+                completion = _speculate(messages, db_type, schema, candidates, on_token)
+            elif on_token is not None:
+                completion = asyncio.run(call_llm_api_async(messages, on_token=on_token))
+            else:
+                completion = call_llm_api(messages)
+        if cache:
+            cache.put(cache_key, completion, question=user_query, db_type=db_type)
+        if semantic_cache:
+            # Like the exact entry, a revision replaces the completion cached for the question
+            semantic_cache.add(partition, user_query, completion)
+    with span("extract"):
+        final_query = _extract_query(completion, schema)
+    logger.info("Generated query: %s", final_query)
 
     if db_type in ["mysql", "postgres"]:
         if final_query.upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE", "CREATE", "DROP")):
@@ -239,4 +443,30 @@ Schema:
         if ".find(" in final_query or ".aggregate(" in final_query:
             return "NOSQL", final_query
 
-    return db_type.upper(), final_query
\ No newline at end of file
+    return db_type.upper(), final_query
+
+
+def _extract_query(completion: str, schema: dict) -> str:
+    return rewrite_field_for_json(schema, extract_sql_from_response(completion))
+
+
+def _speculate(messages: list, db_type: str, schema: dict, candidates: int, on_token) -> str:
+    # Several completions at once; the cheapest one that passes the schema check wins
+    from .speculative import choose_candidate, gather_candidates
+
+    def evaluate(completion):
+        query = _extract_query(completion, schema)
+        return query, check_generated_query(db_type, query, schema)
+
+    received = asyncio.run(gather_candidates(messages, candidates, evaluate, SPECULATIVE_DEADLINE,
+                                             SPECULATIVE_GRACE, on_progress=on_token))
+    chosen = choose_candidate(received, db_type)
+    logger.info("Chose candidate %d of %d received (cost %s)", chosen.index, len(received), chosen.cost)
+    return chosen.completion
+
+
+def regenerate_cheaper_query(user_query: str, db_type: str, previous_query: str, cost_summary: str,
+                             on_token=None) -> tuple:
+    """Asks the LLM for a cheaper version of `previous_query`, given the EXPLAIN cost summary."""
+    return generate_query(user_query, db_type, on_token=on_token, previous_query=previous_query,
+                          feedback=CHEAPER_QUERY_PROMPT.format(summary=cost_summary))
@@ -0,0 +1,155 @@
+# Persistent cache of LLM completions, so repeated questions skip the LLM round trip
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+
+from ..config import LLM_CACHE_MAX_BYTES, LLM_CACHE_PATH
+
+
+def normalize_question(question: str) -> str:
+    """Normalizes a question so trivially different spellings share a cache entry."""
+    question = unicodedata.normalize("NFKC", question).lower()
+    question = re.sub(r"\s+", " ", question).strip()
+    return question.rstrip("?.!; ")
+
+
+def prompt_fingerprint(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(question: str, prompt: str, db_type: str, deployment: str) -> str:
+    """
+    Builds the cache key from the normalized question, a hash of the prompt (or of a key
+    identifying its rules and schema, see prompts.build_messages), the db type and the LLM
+    deployment name.
+    """
+    payload = json.dumps([normalize_question(question), prompt_fingerprint(prompt), db_type, deployment])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed LRU cache of LLM responses.
+
+    Entries are evicted least-recently-used first once the total size of the stored
+    responses exceeds `max_bytes`.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                question TEXT,
+                db_type TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._db.commit()
+
+    def get(self, key: str):
+        """Returns the cached response for `key`, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute(
+                "UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+            return row[0]
+
+    def put(self, key: str, response: str, question: str = None, db_type: str = None):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, question, db_type, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, question, db_type, response, size, now, now),
+            )
+            self._evict_locked()
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _evict_locked(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk entries oldest-access first until enough bytes are freed
+        excess = total - self.max_bytes
+        evict = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            evict.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evict)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide response cache, opening it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def llm_cache_stats() -> dict:
+    """
+    Stats of the exact and similarity caches opened so far. Unused caches are left alone,
+    so reporting does not open the SQLite file or import NumPy.
+    """
+    stats = {}
+    if _cache is not None:
+        stats["exact"] = _cache.stats()
+    # Not imported yet means never used
+    semantic_cache = sys.modules.get(f"{__package__}.semantic_cache")
+    similar = semantic_cache.peek_semantic_cache() if semantic_cache is not None else None
+    if similar is not None:
+        stats["similar"] = similar.stats()
+    return stats
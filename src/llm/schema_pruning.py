@@ -0,0 +1,176 @@
+# Selects the tables/collections and columns relevant to a question before prompt construction
+import json
+import math
+import re
+from functools import lru_cache
+
+from ..config import (SCHEMA_PRUNING_EMBEDDINGS, SCHEMA_PRUNING_MAX_COLUMNS,
+                      SCHEMA_PRUNING_TOP_K)
+from .semantic_cache import STOPWORDS, HashingVectorizer, stem_word
+
+
+@lru_cache(maxsize=65536)
+def identifier_words(name: str) -> frozenset:
+    """Splits an identifier or a question into stemmed words ("actors_json" -> {"actor", "json"})."""
+    name = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", name)
+    return frozenset({stem_word(word) for word in re.findall(r"[a-z0-9]+", name.lower()) if word not in STOPWORDS})
+
+
+@lru_cache(maxsize=1)
+def _token_encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except ImportError:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Counts prompt tokens with tiktoken when it is installed, otherwise estimates ~4 characters per token."""
+    encoder = _token_encoder()
+    if encoder is None:
+        return max(1, len(text) // 4)
+    return len(encoder.encode(text))
+
+
+_vectorizer = HashingVectorizer()
+
+
+@lru_cache(maxsize=4096)
+def _embed_table(description: str):
+    # Table descriptions only change with the schema, so their vectors are memoized
+    return _vectorizer.embed(description)
+
+
+def serialize_schema(schema: dict) -> str:
+    """Compact JSON for prompts: no indentation or spaces after separators."""
+    return json.dumps(schema, separators=(",", ":"), ensure_ascii=False)
+
+
+def _key_columns(fields: dict) -> set:
+    return {field for field in fields if field == "id" or field.endswith("_id") or field == "_id"}
+
+
+def _referenced_tables(schema: dict) -> dict:
+    """
+    Infers foreign keys from `<name>_id` columns: movies.director_id references the table
+    named after "director" (directors). Returns {table: set of referenced tables}.
+    """
+    owners = {}
+    for table in schema:
+        words = identifier_words(table)
+        if len(words) == 1:
+            owners[next(iter(words))] = table
+    referenced = {}
+    for table, fields in schema.items():
+        referenced[table] = set()
+        for field in _key_columns(fields):
+            owner = owners.get(stem_word(field[:-3])) if field.endswith("_id") else None
+            if owner and owner != table:
+                referenced[table].add(owner)
+    return referenced
+
+
+def rank_tables(question: str, schema: dict) -> list:
+    """
+    Returns [(score, lexical_score, table)] sorted by relevance to the question, best first.
+    The lexical score counts IDF-weighted question words found in table and column names; the
+    total adds the embedding similarity of the question and the table description.
+    """
+    # Numbers in a question ("top 5") are values, not references to tables like audit_log_5
+    question_words = {word for word in identifier_words(question) if not word.isdigit()}
+    table_words = {}
+    for table, fields in schema.items():
+        columns = fields if isinstance(fields, dict) else {}
+        table_words[table] = (identifier_words(table), set().union(*map(identifier_words, columns), set()))
+
+    # Inverse document frequency over tables, so words shared by every table (id, name) count little
+    document_frequency = {}
+    for name_words, column_words in table_words.values():
+        for word in name_words | column_words:
+            document_frequency[word] = document_frequency.get(word, 0) + 1
+    table_count = len(schema)
+
+    def idf(word):
+        return math.log(1 + table_count / document_frequency.get(word, table_count))
+
+    question_vector = _vectorizer.embed(question) if SCHEMA_PRUNING_EMBEDDINGS else None
+
+    ranked = []
+    for table, (name_words, column_words) in table_words.items():
+        lexical = 3 * sum(idf(word) for word in question_words & name_words)
+        lexical += sum(idf(word) for word in question_words & (column_words - name_words))
+        score = lexical
+        if question_vector is not None:
+            description = " ".join([table, *(schema[table] if isinstance(schema[table], dict) else [])])
+            score += 2 * max(0.0, float(_embed_table(description) @ question_vector))
+        ranked.append((score, lexical, table))
+    ranked.sort(key=lambda item: (-item[0], item[2]))
+    return ranked
+
+
+def _prune_columns(question_words: set, fields: dict, max_columns: int) -> dict:
+    if not isinstance(fields, dict) or len(fields) <= max_columns:
+        return fields
+    keys = _key_columns(fields)
+    position = {field: i for i, field in enumerate(fields)}
+    scored = sorted(
+        fields,
+        key=lambda field: (field not in keys, -len(question_words & identifier_words(field)), position[field]),
+    )
+    keep = set(scored[:max_columns])
+    return {field: type_str for field, type_str in fields.items() if field in keep}
+
+
+class PruningReport:
+    """
+    Prompt tokens of the indented full schema against the compact pruned one. Computed when
+    the report is first read, so logging it at a disabled DEBUG level costs nothing.
+    """
+
+    def __init__(self, schema: dict, pruned: dict):
+        self.schema = schema
+        self.pruned = pruned
+        self._values = None
+
+    def as_dict(self) -> dict:
+        if self._values is None:
+            tokens_before = estimate_tokens(json.dumps(self.schema, indent=2, ensure_ascii=False))
+            tokens_after = estimate_tokens(serialize_schema(self.pruned))
+            self._values = {
+                "tables_total": len(self.schema),
+                "tables_kept": len(self.pruned),
+                "schema_tokens_before": tokens_before,
+                "schema_tokens_after": tokens_after,
+                "tokens_saved": tokens_before - tokens_after,
+            }
+        return self._values
+
+    def __getitem__(self, key):
+        return self.as_dict()[key]
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+
+def prune_schema(question: str, schema: dict, top_k: int = SCHEMA_PRUNING_TOP_K,
+                 max_columns: int = SCHEMA_PRUNING_MAX_COLUMNS) -> tuple:
+    """
+    Keeps the `top_k` tables most relevant to the question plus the tables they reference,
+    and at most `max_columns` columns per table (key columns and columns named in the
+    question first). Small schemas and questions that match no table are left whole.
+
+    Returns (pruned_schema, report), see PruningReport.
+    """
+    ranked = rank_tables(question, schema)
+    if len(schema) > top_k and any(lexical > 0 for _, lexical, _ in ranked):
+        selected = [table for _, lexical, table in ranked if lexical > 0][:top_k]
+        referenced = _referenced_tables(schema)
+        keep = set(selected).union(*(referenced[table] for table in selected))
+    else:
+        keep = set(schema)
+
+    question_words = identifier_words(question)
+    pruned = {table: _prune_columns(question_words, fields, max_columns)
+              for table, fields in schema.items() if table in keep}
+    return pruned, PruningReport(schema, pruned)
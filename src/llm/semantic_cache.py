@@ -0,0 +1,308 @@
+# Similarity cache that reuses generated queries for reworded questions
+import itertools
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from ..config import (SEMANTIC_CACHE_DIM, SEMANTIC_CACHE_MAX_ENTRIES,
+                      SEMANTIC_CACHE_MODEL, SEMANTIC_CACHE_THRESHOLD)
+from .response_cache import normalize_question
+
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "by", "with", "and", "or", "is", "are", "was",
+    "were", "be", "which", "what", "who", "whom", "how", "show", "list", "give", "me", "find", "get",
+    "all", "that", "have", "has", "made", "did", "do", "does", "please", "their", "its", "each",
+}
+
+# Words that change the meaning of an otherwise similar question, mapped to a canonical form.
+# Both questions must agree on them (and on all numbers) to share a cached query.
+GUARD_WORDS = {
+    **dict.fromkeys(["most", "top", "highest", "max", "maximum", "largest", "greatest", "desc", "descending"], "max"),
+    **dict.fromkeys(["least", "bottom", "lowest", "min", "minimum", "smallest", "fewest", "asc", "ascending"], "min"),
+    **dict.fromkeys(["not", "no", "without", "except", "excluding"], "not"),
+    **dict.fromkeys(["more", "greater", "over", "above"], "gt"),
+    **dict.fromkeys(["less", "fewer", "under", "below"], "lt"),
+    **dict.fromkeys(["before", "earliest", "oldest", "first"], "early"),
+    **dict.fromkeys(["after", "latest", "newest", "last"], "late"),
+    **dict.fromkeys(["average", "avg", "mean"], "avg"),
+    **dict.fromkeys(["sum", "total"], "sum"),
+}
+
+
+# Capitalized words after the first one: names of people, places and titles
+PROPER_NOUN = re.compile(r"(?<=\s)[A-Z][\w'.-]*")
+QUOTED = re.compile(r"'([^']+)'|\"([^\"]+)\"")
+# String literals in a completion, each with the character before it and what follows
+LITERAL = re.compile(r"(.?)(?:'([^']*)'|\"([^\"]*)\")(\s*:)?", re.DOTALL)
+
+
+def _tokens(question: str) -> list:
+    return re.findall(r"[a-z0-9_]+", normalize_question(question))
+
+
+def stem_word(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 4 and word.endswith("ed"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _words(text: str) -> set:
+    return {stem_word(t) for t in _tokens(text)}
+
+
+def question_guard(question: str) -> frozenset:
+    """
+    Numbers, meaning-changing words, capitalized names and quoted strings a cached question
+    must share with the new one.
+    """
+    guard = {t if t.isdigit() else GUARD_WORDS[t] for t in _tokens(question) if t.isdigit() or t in GUARD_WORDS}
+    names = {word.rstrip(".'-").lower() for word in PROPER_NOUN.findall(question)}
+    guard.update("name:" + name for name in names if name not in STOPWORDS and name not in GUARD_WORDS)
+    guard.update("quote:" + normalize_question(a or b) for a, b in QUOTED.findall(question))
+    return frozenset(guard)
+
+
+def question_literals(question: str, completion: str) -> frozenset:
+    """
+    Words of the completion's string literals that were taken from the question, e.g. the
+    name in `WHERE name = 'Tom Hanks'`. A reworded question must contain all of them to
+    reuse the completion, also when it is written in lower case.
+    """
+    literals = set()
+    for before, single, double, key in LITERAL.findall(completion):
+        if not key and before != "[":  # MongoDB keys and db["collection"] are names, not values
+            literals |= _words(single or double)
+    return frozenset((literals & _words(question)) - STOPWORDS)
+
+
+class HashingVectorizer:
+    """
+    Embeds questions as L2-normalized hashed bags of word unigrams, word bigrams and
+    character trigrams. Deterministic across processes and needs nothing beyond NumPy.
+    """
+
+    def __init__(self, dim: int = SEMANTIC_CACHE_DIM):
+        self.dim = dim
+
+    def _features(self, question: str):
+        words = [stem_word(t) for t in _tokens(question) if t not in STOPWORDS]
+        for word in words:
+            yield "w:" + word, 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield "c:" + padded[i:i + 3], 0.5
+        for first, second in zip(words, words[1:]):
+            yield f"b:{first} {second}", 0.7
+
+    def embed(self, question: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(question):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SentenceTransformerVectorizer:
+    """Embeds questions with a local sentence-transformers model (optional dependency)."""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, question: str) -> np.ndarray:
+        return self.model.encode(normalize_question(question), normalize_embeddings=True).astype(np.float32)
+
+
+class SemanticIndex:
+    """
+    Fixed-capacity ring buffer of question vectors with vectorized nearest-neighbour lookup.
+    Rows are grouped by question guard, since only entries with the new question's guard can
+    match: a small group is scored on its own, a large one with a single pass over the matrix.
+    """
+
+    # Groups up to this size are scored by gathering their rows
+    SMALL_GROUP = 4096
+
+    def __init__(self, dim: int, capacity: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.capacity = capacity
+        self.vectors = np.zeros((min(capacity, 1024), dim), dtype=np.float32)
+        self.group_ids = np.zeros(len(self.vectors), dtype=np.int64)  # group of each row
+        self.entries = []  # (question, guard, completion, literals), aligned with vector rows
+        self.slots = {}  # normalized question -> row
+        self.groups = {}  # guard -> (group id, rows)
+        self._group_ids = itertools.count(1)
+        self.next_slot = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _unlink(self, slot: int):
+        question, guard = self.entries[slot][:2]
+        del self.slots[normalize_question(question)]
+        rows = self.groups[guard][1]
+        rows.discard(slot)
+        if not rows:
+            del self.groups[guard]
+
+    def add(self, vector: np.ndarray, entry: tuple):
+        """Adds `entry`, replacing the entry for the same question if there is one."""
+        key = normalize_question(entry[0])
+        if key in self.slots:
+            slot = self.slots[key]
+            self._unlink(slot)
+            self.entries[slot] = entry
+        elif len(self.entries) < self.capacity:
+            if len(self.entries) == len(self.vectors):
+                size = min(self.capacity, 2 * len(self.vectors))
+                grown = np.zeros((size, self.vectors.shape[1]), dtype=np.float32)
+                grown[:len(self.vectors)] = self.vectors
+                self.vectors = grown
+                self.group_ids = np.concatenate([self.group_ids, np.zeros(size - len(self.group_ids), dtype=np.int64)])
+            slot = len(self.entries)
+            self.entries.append(entry)
+        else:
+            # Full: overwrite the oldest entry
+            slot = self.next_slot
+            self._unlink(slot)
+            self.entries[slot] = entry
+            self.next_slot = (slot + 1) % self.capacity
+        self.slots[key] = slot
+        group_id, rows = self.groups.setdefault(entry[1], (next(self._group_ids), set()))
+        rows.add(slot)
+        self.vectors[slot] = vector
+        self.group_ids[slot] = group_id
+
+    def candidates(self, guard: frozenset):
+        """
+        What a lookup for `guard` has to score, taken under the cache lock so top_k() can
+        run outside it: (vectors, rows) for a small group, (vectors, group ids, group id) for
+        a large one, or None.
+        """
+        group = self.groups.get(guard)
+        if group is None:
+            return None
+        group_id, rows = group
+        if len(rows) <= self.SMALL_GROUP:
+            return self.vectors, np.fromiter(rows, dtype=np.intp, count=len(rows))
+        count = len(self.entries)
+        return self.vectors[:count], self.group_ids[:count], group_id
+
+
+def top_k(candidates: tuple, vector: np.ndarray, k: int = 5) -> list:
+    """Returns [(score, row)] for the k candidates most similar to `vector`, best first."""
+    if len(candidates) == 2:
+        vectors, rows = candidates
+        scores = vectors[rows] @ vector
+    else:
+        vectors, group_ids, group_id = candidates
+        rows = np.flatnonzero(group_ids == group_id)
+        scores = (vectors @ vector)[rows]
+    if not len(rows):
+        return []
+    k = min(k, len(rows))
+    best = np.argpartition(scores, -k)[-k:]
+    best = best[np.argsort(scores[best])[::-1]]
+    return [(float(scores[i]), int(rows[i])) for i in best]
+
+
+class SemanticCache:
+    """
+    Maps reworded questions to previously generated completions.
+
+    Entries are partitioned by (db type, rules hash, schema hash, deployment), so a question
+    only matches questions asked against the same schema, prompt rules and model. A match
+    needs a cosine similarity of at least `threshold`, the same numbers, ordering/negation
+    words, names and quoted strings (question_guard), and every word the cached completion
+    took from its question into a string literal (question_literals).
+    """
+
+    def __init__(self, vectorizer=None, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 capacity: int = SEMANTIC_CACHE_MAX_ENTRIES, max_partitions: int = 8):
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.threshold = threshold
+        self.capacity = capacity
+        self.max_partitions = max_partitions
+        self.hits = 0
+        self.misses = 0
+        self._partitions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, partition: tuple, question: str):
+        """Returns (completion, similarity, cached_question) for the best match, or None."""
+        vector = self.vectorizer.embed(question)
+        guard, words = question_guard(question), _words(question)
+        with self._lock:
+            index = self._partitions.get(partition)
+            candidates = index.candidates(guard) if index is not None else None
+        # Scored outside the lock, so concurrent sessions do not queue behind each other's lookups
+        matches = top_k(candidates, vector) if candidates is not None else []
+        with self._lock:
+            for _, row in matches:
+                # Rows may have been overwritten meanwhile: check the row as it is now
+                if row >= len(index.entries):
+                    continue
+                cached_question, cached_guard, completion, literals = index.entries[row]
+                score = float(index.vectors[row] @ vector)
+                if score >= self.threshold and cached_guard == guard and literals <= words:
+                    self.hits += 1
+                    if partition in self._partitions:
+                        self._partitions.move_to_end(partition)
+                    return completion, score, cached_question
+            self.misses += 1
+            return None
+
+    def add(self, partition: tuple, question: str, completion: str):
+        """Caches `completion` for `question`, replacing an earlier completion for the same question."""
+        vector = self.vectorizer.embed(question)
+        with self._lock:
+            index = self._partitions.get(partition)
+            if index is None:
+                index = self._partitions[partition] = SemanticIndex(len(vector), self.capacity)
+                while len(self._partitions) > self.max_partitions:
+                    self._partitions.popitem(last=False)
+            self._partitions.move_to_end(partition)
+            index.add(vector, (question, question_guard(question), completion,
+                               question_literals(question, completion)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": sum(len(index) for index in self._partitions.values()),
+                "partitions": len(self._partitions),
+                "threshold": self.threshold,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Returns the process-wide semantic cache, using SEMANTIC_CACHE_MODEL if one is configured."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                vectorizer = SentenceTransformerVectorizer(SEMANTIC_CACHE_MODEL) if SEMANTIC_CACHE_MODEL else None
+                _cache = SemanticCache(vectorizer)
+    return _cache
+
+
+def peek_semantic_cache():
+    """Returns the semantic cache if it has been created, else None."""
+    return _cache
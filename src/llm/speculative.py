@@ -0,0 +1,122 @@
+# Speculative generation: several completions requested at once, the cheapest valid one kept
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+
+from ..telemetry import current_span, get_logger
+from .llm_integration import call_llm_api_async
+
+logger = get_logger(__name__)
+
+# How often a waiting generation reports progress (and so notices a cancelled job)
+PROGRESS_INTERVAL = 0.25
+
+
+@dataclass
+class Candidate:
+    """One completion: the query extracted from it, its schema problems and when it arrived."""
+
+    index: int
+    completion: str
+    query: str
+    problems: list
+    elapsed: float
+    cost: float = None
+
+    @property
+    def valid(self) -> bool:
+        return not self.problems
+
+
+async def gather_candidates(messages: list, count: int, evaluate, deadline: float, grace: float,
+                            on_progress=None) -> list:
+    """
+    Requests `count` completions of `messages` concurrently and returns the Candidates that
+    arrived, in arrival order. `evaluate(completion)` returns (query, problems).
+
+    Stops waiting `grace` seconds after the first valid candidate, or `deadline` seconds after
+    the requests were sent if any candidate (valid or not) has arrived by then; otherwise at
+    the first one to arrive after the deadline. Calls still running are cancelled. Failed calls are skipped unless all of them fail, in which
+    case the first error is raised. `on_progress(text)` gets the best completion so far.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    tasks = {asyncio.create_task(call_llm_api_async(messages, max_retries=0)): i for i in range(count)}
+    pending, received, errors = set(tasks), [], []
+    stop_at = start + deadline
+    try:
+        while pending:
+            now = loop.time()
+            if now >= stop_at and received:
+                break
+            # Past the deadline with nothing received: wait for whichever candidate comes first
+            timeout = stop_at - now if now < stop_at else None
+            if on_progress is not None:
+                timeout = PROGRESS_INTERVAL if timeout is None else min(timeout, PROGRESS_INTERVAL)
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    errors.append(task.exception())
+                    logger.info("Candidate %d failed: %s", tasks[task], task.exception())
+                    continue
+                completion = task.result()
+                query, problems = evaluate(completion)
+                received.append(Candidate(tasks[task], completion, query, problems, loop.time() - start))
+                if not problems and sum(candidate.valid for candidate in received) == 1:
+                    stop_at = min(stop_at, loop.time() + grace)
+            if on_progress is not None:
+                best = next((candidate for candidate in received if candidate.valid), None)
+                on_progress(best.completion if best else "")
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    stage = current_span()
+    if stage is not None:
+        stage.set_attribute("received", len(received))
+        stage.set_attribute("valid", sum(candidate.valid for candidate in received))
+        stage.set_attribute("abandoned", len(pending))
+    if not received and errors:
+        raise errors[0]
+    return received
+
+
+def _explain_cost(query: str) -> float:
+    from ..db.query_cost import EXPLAINABLE, explain_query
+    from ..db.sql_analysis import statement_type
+
+    if statement_type(query) not in EXPLAINABLE:
+        return 0.0
+    try:
+        return explain_query(query).query_cost
+    except Exception as e:
+        logger.info("Could not EXPLAIN a candidate: %s", e)
+        return math.inf
+
+
+def choose_candidate(candidates: list, db_type: str) -> Candidate:
+    """
+    The valid candidate with the lowest EXPLAIN cost (MySQL) or the first valid one
+    (MongoDB); the first candidate when none is valid. Duplicates are explained once.
+    """
+    valid = [candidate for candidate in candidates if candidate.valid]
+    if not valid:
+        return candidates[0]
+    if db_type != "mysql" or len(valid) == 1:
+        return valid[0]
+
+    from ..db.sql_analysis import normalize_sql
+
+    costs = {}
+    started = time.perf_counter()
+    for candidate in valid:
+        key = normalize_sql(candidate.query)
+        if key not in costs:
+            costs[key] = _explain_cost(candidate.query)
+        candidate.cost = costs[key]
+    logger.debug("Explained %d distinct candidates in %.0f ms", len(costs), (time.perf_counter() - started) * 1000)
+    # min() keeps the earliest of equally cheap candidates
+    return min(valid, key=lambda candidate: candidate.cost)
@@ -0,0 +1,327 @@
+# Timing spans, Prometheus metrics and leveled, sampled logging for the llm and db packages
+import contextlib
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+
+from .config import (LOG_LEVEL, LOG_SAMPLE_RATE, TELEMETRY_ENABLED,
+                     TELEMETRY_METRICS_PORT, TELEMETRY_OTEL,
+                     TELEMETRY_SPAN_BUFFER, TELEMETRY_SPANS_PATH)
+
+# Histogram buckets for stage durations, in seconds
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRIC_HELP = {
+    "chatdb_stage_duration_seconds": ("histogram", "Duration of pipeline stages"),
+    "chatdb_llm_tokens_total": ("counter", "LLM tokens used, by kind"),
+    "chatdb_events_total": ("counter", "Pipeline events such as cache hits, by name"),
+}
+
+_lock = threading.Lock()
+
+
+# --- Logging -----------------------------------------------------------------------------
+
+class SampledFilter(logging.Filter):
+    """Passes warnings and errors, and a `rate` fraction of lower-level records."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record) -> bool:
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+_logging_configured = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns a logger below "chatdb" (pass __name__). The first call installs a stderr handler
+    with LOG_LEVEL, sampling records below WARNING at LOG_SAMPLE_RATE.
+    """
+    global _logging_configured
+    with _lock:
+        if not _logging_configured:
+            root = logging.getLogger("chatdb")
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+            handler.addFilter(SampledFilter(LOG_SAMPLE_RATE))
+            root.addHandler(handler)
+            root.setLevel(LOG_LEVEL.upper())
+            root.propagate = False
+            _logging_configured = True
+    return logging.getLogger("chatdb." + name.removeprefix("src."))
+
+
+logger = get_logger(__name__)
+
+
+# --- Metrics -----------------------------------------------------------------------------
+
+class Metrics:
+    """Thread-safe counters and histograms, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets: tuple = DURATION_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}  # (metric, labels) -> value
+        self._histograms = {}  # (metric, labels) -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def increment(self, metric: str, value: float = 1, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, metric: str, value: float, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+        lines, described = [], set()
+
+        def describe(metric, default_type):
+            if metric not in described:
+                kind, help_text = METRIC_HELP.get(metric, (default_type, metric))
+                lines.extend([f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"])
+                described.add(metric)
+
+        for (metric, labels), value in sorted(counters.items()):
+            describe(metric, "counter")
+            lines.append(f"{metric}{_labels(labels)} {value:g}")
+        for (metric, labels), histogram in sorted(histograms.items()):
+            describe(metric, "histogram")
+            for bound, count in zip(self.buckets, histogram):
+                lines.append(f"{metric}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {count}")
+            lines.append(f"{metric}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram[-1]}")
+            lines.append(f"{metric}_sum{_labels(labels)} {histogram[-2]:.6f}")
+            lines.append(f"{metric}_count{_labels(labels)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+metrics = Metrics()
+
+
+def increment(metric: str, value: float = 1, **labels):
+    metrics.increment(metric, value, **labels)
+
+
+def prometheus_text() -> str:
+    return metrics.prometheus_text()
+
+
+# --- Spans -------------------------------------------------------------------------------
+
+@dataclass
+class Span:
+    """A timed stage. Spans started inside another span (on the same thread or task) become its children."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str = None
+    start_ns: int = 0
+    end_ns: int = 0
+    duration: float = 0.0
+    attributes: dict = field(default_factory=dict)
+    status: str = "ok"
+    error: str = None
+    otel_span: object = field(default=None, repr=False)
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        """The span in the OTLP/JSON shape used by OpenTelemetry collectors."""
+        status = {"code": 1} if self.status == "ok" else {"code": 2, "message": self.error or ""}
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": status,
+        }
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+_current_span = contextvars.ContextVar("chatdb_span", default=None)
+_recent_spans = deque(maxlen=TELEMETRY_SPAN_BUFFER)
+
+
+def current_span():
+    """The innermost active span, or None."""
+    return _current_span.get()
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """
+    Times the enclosed block as a span: its duration is added to the
+    chatdb_stage_duration_seconds{stage=name} histogram, kept in the recent-span buffer,
+    appended to TELEMETRY_SPANS_PATH as OTLP/JSON and, with TELEMETRY_OTEL, forwarded to
+    the OpenTelemetry SDK. Yields the Span, so attributes can be added as they are known.
+    """
+    parent = _current_span.get()
+    current = Span(
+        name,
+        trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent else None,
+        start_ns=time.time_ns(),
+        attributes=dict(attributes),
+    )
+    if not TELEMETRY_ENABLED:
+        yield current
+        return
+    if TELEMETRY_OTEL:
+        current.otel_span = _start_otel_span(current, parent)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status, current.error = "error", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        current.end_ns = current.start_ns + int(current.duration * 1e9)
+        _current_span.reset(token)
+        _finish(current)
+
+
+def _finish(current: Span):
+    metrics.observe("chatdb_stage_duration_seconds", current.duration, stage=current.name, status=current.status)
+    _recent_spans.append(current)
+    if current.otel_span is not None:
+        _end_otel_span(current)
+    if TELEMETRY_SPANS_PATH:
+        try:
+            line = json.dumps(current.to_otlp(), default=str)
+            with _lock, open(TELEMETRY_SPANS_PATH, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+        except OSError as e:
+            logger.warning("Could not export span: %s", e)
+
+
+def _start_otel_span(current: Span, parent):
+    # Optional dependency: opentelemetry-api (with an SDK configured by the deployment)
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+    context = trace.set_span_in_context(parent.otel_span) if parent is not None and parent.otel_span else None
+    return trace.get_tracer("chatdb").start_span(current.name, context=context, start_time=current.start_ns)
+
+
+def _end_otel_span(current: Span):
+    from opentelemetry.trace import Status, StatusCode
+
+    for key, value in current.attributes.items():
+        current.otel_span.set_attribute(key, value if isinstance(value, (bool, int, float, str)) else str(value))
+    if current.status != "ok":
+        current.otel_span.set_status(Status(StatusCode.ERROR, current.error))
+    current.otel_span.end(end_time=current.end_ns)
+
+
+def recent_spans(limit: int = 100) -> list:
+    """The most recently finished spans, newest last."""
+    return list(_recent_spans)[-limit:]
+
+
+def stage_summary() -> dict:
+    """Count, p50 and p95 in milliseconds per stage over the recent-span buffer."""
+    durations = {}
+    for finished in list(_recent_spans):
+        durations.setdefault(finished.name, []).append(finished.duration * 1000)
+    summary = {}
+    for name, values in sorted(durations.items()):
+        values.sort()
+        summary[name] = {
+            "count": len(values),
+            "p50_ms": round(values[len(values) // 2], 2),
+            "p95_ms": round(values[min(int(len(values) * 0.95), len(values) - 1)], 2),
+        }
+    return summary
+
+
+# --- HTTP endpoint -------------------------------------------------------------------------
+
+_server = None
+
+
+def start_metrics_server(port: int = TELEMETRY_METRICS_PORT):
+    """
+    Serves /metrics (Prometheus text) and /spans (recent spans as OTLP/JSON) on a daemon
+    thread. Does nothing if `port` is 0 or the server is already running.
+    """
+    global _server
+    if not port:
+        return None
+    with _lock:
+        if _server is not None:
+            return _server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics"):
+                    body, content_type = prometheus_text().encode(), "text/plain; version=0.0.4"
+                elif self.path.startswith("/spans"):
+                    spans = [finished.to_otlp() for finished in recent_spans(TELEMETRY_SPAN_BUFFER)]
+                    body, content_type = json.dumps({"spans": spans}).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("metrics endpoint: " + format, *args)
+
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        except OSError as e:
+            # Another Streamlit process may already serve this port
+            logger.warning("Could not start the metrics endpoint on port %s: %s", port, e)
+            return None
+        threading.Thread(target=_server.serve_forever, name="metrics-endpoint", daemon=True).start()
+        logger.info("Serving metrics on port %s", port)
+        return _server
@@ -0,0 +1,97 @@
+"""
+MySQLConnectionPool with fake DB-API connections: reuse, health checks and limits.
+
+Run from the project root:
+    python -m pytest tests
+"""
+import threading
+import time
+
+import pytest
+
+from src.db.connection_pool import MySQLConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self, ping_delay: float = 0, healthy: bool = True):
+        self.ping_delay = ping_delay
+        self.healthy = healthy
+        self.closed = False
+
+    def ping(self, reconnect=False):
+        time.sleep(self.ping_delay)
+        if not self.healthy:
+            raise ConnectionError("gone away")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        created.append(FakeConnection())
+        return created[-1]
+
+    return MySQLConnectionPool(connect, **kwargs), created
+
+
+def test_reuses_released_connections():
+    pool, created = make_pool(max_size=2)
+    pool.acquire().close()
+    pool.acquire().close()
+    assert len(created) == 1
+    assert pool.stats()["reused"] == 1
+
+
+def test_unhealthy_connection_is_replaced():
+    pool, created = make_pool(health_check_interval=0)
+    pool.acquire().close()
+    created[0].healthy = False
+    connection = pool.acquire()
+    assert connection._connection is created[1] and created[0].closed
+    assert pool.stats()["health_check_failures"] == 1
+    assert pool.stats()["open"] == 1
+
+
+def test_times_out_when_exhausted():
+    pool, _ = make_pool(max_size=1, acquire_timeout=0.1)
+    pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+
+def test_slow_ping_does_not_block_other_threads():
+    pool, created = make_pool(max_size=2, health_check_interval=0)
+    pool.acquire().close()
+    created[0].ping_delay = 1.0
+    pinging = threading.Thread(target=lambda: pool.acquire().close())
+    pinging.start()
+    time.sleep(0.1)  # the first thread is now pinging the idle connection
+    start = time.monotonic()
+    pool.acquire().close()  # opens the second connection meanwhile
+    assert time.monotonic() - start < 0.5
+    pinging.join()
+    assert len(created) == 2
+
+
+def test_slow_close_does_not_block_other_threads():
+    pool, created = make_pool(max_size=2, max_lifetime=0)
+    connection = pool.acquire()
+
+    def slow_close():
+        time.sleep(1.0)
+
+    created[0].close = slow_close
+    releasing = threading.Thread(target=connection.close)  # expired: closed instead of kept
+    releasing.start()
+    time.sleep(0.1)
+    start = time.monotonic()
+    pool.stats()
+    assert time.monotonic() - start < 0.5
+    releasing.join()
+    assert pool.stats()["discarded"] == 1 and pool.stats()["open"] == 0
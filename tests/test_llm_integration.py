@@ -0,0 +1,228 @@
+"""
+call_llm_api_async against a local fake OpenAI-compatible server: streaming, retries,
+timeouts, the process-wide concurrency limit and client reuse.
+
+Run from the project root:
+    python -m pytest tests
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test")
+os.environ.setdefault("ENDPOINT_URL", "http://localhost")
+
+from src.llm import llm_integration  # noqa: E402
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """
+    Answers chat completion requests from a script of replies, one per request, each either
+    ("stream", [tokens], delay between tokens) or ("status", HTTP status). Records how many
+    requests were in flight at most and how many TCP connections were opened.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeOpenAIHandler)
+        self.lock = threading.Lock()
+        self.script = []
+        self.requests = []
+        self.in_flight = self.max_in_flight = self.connections = 0
+
+    def next_reply(self):
+        with self.lock:
+            return self.script.pop(0) if self.script else ("stream", ["SELECT 1"], 0)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, body))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        self.finished = False
+        try:
+            reply = server.next_reply()
+            if reply[0] == "status":
+                self._finish()
+                self._send_error(reply[1])
+            else:
+                self._send_stream(reply[1], reply[2])
+        finally:
+            self._finish()
+
+    def _finish(self):
+        # Counted as done before the last bytes go out: the client may start its next
+        # request as soon as it has read them
+        if not self.finished:
+            self.finished = True
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+    def _send_error(self, status: int):
+        payload = json.dumps({"error": {"message": "fake error", "type": "fake", "code": str(status)}}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, tokens: list, delay: float):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunks = [{"choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]} for token in tokens]
+        chunks.append({"choices": [], "usage": {"prompt_tokens": 11, "completion_tokens": len(tokens),
+                                                "total_tokens": 11 + len(tokens)}})
+        try:
+            for chunk in chunks:
+                time.sleep(delay)
+                chunk.update(id="chatcmpl-fake", object="chat.completion.chunk", created=0, model="fake")
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+            self._finish()
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (timeout or cancellation)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+@pytest.fixture(scope="module")
+def server():
+    fake = FakeOpenAIServer()
+    thread = threading.Thread(target=fake.serve_forever, daemon=True)
+    thread.start()
+    # The async client is created on first use, from these settings, and then reused
+    llm_integration.config.update(ENDPOINT_URL=fake.url, LLM_BACKOFF_BASE=0.01, LLM_BACKOFF_MAX=0.05)
+    yield fake
+    fake.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def reset(server):
+    # Requests a client gave up on are only noticed by the server at its next write
+    deadline = time.monotonic() + 5
+    while server.in_flight and time.monotonic() < deadline:
+        time.sleep(0.05)
+    with server.lock:
+        server.script.clear()
+        server.requests.clear()
+        server.max_in_flight = 0
+
+
+def test_streams_tokens(server):
+    server.script.append(("stream", ["SELECT ", "name ", "FROM movies"], 0.01))
+    seen = []
+    text = asyncio.run(llm_integration.call_llm_api_async([{"role": "user", "content": "q"}], on_token=seen.append))
+    assert text == "SELECT name FROM movies"
+    assert seen == ["SELECT ", "SELECT name ", "SELECT name FROM movies"]
+    path, body = server.requests[0]
+    assert "/chat/completions" in path and body["stream"] is True
+
+
+def test_retries_429_and_5xx(server):
+    server.script.extend([("status", 429), ("status", 503), ("stream", ["ok"], 0)])
+    text = asyncio.run(llm_integration.call_llm_api_async([{"role": "user", "content": "q"}], max_retries=3))
+    assert text == "ok"
+    assert len(server.requests) == 3
+
+
+def test_gives_up_after_max_retries(server):
+    import openai
+
+    server.script.extend([("status", 500)] * 3)
+    with pytest.raises(openai.InternalServerError):
+        asyncio.run(llm_integration.call_llm_api_async([{"role": "user", "content": "q"}], max_retries=1))
+    assert len(server.requests) == 2
+
+
+def test_client_errors_are_not_retried(server):
+    import openai
+
+    server.script.extend([("status", 400), ("stream", ["unused"], 0)])
+    with pytest.raises(openai.BadRequestError):
+        asyncio.run(llm_integration.call_llm_api_async([{"role": "user", "content": "q"}], max_retries=3))
+    assert len(server.requests) == 1
+
+
+def test_timeout_is_retried(server):
+    server.script.extend([("stream", ["slow"], 0.5), ("stream", ["fast"], 0)])
+    text = asyncio.run(llm_integration.call_llm_api_async([{"role": "user", "content": "q"}],
+                                                          timeout=0.2, max_retries=1))
+    assert text == "fast"
+
+
+def test_concurrency_limit_spans_event_loops(server):
+    # Separate asyncio.run() calls in separate threads, like concurrent Streamlit sessions
+    limit = llm_integration.config["LLM_MAX_CONCURRENCY"]
+    calls = limit * 2 + 1
+    server.script.extend([("stream", ["a", "b"], 0.1)] * calls)
+    results = []
+
+    def call():
+        results.append(asyncio.run(llm_integration.call_llm_api_async([{"role": "user", "content": "q"}])))
+
+    threads = [threading.Thread(target=call) for _ in range(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["ab"] * calls
+    assert server.max_in_flight <= limit
+
+
+def test_client_is_reused_across_calls(server):
+    for _ in range(5):
+        asyncio.run(llm_integration.call_llm_api_async([{"role": "user", "content": "q"}]))
+    connections = server.connections
+    for _ in range(5):
+        asyncio.run(llm_integration.call_llm_api_async([{"role": "user", "content": "q"}]))
+    # Sequential calls go over the pooled keep-alive connection of the one shared client
+    assert server.connections == connections
+
+
+def test_cancelling_the_caller_cancels_the_call(server):
+    server.script.append(("stream", ["a"] * 50, 0.05))
+
+    async def cancel_soon():
+        task = asyncio.create_task(llm_integration.call_llm_api_async([{"role": "user", "content": "q"}]))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_soon())
+    # The request on the LLM loop is abandoned too and releases its slot
+    deadline = time.monotonic() + 2
+    while server.in_flight and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert server.in_flight == 0
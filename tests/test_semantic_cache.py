@@ -0,0 +1,69 @@
+"""
+SemanticCache matching: reworded questions hit, questions about other names or values miss.
+
+Run from the project root:
+    python -m pytest tests
+"""
+import pytest
+
+from src.llm.semantic_cache import SemanticCache, question_guard, question_literals
+
+PARTITION = ("mysql", "rules", "schema", "deployment")
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticCache()
+    cache.add(PARTITION, "movies directed by Steven Spielberg",
+              "```sql\nSELECT m.name FROM movies m JOIN directors d ON d.director_id = m.director_id "
+              "WHERE d.name = 'Steven Spielberg'\n```")
+    cache.add(PARTITION, "Which movies did Tom Hanks act in?",
+              "```sql\nSELECT name FROM movies WHERE actor = 'Tom Hanks'\n```")
+    cache.add(PARTITION, "how many movies were released after 2000",
+              "```sql\nSELECT COUNT(*) FROM movies WHERE year > 2000\n```")
+    return cache
+
+
+@pytest.mark.parametrize("question, cached", [
+    ("movies directed by Steven Spielberg?", "movies directed by Steven Spielberg"),
+    ("Which movies has Tom Hanks acted in?", "Which movies did Tom Hanks act in?"),
+    ("how many movies have been released after 2000", "how many movies were released after 2000"),
+])
+def test_rewording_hits(cache, question, cached):
+    match = cache.lookup(PARTITION, question)
+    assert match is not None and match[2] == cached
+
+
+@pytest.mark.parametrize("question", [
+    "movies directed by Steven Soderbergh",
+    "movies directed by steven soderbergh",  # no capitals: caught by the SQL literal
+    "Which movies did Tom Holland act in?",
+    "how many movies were released after 2010",
+])
+def test_other_names_and_values_miss(cache, question):
+    assert cache.lookup(PARTITION, question) is None
+
+
+def test_replacing_an_entry_keeps_one_row():
+    cache = SemanticCache()
+    cache.add(PARTITION, "List all directors", "```sql\nSELECT * FROM directors\n```")
+    cache.add(PARTITION, "list all directors", "```sql\nSELECT name FROM directors\n```")
+    assert cache.stats()["entries"] == 1
+    assert "SELECT name" in cache.lookup(PARTITION, "List all directors")[0]
+
+
+def test_ring_buffer_evicts_oldest():
+    cache = SemanticCache(capacity=2)
+    for question in ["movies after 1990", "movies after 2000", "movies after 2010"]:
+        cache.add(PARTITION, question, f"```sql\n-- {question}\n```")
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup(PARTITION, "movies after 1990") is None
+    assert cache.lookup(PARTITION, "movies after 2010") is not None
+
+
+def test_guard_and_literals():
+    assert question_guard("Which movies did Tom Hanks act in?") == {"name:tom", "name:hanks"}
+    assert question_guard("movies titled 'The Matrix'") >= {"quote:the matrix"}
+    # MongoDB keys and collection names are not values taken from the question
+    assert question_literals("list customers from berlin",
+                             'db["customers"].find({"city": "Berlin"}, {"name": 1})') == {"berlin"}
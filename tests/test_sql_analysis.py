@@ -0,0 +1,51 @@
+"""
+Statement classification in sql_analysis: a WITH clause takes the type of the statement
+its CTEs belong to.
+
+Run from the project root:
+    python -m pytest tests
+"""
+import pytest
+
+from src.db.sql_analysis import is_cacheable, is_write_statement, main_statement_type
+
+
+@pytest.mark.parametrize("query, kind", [
+    ("SELECT name FROM movies", "SELECT"),
+    ("with recent as (select movie_id from movies where year > 2000) select * from recent", "SELECT"),
+    ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 3) SELECT i FROM n", "SELECT"),
+    ("WITH r AS (SELECT movie_id FROM movies) (SELECT * FROM r) UNION (SELECT 1)", "SELECT"),
+    ("WITH old AS (SELECT movie_id FROM movies WHERE year < 1950) DELETE FROM movies "
+     "WHERE movie_id IN (SELECT movie_id FROM old)", "DELETE"),
+    ("WITH d AS (SELECT director_id FROM directors) UPDATE movies m JOIN d "
+     "ON m.director_id = d.director_id SET m.runtime = 0", "UPDATE"),
+    ("SHOW TABLES", "SHOW"),
+    ("", ""),
+])
+def test_main_statement_type(query, kind):
+    assert main_statement_type(query) == kind
+
+
+def test_with_write_is_not_cached_and_invalidates():
+    query = "WITH old AS (SELECT movie_id FROM movies) DELETE FROM movies WHERE movie_id IN (SELECT movie_id FROM old)"
+    assert not is_cacheable(query)
+    assert is_write_statement(query)
+
+
+def test_with_select_is_cached():
+    query = "WITH recent AS (SELECT movie_id FROM movies WHERE year > 2000) SELECT COUNT(*) FROM recent"
+    assert is_cacheable(query)
+    assert not is_write_statement(query)
+
+
+@pytest.mark.parametrize("query, read", [
+    ("SELECT name FROM movies", True),
+    ("WITH recent AS (SELECT movie_id FROM movies) SELECT * FROM recent", True),
+    ("WITH old AS (SELECT movie_id FROM movies) DELETE FROM movies WHERE movie_id IN (SELECT movie_id FROM old)", False),
+    ("SHOW TABLES", True),
+    ("UPDATE movies SET runtime = 0", False),
+])
+def test_is_read_query(query, read):
+    from src.db.query_execution import is_read_query
+
+    assert is_read_query(query) is read